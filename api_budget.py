@@ -0,0 +1,197 @@
+"""
+api_budget.py
+Orçamento de requisições da API-Football (token bucket por minuto + cota diária).
+
+- Lê os headers de rate-limit de cada resposta:
+  x-ratelimit-requests-limit / x-ratelimit-requests-remaining (cota diária)
+  X-RateLimit-Limit / X-RateLimit-Remaining (por minuto)
+- 429: bloqueia tudo até Retry-After (ou 60s).
+- A cota diária restante é espalhada pelas horas que faltam até o reset (00:00 UTC),
+  ponderada pelo calendário de jogos (API_HOURLY_WEIGHTS), num segundo bucket.
+- Quando o orçamento aperta, a prioridade decide quem passa:
+  PRIORITY_WINDOW (partida na janela HT/FT) > PRIORITY_LEAGUE (ligas prioritárias) > PRIORITY_OTHER.
+- share < 1: o processo usa só essa fração da cota (modo sharded, ver sharding.py);
+  os limites lidos dos headers são escalados pela mesma fração.
+
+Environment variables (opcionais):
+- API_RATE_PER_MINUTE (padrão 30)
+- API_DAILY_LIMIT (padrão 7500; substituído pelo header assim que chega a 1ª resposta)
+- API_HOURLY_WEIGHTS (24 pesos separados por vírgula, hora UTC 0..23)
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Sequence
+
+from scheduler import minutes_to_window
+
+logger = logging.getLogger(__name__)
+
+API_RATE_PER_MINUTE = int(os.getenv('API_RATE_PER_MINUTE', '30'))
+API_DAILY_LIMIT = int(os.getenv('API_DAILY_LIMIT', '7500'))
+# Peso por hora UTC: madrugada quase sem jogos, pico tarde/noite europeia + América do Sul
+_DEFAULT_WEIGHTS = '1,1,1,1,1,1,1,1,1,2,2,3,4,5,6,6,6,6,6,6,5,4,3,2'
+API_HOURLY_WEIGHTS = [float(x) for x in os.getenv('API_HOURLY_WEIGHTS', _DEFAULT_WEIGHTS).split(',')][:24]
+
+PRIORITY_WINDOW = 0
+PRIORITY_LEAGUE = 1
+PRIORITY_OTHER = 2
+
+# Fração do bucket que precisa sobrar para cada prioridade conseguir um token
+RESERVE = {PRIORITY_WINDOW: 0.0, PRIORITY_LEAGUE: 0.2, PRIORITY_OTHER: 0.5}
+PACE_BURST_SECONDS = 600.0  # o bucket diário acumula no máximo 10 min de ritmo
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def _header_int(headers, name) -> Optional[int]:
+    try:
+        val = headers.get(name)
+        return int(val) if val is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _seconds_until_utc_midnight(now_utc: datetime) -> float:
+    return 86400.0 - (now_utc.hour * 3600 + now_utc.minute * 60 + now_utc.second)
+
+
+class ApiBudget:
+    def __init__(self, per_minute: int = API_RATE_PER_MINUTE, daily: int = API_DAILY_LIMIT,
+                 hourly_weights: Sequence[float] = None, share: float = 1.0):
+        self.share = min(1.0, max(0.01, share))
+        self.per_minute = max(1, int(per_minute * self.share))
+        self.minute_tokens = float(self.per_minute)
+        self.daily_limit = int(daily * self.share)
+        self.daily_remaining = self.daily_limit
+        self.weights = list(hourly_weights or API_HOURLY_WEIGHTS) + [1.0] * 24
+        self.pace_tokens = None  # começa cheio no 1º refill
+        self.blocked_until = 0.0
+        self._last = time.monotonic()
+        self._day = datetime.now(timezone.utc).date()
+        self._lock = threading.Lock()
+        self.granted = {PRIORITY_WINDOW: 0, PRIORITY_LEAGUE: 0, PRIORITY_OTHER: 0}
+        self.denied = {PRIORITY_WINDOW: 0, PRIORITY_LEAGUE: 0, PRIORITY_OTHER: 0}
+
+    # ----- ritmo diário -----
+    def pace_per_second(self, now_utc: datetime = None) -> float:
+        """Ritmo permitido agora: cota restante * peso desta hora / peso das horas restantes."""
+        now_utc = now_utc or datetime.now(timezone.utc)
+        left_in_hour = 1.0 - (now_utc.minute * 60 + now_utc.second) / 3600.0
+        remaining_weight = self.weights[now_utc.hour] * left_in_hour + sum(self.weights[h] for h in range(now_utc.hour + 1, 24))
+        if remaining_weight <= 0 or self.daily_remaining <= 0:
+            return 0.0
+        return self.daily_remaining * self.weights[now_utc.hour] / remaining_weight / 3600.0
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        now_utc = datetime.now(timezone.utc)
+        if now_utc.date() != self._day:  # reset da cota às 00:00 UTC
+            self._day = now_utc.date()
+            self.daily_remaining = self.daily_limit
+        self.minute_tokens = min(float(self.per_minute), self.minute_tokens + elapsed * self.per_minute / 60.0)
+        pace = self.pace_per_second(now_utc)
+        cap = max(1.0, pace * PACE_BURST_SECONDS)
+        if self.pace_tokens is None:
+            self.pace_tokens = cap
+        self.pace_tokens = min(cap, self.pace_tokens + elapsed * pace)
+        return now, cap
+
+    # ----- API pública -----
+    def acquire(self, priority: int = PRIORITY_OTHER) -> bool:
+        """Tenta consumir 1 requisição; False se o orçamento não comporta esta prioridade agora."""
+        if priority is None:
+            priority = PRIORITY_OTHER
+        reserve = RESERVE.get(priority, RESERVE[PRIORITY_OTHER])
+        with self._lock:
+            now, pace_cap = self._refill()
+            ok = (
+                now >= self.blocked_until
+                and self.daily_remaining > 0
+                and self.minute_tokens - 1 >= reserve * self.per_minute
+                and self.pace_tokens - 1 >= reserve * pace_cap
+            )
+            # partida na janela não espera o ritmo diário, só o limite duro por minuto/dia
+            if not ok and priority == PRIORITY_WINDOW:
+                ok = now >= self.blocked_until and self.daily_remaining > 0 and self.minute_tokens >= 1
+            if ok:
+                self.minute_tokens -= 1
+                self.pace_tokens = max(0.0, self.pace_tokens - 1)
+                self.daily_remaining -= 1
+                self.granted[priority] = self.granted.get(priority, 0) + 1
+            else:
+                self.denied[priority] = self.denied.get(priority, 0) + 1
+            return ok
+
+    def _scaled(self, value: Optional[int]) -> Optional[int]:
+        if value is None or self.share == 1.0:
+            return value
+        return int(value * self.share)
+
+    def update(self, headers, status_code: int = 200):
+        """Sincroniza com os headers de rate-limit da resposta (e trata 429)."""
+        with self._lock:
+            day_left_total = _header_int(headers, 'x-ratelimit-requests-remaining')
+            day_limit = self._scaled(_header_int(headers, 'x-ratelimit-requests-limit'))
+            day_left = self._scaled(day_left_total)
+            min_limit = self._scaled(_header_int(headers, 'X-RateLimit-Limit'))
+            min_left = self._scaled(_header_int(headers, 'X-RateLimit-Remaining'))
+            if day_limit:
+                self.daily_limit = day_limit
+            if day_left is not None:
+                self.daily_remaining = day_left
+            if min_limit:
+                self.per_minute = max(1, min_limit)
+            if min_left is not None:
+                self.minute_tokens = min(self.minute_tokens, float(min_left))
+            if status_code == 429:
+                retry = _header_int(headers, 'Retry-After') or 60
+                self.blocked_until = time.monotonic() + retry
+                self.minute_tokens = 0.0
+                logger.warning('API-Football 429: pausando requisições por %ss', retry)
+            elif day_left_total == 0:
+                self.blocked_until = time.monotonic() + _seconds_until_utc_midnight(datetime.now(timezone.utc))
+                logger.warning('Cota diária da API-Football esgotada até 00:00 UTC')
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill()
+            return {
+                'minute_tokens': round(self.minute_tokens, 2),
+                'per_minute': self.per_minute,
+                'daily_remaining': self.daily_remaining,
+                'daily_limit': self.daily_limit,
+                'pace_per_minute': round(self.pace_per_second() * 60, 2),
+                'blocked_for': max(0.0, round(self.blocked_until - time.monotonic(), 1)),
+                'share': self.share,
+                'granted': dict(self.granted),
+                'denied': dict(self.denied),
+            }
+
+
+def fixture_priority(minute: float, league_id, windows, priority_leagues, near_minutes: float = 3) -> int:
+    """Prioridade de uma fixture: janela (ou a near_minutes dela) > liga prioritária > resto."""
+    to_window = minutes_to_window(minute or 0, windows)
+    if to_window is not None and to_window <= near_minutes:
+        return PRIORITY_WINDOW
+    if league_id in priority_leagues:
+        return PRIORITY_LEAGUE
+    return PRIORITY_OTHER
+
+
+def install(api_base: str, budget: ApiBudget = None) -> ApiBudget:
+    """Registra o orçamento no http_client para o host da API (idempotente por host)."""
+    import http_client
+    existing = http_client.budget_for(api_base)
+    if existing is not None:
+        return existing
+    budget = budget or ApiBudget()
+    http_client.set_budget(api_base, budget)
+    return budget
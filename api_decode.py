@@ -0,0 +1,195 @@
+"""
+api_decode.py
+Decode das respostas da API-Football direto para o que o bot usa.
+
+r.json() monta em Python o corpo inteiro de /fixtures?live=all e /fixtures?ids=...
+(periods, referee, logos, flags, events, lineups, players...) para o bot ler meia
+dúzia de campos. Aqui cada endpoint tem um esquema com só esses campos:
+
+- com msgspec instalado, o decoder percorre o JSON e pula o resto sem criar
+  objetos Python (menos tempo e bem menos pico de memória);
+- sem msgspec (ou se a API mandar um tipo fora do esquema), cai no json da
+  biblioteca padrão e projeta o resultado do mesmo jeito.
+
+As saídas são as mesmas nos dois caminhos:
+- live_fixtures(body)       -> List[FixtureSnapshot]
+- fixture_statistics(body)  -> {fixture_id: statistics} de /fixtures?ids=...
+- statistics(body)          -> lista de {'team', 'statistics'} de /fixtures/statistics
+
+Environment variables (opcionais):
+- API_DECODER ('auto' ou 'json'; padrão 'auto' = msgspec quando disponível)
+"""
+
+import os
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from fixture_snapshot import FixtureSnapshot, parse_fixtures
+
+try:
+    import msgspec
+except ImportError:  # opcional: sem ele fica o json da stdlib
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+API_DECODER = os.getenv('API_DECODER', 'auto').lower()
+
+BACKEND = 'msgspec' if msgspec is not None and API_DECODER != 'json' else 'json'
+
+
+# ---------- STDLIB ----------
+def _response(body) -> List[Any]:
+    return json.loads(body).get('response') or []
+
+
+def live_fixtures_json(body) -> List[FixtureSnapshot]:
+    return parse_fixtures(_response(body))
+
+
+def fixture_statistics_json(body) -> Dict[Any, List[Dict[str, Any]]]:
+    out = {}
+    for item in _response(body):
+        fid = (item.get('fixture') or {}).get('id')
+        if fid is not None:
+            out[fid] = item.get('statistics') or []
+    return out
+
+
+def statistics_json(body) -> List[Dict[str, Any]]:
+    return _response(body)
+
+
+# ---------- MSGSPEC ----------
+if msgspec is not None:
+    class _Status(msgspec.Struct):
+        short: Optional[str] = None
+        elapsed: Optional[int] = None
+
+    class _Venue(msgspec.Struct):
+        name: Optional[str] = None
+
+    class _Info(msgspec.Struct):
+        id: Optional[int] = None
+        status: Optional[_Status] = None
+        venue: Optional[_Venue] = None
+
+    class _League(msgspec.Struct):
+        id: Optional[int] = None
+        name: Optional[str] = None
+        season: Optional[int] = None
+
+    class _Team(msgspec.Struct):
+        id: Optional[int] = None
+        name: Optional[str] = None
+
+    class _Teams(msgspec.Struct):
+        home: Optional[_Team] = None
+        away: Optional[_Team] = None
+
+    class _Goals(msgspec.Struct):
+        home: Optional[int] = None
+        away: Optional[int] = None
+
+    class _Score(msgspec.Struct):
+        halftime: Optional[_Goals] = None
+        fulltime: Optional[_Goals] = None
+
+    class _LiveItem(msgspec.Struct):
+        fixture: Optional[_Info] = None
+        league: Optional[_League] = None
+        teams: Optional[_Teams] = None
+        goals: Optional[_Goals] = None
+        score: Optional[_Score] = None
+
+    class _LiveResponse(msgspec.Struct):
+        response: Optional[List[_LiveItem]] = None
+
+    class _StatsItemInfo(msgspec.Struct):
+        id: Optional[int] = None
+
+    class _StatsItem(msgspec.Struct):
+        fixture: Optional[_StatsItemInfo] = None
+        statistics: Optional[List[Dict[str, Any]]] = None
+
+    class _StatsItemResponse(msgspec.Struct):
+        response: Optional[List[_StatsItem]] = None
+
+    class _StatsResponse(msgspec.Struct):
+        response: Optional[List[Dict[str, Any]]] = None
+
+    _live_decoder = msgspec.json.Decoder(_LiveResponse)
+    _stats_item_decoder = msgspec.json.Decoder(_StatsItemResponse)
+    _stats_decoder = msgspec.json.Decoder(_StatsResponse)
+
+    _NO_STATUS = _Status()
+    _NO_VENUE = _Venue()
+    _NO_INFO = _Info()
+    _NO_LEAGUE = _League()
+    _NO_TEAM = _Team()
+    _NO_TEAMS = _Teams()
+    _NO_GOALS = _Goals()
+    _NO_SCORE = _Score()
+
+    def _snapshot(item: '_LiveItem') -> FixtureSnapshot:
+        info = item.fixture or _NO_INFO
+        status = info.status or _NO_STATUS
+        league = item.league or _NO_LEAGUE
+        teams = item.teams or _NO_TEAMS
+        home = teams.home or _NO_TEAM
+        away = teams.away or _NO_TEAM
+        goals = item.goals or _NO_GOALS
+        score = item.score or _NO_SCORE
+        halftime = score.halftime or _NO_GOALS
+        fulltime = score.fulltime or _NO_GOALS
+        return FixtureSnapshot(
+            info.id, status.short or '', status.elapsed or 0, (info.venue or _NO_VENUE).name or '',
+            league.id, league.name, league.season,
+            home.id, home.name, away.id, away.name,
+            goals.home, goals.away,
+            halftime.home, halftime.away, fulltime.home, fulltime.away,
+        )
+
+    def live_fixtures_msgspec(body) -> List[FixtureSnapshot]:
+        items = _live_decoder.decode(body).response or ()
+        return [_snapshot(item) for item in items if item.fixture is not None and item.fixture.id is not None]
+
+    def fixture_statistics_msgspec(body) -> Dict[Any, List[Dict[str, Any]]]:
+        return {item.fixture.id: item.statistics or []
+                for item in _stats_item_decoder.decode(body).response or ()
+                if item.fixture is not None and item.fixture.id is not None}
+
+    def statistics_msgspec(body) -> List[Dict[str, Any]]:
+        return _stats_decoder.decode(body).response or []
+
+
+# ---------- ENTRADA ----------
+def _decode(name: str, fast, slow, body):
+    try:
+        return fast(body)
+    except msgspec.ValidationError as e:
+        # tipo fora do esquema (ex.: id como string): este corpo vai pelo json
+        logger.warning('Decode %s fora do esquema (%s); usando json', name, e)
+    return slow(body)
+
+
+def live_fixtures(body) -> List[FixtureSnapshot]:
+    """Corpo de /fixtures?live=all -> snapshots (itens sem fixture.id são descartados)."""
+    if BACKEND == 'msgspec':
+        return _decode('live', live_fixtures_msgspec, live_fixtures_json, body)
+    return live_fixtures_json(body)
+
+
+def fixture_statistics(body) -> Dict[Any, List[Dict[str, Any]]]:
+    """Corpo de /fixtures?ids=a-b-c -> {fixture_id: statistics}; events/lineups/players nem são montados."""
+    if BACKEND == 'msgspec':
+        return _decode('ids', fixture_statistics_msgspec, fixture_statistics_json, body)
+    return fixture_statistics_json(body)
+
+
+def statistics(body) -> List[Dict[str, Any]]:
+    """Corpo de /fixtures/statistics?fixture=N -> lista de {'team', 'statistics'}."""
+    if BACKEND == 'msgspec':
+        return _decode('statistics', statistics_msgspec, statistics_json, body)
+    return statistics_json(body)
@@ -0,0 +1,107 @@
+"""
+api_recorder.py
+Gravação das respostas da API-Football em JSONL comprimido (gzip), com timestamp.
+
+Cada resposta de /fixtures?live=all, /fixtures/statistics, /fixtures?ids=... (e
+/standings) vira uma linha:
+  {"ts": 1697040000.12, "method": "GET", "url": "/fixtures?live=all", "status": 200, "body": {...}}
+
+- Um arquivo por dia UTC e por processo: api-AAAAMMDD-HHMMSS.jsonl.gz (início da gravação).
+  Um sábado inteiro de captura = os arquivos daquele dia; replay.py lê e intercala vários.
+- O gzip recebe flush periódico: se o processo cair, o que já foi gravado continua legível.
+- O header com a chave da API nunca é gravado.
+
+Environment variables (opcionais):
+- API_RECORD_DIR (diretório das capturas; sem ele não grava nada)
+- API_RECORD_PATHS (prefixos gravados, padrão /fixtures,/standings)
+- API_RECORD_FLUSH (segundos entre flushes do gzip, padrão 5)
+"""
+
+import os
+import gzip
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Sequence
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+API_RECORD_DIR = os.getenv('API_RECORD_DIR')
+API_RECORD_PATHS = [p.strip() for p in os.getenv('API_RECORD_PATHS', '/fixtures,/standings').split(',') if p.strip()]
+API_RECORD_FLUSH = float(os.getenv('API_RECORD_FLUSH', '5'))
+
+
+class ApiRecorder:
+    def __init__(self, directory: str, paths: Sequence[str] = None, flush_interval: float = API_RECORD_FLUSH):
+        self.directory = directory
+        self.paths = tuple(paths or API_RECORD_PATHS)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._day = None
+        self._last_flush = time.monotonic()
+        self.path: Optional[str] = None
+        self.records = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self, now_utc: datetime):
+        if self._file is not None:
+            self._file.close()
+        self._day = now_utc.date()
+        self.path = os.path.join(self.directory, f"api-{now_utc.strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        self._file = gzip.open(self.path, 'at', encoding='utf-8', compresslevel=6)
+        logger.info('Gravando respostas da API em %s', self.path)
+
+    def record(self, method: str, url: str, status: int, content: bytes):
+        parts = urlsplit(str(url))
+        if not parts.path.startswith(self.paths):
+            return
+        try:
+            body: Any = json.loads(content)
+        except (TypeError, ValueError):
+            body = content.decode('utf-8', 'replace') if isinstance(content, bytes) else content
+        ts = time.time()
+        line = json.dumps({
+            'ts': round(ts, 3),
+            'method': method,
+            'url': parts.path + ('?' + parts.query if parts.query else ''),
+            'status': status,
+            'body': body,
+        }, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            try:
+                now_utc = datetime.fromtimestamp(ts, timezone.utc)
+                if self._file is None or now_utc.date() != self._day:
+                    self._open(now_utc)
+                self._file.write(line + '\n')
+                self.records += 1
+                if time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._file.flush()
+                    self._last_flush = time.monotonic()
+            except OSError as e:
+                logger.warning('Erro ao gravar captura da API: %s', e)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {'path': self.path, 'records': self.records}
+
+
+def install(api_base: str, directory: str = None) -> Optional[ApiRecorder]:
+    """Liga a gravação para o host da API se API_RECORD_DIR estiver definido."""
+    import http_client
+    directory = directory or API_RECORD_DIR
+    if not directory:
+        return None
+    recorder = ApiRecorder(directory)
+    http_client.set_recorder(api_base, recorder)
+    atexit.register(recorder.close)
+    return recorder
@@ -0,0 +1,384 @@
+"""
+bench.py
+Micro-benchmarks dos caminhos quentes do scoring, com payloads sintéticos.
+
+Mede, para 1, 100 e 2000 partidas ao vivo (dados determinísticos, seed fixa):
+- VIP PLUS: extract_basic_stats, pressure_score, evaluate_candidate_lines
+  (por fixture e em lote), build_vip_message
+- RP: compute_match_score, estimate_probability_of_corners, build_signal_text
+- parse_fixtures: dict da API -> FixtureSnapshot (entrada de todos os casos acima)
+- decode de /fixtures?live=all (api_decode): json da stdlib x msgspec, com o
+  corpo completo da API (periods, logos, events...); guarda também o pico de
+  alocação (tracemalloc) de um decode. --payload usa a maior lista ao vivo de
+  uma captura do api_recorder (ex.: o horário de pico de um sábado)
+- com --payload, extract_basic_stats também roda sobre as statistics gravadas
+  (/fixtures?ids e /fixtures/statistics da captura, até BENCH_RECORDED_STATS partidas)
+- subscriptions.match: chats que recebem o sinal de cada partida, com
+  BENCH_SUBSCRIBERS assinaturas sintéticas (ligas, janelas e mínimos variados)
+
+Cada caso processa as N partidas de uma vez e é repetido até ~BENCH_MIN_TIME
+segundos; o resultado guarda o melhor tempo (o mais estável) e a mediana.
+A saída é JSON com chaves ordenadas e esquema fixo, para comparar entre commits:
+
+  python bench.py > bench_output.txt
+  python bench.py --baseline bench_base.json          # mostra a razão atual/base
+  python bench.py --baseline bench_base.json --fail-over 1.5
+
+Nada toca a rede (nem o disco, fora --payload): a classificação vem de um loader sintético.
+
+Environment variables (opcionais):
+- BENCH_MIN_TIME (segundos por caso, padrão 0.2)
+- BENCH_SIZES (padrão 1,100,2000)
+- BENCH_RECORDED_STATS (padrão 2000)
+- BENCH_SUBSCRIBERS (padrão 5000)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import statistics
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import numpy
+
+import api_decode
+from fixture_snapshot import FixtureSnapshot, parse_fixtures
+from subscriptions import Subscription, SubscriptionStore
+
+BENCH_MIN_TIME = float(os.getenv('BENCH_MIN_TIME', '0.2'))
+BENCH_SIZES = [int(x) for x in os.getenv('BENCH_SIZES', '1,100,2000').split(',') if x.strip()]
+BENCH_RECORDED_STATS = int(os.getenv('BENCH_RECORDED_STATS', '2000'))
+BENCH_SUBSCRIBERS = int(os.getenv('BENCH_SUBSCRIBERS', '5000'))
+SCHEMA_VERSION = 1
+SEED = 20240101
+
+STAT_TYPES = [
+    'Shots on Goal', 'Shots off Goal', 'Total Shots', 'Blocked Shots', 'Shots insidebox',
+    'Shots outsidebox', 'Fouls', 'Corner Kicks', 'Offsides', 'Ball Possession', 'Yellow Cards',
+    'Red Cards', 'Goalkeeper Saves', 'Total passes', 'Passes accurate', 'Passes %',
+    'expected_goals', 'Attacks', 'Dangerous Attacks',
+]
+
+
+# ---------- PAYLOADS SINTÉTICOS ----------
+def _stat_value(rng: random.Random, stat_type: str, minute: int):
+    if stat_type in ('Ball Possession', 'Passes %'):
+        return f'{rng.randint(30, 70)}%'
+    if stat_type == 'expected_goals':
+        return f'{rng.random() * 2:.2f}'
+    if stat_type in ('Red Cards', 'Yellow Cards') and rng.random() < 0.5:
+        return None  # a API manda null quando é zero
+    scale = {'Attacks': 1.2, 'Dangerous Attacks': 0.6, 'Total passes': 5.0, 'Passes accurate': 4.0}.get(stat_type, 0.12)
+    return int(rng.random() * scale * minute) + rng.randint(0, 2)
+
+
+def make_fixture(rng: random.Random, idx: int) -> Dict[str, Any]:
+    minute = rng.randint(1, 90)
+    return {
+        'fixture': {
+            'id': 1_000_000 + idx,
+            'status': {'elapsed': minute, 'short': '1H' if minute <= 45 else '2H'},
+            'venue': {'name': rng.choice(['Turf Moor', 'Anfield', 'Bramall Lane', 'Estadio Municipal'])},
+        },
+        'league': {'id': rng.choice([39, 78, 140, 61, 135, 71, 128, 2]), 'name': 'Liga Sintética', 'season': 2024},
+        'teams': {
+            'home': {'id': (2 * idx) % 40, 'name': f'Casa {idx}'},
+            'away': {'id': (2 * idx + 1) % 40, 'name': f'Fora {idx}'},
+        },
+        'goals': {'home': rng.randint(0, 3), 'away': rng.randint(0, 3)},
+    }
+
+
+def make_statistics(rng: random.Random, fixture: Dict[str, Any]) -> List[Dict[str, Any]]:
+    minute = fixture['fixture']['status']['elapsed']
+    return [
+        {
+            'team': {'id': fixture['teams'][side]['id'], 'name': fixture['teams'][side]['name']},
+            'statistics': [{'type': t, 'value': _stat_value(rng, t, minute)} for t in STAT_TYPES],
+        }
+        for side in ('home', 'away')
+    ]
+
+
+def make_payloads(n: int):
+    rng = random.Random(SEED + n)
+    fixtures = [make_fixture(rng, i) for i in range(n)]
+    stats = [make_statistics(rng, f) for f in fixtures]
+    return fixtures, stats
+
+
+def make_api_item(rng: random.Random, fixture: Dict[str, Any]) -> Dict[str, Any]:
+    """Item de /fixtures?live=all com os campos que a API manda e o bot não lê."""
+    info, league, teams = fixture['fixture'], fixture['league'], fixture['teams']
+    minute = info['status']['elapsed']
+    logo = 'https://media.api-sports.io/football/{}/{}.png'
+    events = [{
+        'time': {'elapsed': rng.randint(1, minute), 'extra': None},
+        'team': dict(teams[side], logo=logo.format('teams', teams[side]['id'])),
+        'player': {'id': rng.randint(1, 99999), 'name': f'Jogador {rng.randint(1, 999)}'},
+        'assist': {'id': None, 'name': None},
+        'type': rng.choice(['Card', 'subst', 'Goal', 'Var']), 'detail': 'Yellow Card', 'comments': None,
+    } for side in rng.choices(('home', 'away'), k=rng.randint(0, 8))]
+    return {
+        'fixture': {
+            'id': info['id'], 'referee': 'Árbitro Sintético', 'timezone': 'UTC',
+            'date': '2024-01-06T15:00:00+00:00', 'timestamp': 1704553200,
+            'periods': {'first': 1704553200, 'second': 1704556800 if minute > 45 else None},
+            'venue': {'id': rng.randint(1, 5000), 'name': info['venue']['name'], 'city': 'Cidade'},
+            'status': {'long': 'Second Half' if minute > 45 else 'First Half', 'short': info['status']['short'],
+                       'elapsed': minute, 'extra': None},
+        },
+        'league': dict(league, country='Brasil', logo=logo.format('leagues', league['id']),
+                       flag='https://media.api-sports.io/flags/br.svg', round='Regular Season - 20'),
+        'teams': {side: dict(teams[side], logo=logo.format('teams', teams[side]['id']), winner=None)
+                  for side in ('home', 'away')},
+        'goals': fixture['goals'],
+        'score': {
+            'halftime': dict(fixture['goals']) if minute > 45 else {'home': None, 'away': None},
+            'fulltime': {'home': None, 'away': None},
+            'extratime': {'home': None, 'away': None},
+            'penalty': {'home': None, 'away': None},
+        },
+        'events': events,
+    }
+
+
+def make_live_body(n: int) -> bytes:
+    rng = random.Random(SEED + n)
+    items = [make_api_item(rng, make_fixture(rng, i)) for i in range(n)]
+    return json.dumps({'get': 'fixtures', 'parameters': {'live': 'all'}, 'errors': [], 'results': n,
+                       'paging': {'current': 1, 'total': 1}, 'response': items}).encode()
+
+
+def recorded_live_body(path: str) -> bytes:
+    """Maior corpo de /fixtures?live=all de uma captura do api_recorder."""
+    from replay import read_capture
+    best = None
+    for rec in read_capture(path):
+        if rec.get('status') == 200 and rec.get('url', '').startswith('/fixtures?live'):
+            body = rec.get('body') or {}
+            if best is None or len(body.get('response') or ()) > len(best.get('response') or ()):
+                best = body
+    if best is None:
+        raise SystemExit(f'Nenhuma lista ao vivo em {path}')
+    return json.dumps(best).encode()
+
+
+def recorded_statistics(path: str, limit: int = BENCH_RECORDED_STATS):
+    """(snapshot, statistics) das respostas gravadas, uma por fixture (a última vista)."""
+    from replay import read_capture
+    pairs: Dict[Any, Any] = {}
+    for rec in read_capture(path):
+        url = rec.get('url', '')
+        if rec.get('status') != 200 or not url.startswith('/fixtures'):
+            continue
+        items = (rec.get('body') or {}).get('response') or []
+        if url.startswith('/fixtures?ids'):
+            for item in items:
+                snap = FixtureSnapshot.from_api(item)
+                if snap.id is not None and item.get('statistics'):
+                    pairs[snap.id] = (snap, item['statistics'])
+        elif url.startswith('/fixtures/statistics') and items:
+            # sem o item da partida: o primeiro time da resposta faz o papel de mandante
+            home_id = (items[0].get('team') or {}).get('id')
+            pairs[url] = (FixtureSnapshot(url, home_id=home_id), items)
+    return list(pairs.values())[-limit:]
+
+
+def synthetic_standings(league_id, season):
+    groups = [[{'rank': i + 1, 'team': {'id': g * 20 + i}} for i in range(20)] for g in range(2)]
+    return [{'league': {'id': league_id, 'season': season, 'standings': groups}}]
+
+
+# ---------- EXECUÇÃO ----------
+def make_subscriptions(count: int, leagues: List[Any]) -> SubscriptionStore:
+    rng = random.Random(SEED)
+    store = SubscriptionStore(':memory:')
+    store.subscribe_many(Subscription(
+        -1000000 - i,
+        leagues=frozenset(rng.sample(leagues, min(2, len(leagues)))) if rng.random() < 0.5 else frozenset(),
+        windows=frozenset([rng.choice(('HT', 'FT'))]) if rng.random() < 0.3 else frozenset(),
+        min_p_ge_1=round(rng.uniform(0.0, 0.8), 2),
+    ) for i in range(count))
+    return store
+
+
+def timeit(fn: Callable[[], Any], min_time: float = BENCH_MIN_TIME, min_repeats: int = 5) -> List[float]:
+    fn()  # aquece (imports tardios, caches de primeira chamada)
+    runs: List[float] = []
+    started = time.perf_counter()
+    while len(runs) < min_repeats or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter_ns()
+        fn()
+        runs.append((time.perf_counter_ns() - t0) / 1e6)
+    return runs
+
+
+def peak_alloc_kb(fn: Callable[[], Any]) -> float:
+    """Pico de memória alocada (tracemalloc) durante uma chamada, com o resultado ainda vivo."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return round(peak / 1024, 1)
+
+
+def decode_cases(body: bytes) -> Dict[str, Callable[[], Any]]:
+    cases = {'decode.live_fixtures.json': lambda: api_decode.live_fixtures_json(body)}
+    if api_decode.msgspec is not None:
+        cases['decode.live_fixtures.msgspec'] = lambda: api_decode.live_fixtures_msgspec(body)
+    return cases
+
+
+def build_cases(vip, rp, n: int) -> Dict[str, Callable[[], Any]]:
+    raw_fixtures, stats = make_payloads(n)
+    fixtures = parse_fixtures(raw_fixtures)
+    pairs = list(zip(fixtures, stats))
+    extracted = [vip.extract_basic_stats(f, s) for f, s in pairs]
+    totals = [h['corners'] + a['corners'] for h, a in extracted]
+    lines = vip.evaluate_candidate_lines_batch(totals, [1.5] * n)
+    vip_metrics = []
+    for f, (h, a) in zip(fixtures, extracted):
+        vip_metrics.append({
+            'minute': f.elapsed, 'total_corners': h['corners'] + a['corners'],
+            'home_corners': h['corners'], 'away_corners': a['corners'],
+            'home_attacks': h['attacks'], 'away_attacks': a['attacks'],
+            'home_danger': h['danger'], 'away_danger': a['danger'],
+            'pressure': True, 'small_stadium': False,
+        })
+    rp_metrics = [{
+        'minute': 36, 'home_corners': h['corners'], 'away_corners': a['corners'],
+        'total_corners': h['corners'] + a['corners'], 'lam': 0.8, 'p_ge_1': 0.62, 'p_ge_2': 0.31,
+        'small_stadium': False, 'league_weight': 0.05,
+    } for h, a in extracted]
+    minutes = [f.elapsed for f in fixtures]
+    store = make_subscriptions(BENCH_SUBSCRIBERS, sorted({f.league_id for f in fixtures}, key=str))
+
+    return {
+        'snapshot.parse_fixtures': lambda: parse_fixtures(raw_fixtures),
+        'vip.extract_basic_stats': lambda: [vip.extract_basic_stats(f, s) for f, s in pairs],
+        'vip.pressure_score': lambda: [vip.pressure_score(h, a) for h, a in extracted],
+        'vip.evaluate_candidate_lines': lambda: [vip.evaluate_candidate_lines(t, 1.5) for t in totals],
+        'vip.evaluate_candidate_lines_batch': lambda: vip.evaluate_candidate_lines_batch(totals, [1.5] * n),
+        'vip.build_vip_message': lambda: [vip.build_vip_message(f, 'HT', m, ln)
+                                          for f, m, ln in zip(fixtures, vip_metrics, lines)],
+        'rp.compute_match_score': lambda: [rp.compute_match_score(f, s) for f, s in pairs],
+        'rp.estimate_probability_of_corners': lambda: [rp.estimate_probability_of_corners(90 - m, t, m)
+                                                       for m, t in zip(minutes, totals)],
+        'rp.build_signal_text': lambda: [rp.build_signal_text(f, 'HT', m) for f, m in zip(fixtures, rp_metrics)],
+        'subscriptions.match': lambda: [store.match('rp', f.league_id, 'HT', m['p_ge_1'])
+                                        for f, m in zip(fixtures, rp_metrics)],
+    }
+
+
+def _measure(fn: Callable[[], Any], n: int, with_alloc: bool) -> Dict[str, Any]:
+    runs = timeit(fn)
+    best = min(runs)
+    entry = {
+        'fixtures': n,
+        'repeats': len(runs),
+        'best_ms': round(best, 4),
+        'median_ms': round(statistics.median(runs), 4),
+        'per_fixture_us': round(best * 1000 / n, 3),
+    }
+    if with_alloc:
+        entry['peak_alloc_kb'] = peak_alloc_kb(fn)
+    return entry
+
+
+def run(sizes: List[int], vip_bot: str, rp_bot: str, only: str = None, payload: str = None) -> Dict[str, Any]:
+    from replay import load_bot  # importa os bots em modo offline (sem disco/rede)
+    from standings_cache import StandingsCache
+
+    vip = load_bot(vip_bot)
+    rp = load_bot(rp_bot)
+    rp.standings_cache = StandingsCache(synthetic_standings)
+
+    results: Dict[str, Any] = {}
+    for n in sizes:
+        cases = dict(build_cases(vip, rp, n), **decode_cases(make_live_body(n)))
+        for name, fn in cases.items():
+            if only and only not in name:
+                continue
+            results[f'{name}[{n}]'] = _measure(fn, n, name.startswith('decode.'))
+    if payload:
+        body = recorded_live_body(payload)
+        n = max(1, len(api_decode.live_fixtures_json(body)))
+        for name, fn in decode_cases(body).items():
+            if not only or only in name:
+                results[f'{name}[recorded]'] = dict(_measure(fn, n, True), body_kb=round(len(body) / 1024, 1))
+        pairs = recorded_statistics(payload)
+        name = 'vip.extract_basic_stats'
+        if pairs and (not only or only in name):
+            results[f'{name}[recorded]'] = _measure(lambda: [vip.extract_basic_stats(f, s) for f, s in pairs],
+                                                    len(pairs), False)
+    return {
+        'schema': SCHEMA_VERSION,
+        'env': {
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'msgspec': getattr(api_decode.msgspec, '__version__', None),
+            'payload': payload,
+            'machine': platform.machine(),
+            'vip_bot': vip_bot,
+            'rp_bot': rp_bot,
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, float]:
+    """Razão best_ms atual/base por caso presente nos dois (>1 = mais lento)."""
+    ratios = {}
+    for key, cur in current['results'].items():
+        base = baseline.get('results', {}).get(key)
+        if base and base.get('best_ms'):
+            ratios[key] = round(cur['best_ms'] / base['best_ms'], 3)
+    return ratios
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Micro-benchmarks do scoring')
+    parser.add_argument('--sizes', default=','.join(str(n) for n in BENCH_SIZES))
+    parser.add_argument('--only', help='roda só os casos cujo nome contém este texto')
+    parser.add_argument('--vip-bot', default='bot_escanteios_rp_v3')
+    parser.add_argument('--rp-bot', default='bot_escanteios_rp_v2')
+    parser.add_argument('--payload', help='captura .jsonl(.gz) do api_recorder para os casos de decode')
+    parser.add_argument('--out', help='grava o JSON neste arquivo')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--fail-over', type=float, help='sai com erro se algum caso ficar N vezes mais lento')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    sizes = [int(x) for x in args.sizes.split(',') if x.strip()]
+    report = run(sizes, args.vip_bot, args.rp_bot, args.only, args.payload)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            ratios = compare(report, json.load(f))
+        report['vs_baseline'] = ratios
+        if args.fail_over:
+            regressions = [k for k, r in ratios.items() if r > args.fail_over]
+
+    text = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+    if regressions:
+        print(f'Regressão acima de {args.fail_over}x: {", ".join(sorted(regressions))}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,30 @@
 # bot_escanteios_rp.py — sinais HT/FT de escanteios asiáticos ao vivo com API-Football
+#
+# Um único event loop (asyncio.run(main())) atende o servidor do webhook
+# (tornado, que já vem com python-telegram-bot[webhooks]), os comandos do
+# Application e o poller de jogos ao vivo. O webhook só enfileira o update em
+# application.update_queue; a API-Football é chamada pelo AsyncClient do
+# http_client ligado a esse mesmo loop, então nenhuma etapa bloqueia as outras.
 
 import os
+import re
+import json
+import signal
 import logging
 import asyncio
-import requests
-from flask import Flask, request
+import httpx
+import http_client
+import api_decode
+import api_budget
+from api_budget import BudgetExceeded, PRIORITY_WINDOW
+from fixture_snapshot import score_text
+from signal_store import SignalStore
+from subscriptions import SubscriptionStore, handle_command, is_admin
 from telegram import Update
 from telegram.constants import ParseMode
+from telegram.error import Forbidden, RetryAfter, TelegramError
 from telegram.ext import Application, CommandHandler, ContextTypes
+from tornado.web import Application as WebApplication, RequestHandler
 
 # -----------------------------
 # LOG
@@ -22,18 +39,31 @@ logger = logging.getLogger(__name__)
 # VARIÁVEIS DE AMBIENTE
 # -----------------------------
 TOKEN = os.getenv("TOKEN")
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")  # recebe tudo, sem filtros (como nos outros bots)
 API_FOOTBALL_KEY = os.getenv("API_FOOTBALL_KEY")
 WEBHOOK_URL = f"https://bot-escanteios17.onrender.com/{TOKEN}"
+PORT = int(os.environ.get("PORT", 10000))
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))  # msg/s no total (limite do Telegram)
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "5"))  # tentativas por mensagem com 429
+API_BASE = os.getenv("API_FOOTBALL_BASE", "https://v3.football.api-sports.io")
 
 if not TOKEN or not API_FOOTBALL_KEY:
     raise ValueError("⚠️ Variáveis TOKEN ou API_FOOTBALL_KEY não definidas!")
 
 # -----------------------------
-# BOT E FLASK
+# BOT
 # -----------------------------
-app = Flask(__name__)
-application = Application.builder().token(TOKEN).build()
-CHAT_ID = None
+# updater(None): o webhook é servido por este módulo, não pelo Updater do PTB;
+# concurrent_updates: uma resposta lenta não segura os outros updates de uma rajada
+application = Application.builder().token(TOKEN).updater(None).concurrent_updates(True).build()
+STRATEGY = "perdendo"
+subscriptions = SubscriptionStore()  # chats que recebem os sinais, cada um com os seus filtros
+subscriptions.ensure(TELEGRAM_CHAT_ID)
+if not subscriptions.all():
+    logger.warning("Nenhum chat assinado: defina TELEGRAM_CHAT_ID ou mande /id de um chat em ADMIN_CHAT_IDS")
+fila_envio: "asyncio.Queue" = None  # (chat_id, mensagem); criada em main(), no loop do bot
+sent_signals = SignalStore()  # (fixture, tipo) já enviado: a estratégia casa em todo poll da janela
+api_budget.install(API_BASE)  # cota/rate-limit da API-Football
 
 # -----------------------------
 # COMANDOS
@@ -42,24 +72,40 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("🚀 Bot de Escanteios Ativo! Pronto para detectar sinais ao vivo!")
 
 async def get_chat_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    global CHAT_ID
-    CHAT_ID = update.effective_chat.id
-    await update.message.reply_text(f"✅ Chat ID deste chat salvo!\nID: {CHAT_ID}")
-    logger.info(f"Chat ID capturado: {CHAT_ID}")
+    chat_id = update.effective_chat.id
+    if not is_admin(chat_id):
+        await update.message.reply_text(f"🆔 Chat ID deste chat: {chat_id}")
+        return
+    subscriptions.ensure(chat_id)  # como o /id antigo: o chat passa a receber os sinais (sem filtros; /assinar troca)
+    await update.message.reply_text(f"✅ Chat ID deste chat salvo!\nID: {chat_id}")
+    logger.info(f"Chat ID capturado: {chat_id}")
+
+async def assinatura(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # /assinar [ligas=..] [janelas=HT,FT], /cancelar, /filtros
+    await update.message.reply_text(handle_command(subscriptions, update.effective_chat.id, update.message.text))
 
 application.add_handler(CommandHandler("start", start))
 application.add_handler(CommandHandler("id", get_chat_id))
+application.add_handler(CommandHandler(["assinar", "cancelar", "filtros"], assinatura))
 
 # -----------------------------
 # FUNÇÕES DE API-Football
 # -----------------------------
-def obter_jogos_ao_vivo():
-    url = "https://v3.football.api-sports.io/fixtures"
+async def obter_jogos_ao_vivo():
+    url = f"{API_BASE}/fixtures"
     headers = {"x-apisports-key": API_FOOTBALL_KEY}
     params = {"live": "all"}
-    response = requests.get(url, headers=headers, params=params)
+    try:
+        response = await http_client.request_async("GET", url, headers=headers, params=params,
+                                                   priority=PRIORITY_WINDOW)
+    except BudgetExceeded as e:
+        logger.warning(f"Lista ao vivo adiada: {e}")
+        return []
+    except httpx.HTTPError as e:
+        logger.error(f"Erro API-Football: {e!r}")
+        return []
     if response.status_code == 200:
-        return response.json().get("response", [])
+        return api_decode.live_fixtures(response.content)  # só os campos usados pelas estratégias
     else:
         logger.error(f"Erro API-Football: {response.status_code}")
         return []
@@ -71,11 +117,9 @@ def analisar_sinal(jogo):
     """
     Detecta sinais HT/FT de escanteios asiáticos
     """
-    fixture = jogo["fixture"]
-    score = jogo["score"]
-    elapsed = score.get("elapsed", 0)
-    home_goals = score["halftime"]["home"] if score.get("halftime") else 0
-    away_goals = score["halftime"]["away"] if score.get("halftime") else 0
+    elapsed = jogo.elapsed
+    home_goals = jogo.ht_home or 0
+    away_goals = jogo.ht_away or 0
 
     # Estratégia HT (33-38')
     if 33 <= elapsed <= 38 and home_goals < away_goals:
@@ -89,18 +133,15 @@ def analisar_sinal(jogo):
 # FORMATAÇÃO DE MENSAGEM
 # -----------------------------
 def formatar_mensagem(jogo, tipo):
-    fixture = jogo["fixture"]
-    league = jogo["league"]["name"]
-    teams = jogo["teams"]
-    score = jogo["score"]
-    elapsed = score.get("elapsed", 0)
-    placar = f"{score['fulltime']['home']} x {score['fulltime']['away']}"
+    league = jogo.league_name
+    elapsed = jogo.elapsed
+    placar = score_text(jogo.ft_home, jogo.ft_away)
     cantos = "—"  # Placeholder: depois pode colocar corners reais
     odds = "—"    # Placeholder: depois integra Odds API
 
     return (
         f"📣 Alerta Estratégia: {tipo}\n"
-        f"🏟 Jogo: {teams['home']['name']} x {teams['away']['name']}\n"
+        f"🏟 Jogo: {jogo.home_name} x {jogo.away_name}\n"
         f"🏆 Competição: {league}\n"
         f"🕛 Tempo: {elapsed}'\n"
         f"⚽ Placar: {placar}\n"
@@ -115,42 +156,103 @@ def formatar_mensagem(jogo, tipo):
 # -----------------------------
 async def enviar_sinais_ao_vivo():
     while True:
-        jogos = obter_jogos_ao_vivo()
-        for jogo in jogos:
-            tipo = analisar_sinal(jogo)
-            if tipo and CHAT_ID:
-                mensagem = formatar_mensagem(jogo, tipo)
-                await application.bot.send_message(chat_id=CHAT_ID, text=mensagem, parse_mode=ParseMode.MARKDOWN)
-                logger.info(f"Sinal enviado: {mensagem}")
+        try:
+            jogos = await obter_jogos_ao_vivo()
+            for jogo in jogos:
+                tipo = analisar_sinal(jogo)
+                if not tipo or sent_signals.contains(jogo.id, tipo):
+                    continue
+                # só os chats cujos filtros aceitam liga + janela ("HT - ..." / "FT - ...")
+                chats = subscriptions.match(STRATEGY, jogo.league_id, tipo.split()[0], None)
+                if chats:
+                    mensagem = formatar_mensagem(jogo, tipo)
+                    for chat_id in chats:
+                        await fila_envio.put((chat_id, mensagem))  # fila cheia: o poller espera
+                    logger.info(f"Sinal para {len(chats)} chats: {mensagem}")
+                sent_signals.add(jogo.id, tipo)
+        except Exception:
+            logger.exception("Erro no ciclo de sinais ao vivo")  # a task segue viva no próximo ciclo
         await asyncio.sleep(30)  # verifica a cada 30s
 
+async def despachar_envios():
+    """Uma task envia a fila no ritmo do limite global; chat que bloqueou o bot sai das assinaturas.
+
+    429 (RetryAfter): espera o retry_after pedido pelo Telegram e reenvia a mesma
+    mensagem (a fila inteira para junto, que é o que o limite exige).
+    """
+    intervalo = 1.0 / max(0.1, TELEGRAM_GLOBAL_RATE)
+    while True:
+        chat_id, mensagem = await fila_envio.get()
+        for tentativa in range(1, TELEGRAM_MAX_RETRIES + 1):
+            try:
+                await application.bot.send_message(chat_id=chat_id, text=mensagem, parse_mode=ParseMode.MARKDOWN)
+            except RetryAfter as e:
+                espera = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else float(e.retry_after)
+                logger.warning(f"Telegram 429 no chat {chat_id}: retry_after={espera}s (tentativa {tentativa})")
+                await asyncio.sleep(espera)
+                continue
+            except Forbidden:
+                subscriptions.unsubscribe(chat_id)
+                logger.info(f"Chat {chat_id} bloqueou o bot; assinatura removida")
+            except TelegramError as e:
+                logger.warning(f"Erro ao enviar para {chat_id}: {e}")
+            break
+        else:
+            logger.error(f"Mensagem para {chat_id} descartada após {TELEGRAM_MAX_RETRIES} tentativas")
+        await asyncio.sleep(intervalo)
+
 # -----------------------------
-# FLASK WEBHOOK
+# WEBHOOK (tornado, no mesmo loop)
 # -----------------------------
-@app.route("/", methods=["GET"])
-def home():
-    return "Bot de Escanteios rodando no Render! ✅"
+class HomeHandler(RequestHandler):
+    def get(self):
+        self.write("Bot de Escanteios rodando no Render! ✅")
+
+class WebhookHandler(RequestHandler):
+    async def post(self):
+        try:
+            data = json.loads(self.request.body)
+        except ValueError:
+            self.set_status(400)
+            return
+        # só enfileira: os handlers rodam nas tasks do Application, fora da requisição
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        self.write("ok")
 
-@app.route(f"/{TOKEN}", methods=["POST"])
-def receive_update():
-    update = Update.de_json(request.get_json(force=True), application.bot)
-    import asyncio
-    asyncio.run(application.update_queue.put(update))
-    return "ok", 200
+def make_web_app():
+    return WebApplication([
+        (r"/", HomeHandler),
+        (f"/{re.escape(TOKEN)}", WebhookHandler),
+    ])
 
 # -----------------------------
 # INÍCIO 
 # -----------------------------
+async def main():
+    loop = asyncio.get_running_loop()
+    http_client.attach_loop(loop)  # AsyncClient da API-Football neste loop, sem thread dedicada
+    global fila_envio
+    fila_envio = asyncio.Queue(maxsize=10000)
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    async with application:
+        await application.bot.set_webhook(url=WEBHOOK_URL, allowed_updates=Update.ALL_TYPES)
+        await application.start()
+        server = make_web_app().listen(PORT, address="0.0.0.0")
+        poller = asyncio.create_task(enviar_sinais_ao_vivo())
+        sender = asyncio.create_task(despachar_envios())
+        logger.info(f"Webhook, comandos e poller no mesmo event loop (porta {PORT})")
+
+        await stop.wait()
+
+        poller.cancel()
+        sender.cancel()
+        server.stop()
+        await application.stop()
+    await http_client.async_client().aclose()
+
 if __name__ == "__main__":
-    logger.info("🚀 Iniciando bot com Flask + Webhook + sinais ao vivo HT/FT...")
-
-    # Inicia a task de sinais ao vivo
-    asyncio.get_event_loop().create_task(enviar_sinais_ao_vivo())
-
-    # Apenas webhook do Telegram (Flask já incluso)
-    application.run_webhook(
-        listen="0.0.0.0",
-        port=int(os.environ.get("PORT", 10000)),
-        url_path=TOKEN,
-        webhook_url=WEBHOOK_URL
-    )
\ No newline at end of file
+    logger.info("🚀 Iniciando bot com Webhook + sinais ao vivo HT/FT...")
+    asyncio.run(main())
\ No newline at end of file
@@ -4,14 +4,30 @@ Versão otimizada: sinais mais frequentes, confiáveis, e layout completo com Be
 """
 
 import os
+import sys
 import time
-import math
-import requests
+import http_client
+import api_decode
 import logging
 from datetime import datetime
-from collections import defaultdict
+from signal_store import Signal, SignalStore
+from subscriptions import SubscriptionStore, handle_update
 from threading import Thread
-from flask import Flask
+from flask import Flask, request, jsonify
+from stats_fetch import STATS_CONCURRENCY, fetch_chunks, fetch_statistics
+from pipeline import Pipeline, Stage
+from standings_cache import StandingsCache
+import poisson_engine
+from scheduler import WindowScheduler
+import api_budget
+import api_recorder
+from api_budget import BudgetExceeded, PRIORITY_WINDOW, PRIORITY_LEAGUE
+from telegram_dispatcher import TelegramDispatcher
+from fixture_lifecycle import FixtureLifecycle
+from change_detection import ChangeCache, fixture_fingerprint
+from fixture_snapshot import score_text
+import metrics as telemetry  # 'metrics' já é nome de variável no scoring
+import sharding
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -47,37 +63,56 @@ small_stadiums = [
 ]
 
 # Controle de sinais enviados
-sent_signals = defaultdict(set)
+sent_signals = SignalStore()  # persistente (SQLite/WAL): sobrevive a restart/redeploy
+
+# Chats que recebem os sinais, com filtros por chat; TELEGRAM_CHAT_ID entra sem filtros
+STRATEGY = 'rp'
+subscriptions = SubscriptionStore()
+subscriptions.ensure(TELEGRAM_CHAT_ID)
+
+# Agenda as buscas de statistics conforme a distância até a janela HT/FT
+scheduler = WindowScheduler([(HT_WINDOW_MIN_START, HT_WINDOW_MIN_END), (FT_WINDOW_MIN_START, FT_WINDOW_MIN_END)])
+
+# Libera o estado por fixture quando a partida termina (memória estável na temporada)
+lifecycle = FixtureLifecycle()
+lifecycle.register('sent_signals', sent_signals.forget, lambda: len(sent_signals))
+lifecycle.register('scheduler', scheduler.forget, lambda: len(scheduler))
+
+# Fixture sem mudança desde o último poll reaproveita o resultado de compute_match_score
+score_cache = ChangeCache()
+lifecycle.register('score_cache', score_cache.forget, lambda: len(score_cache))
+
+# Workers do modo sharded (sharding.py); None = tudo neste processo
+shards = None
 
 # API-Football
-API_BASE = 'https://v3.football.api-sports.io'
+API_BASE = os.getenv('API_FOOTBALL_BASE', 'https://v3.football.api-sports.io')
 HEADERS = {'x-apisports-key': API_FOOTBALL_KEY}
+# Orçamento de requisições: janela HT/FT > ligas prioritárias > resto
+api_budget.install(API_BASE)
+# Captura das respostas para replay offline (só com API_RECORD_DIR definido)
+api_recorder.install(API_BASE)
+
+# Envio do Telegram em thread própria: o loop de fixtures só enfileira
+telegram = TelegramDispatcher(TOKEN)
 
 # ---------------------- HELPERS ----------------------
-def send_telegram_message(text, parse_mode='HTML'):
-    if not TOKEN or not TELEGRAM_CHAT_ID:
-        logger.warning('TOKEN ou TELEGRAM_CHAT_ID não configurado. Mensagem não enviada.')
+def send_telegram_message(chat_id, text, parse_mode='HTML', window_entered=None):
+    if not TOKEN:
+        logger.warning('TOKEN não configurado. Mensagem não enviada.')
         return
-    url = f'https://api.telegram.org/bot{TOKEN}/sendMessage'
-    payload = {
-        'chat_id': TELEGRAM_CHAT_ID,
-        'text': text,
-        'parse_mode': parse_mode,
-        'disable_web_page_preview': True
-    }
-    try:
-        r = requests.post(url, data=payload, timeout=10)
-        if r.status_code != 200:
-            logger.warning('Erro ao enviar telegram: %s %s', r.status_code, r.text)
-    except Exception as e:
-        logger.exception('Falha ao enviar telegram: %s', e)
+    telegram.submit(chat_id, text, parse_mode=parse_mode, disable_web_page_preview=True,
+                    on_sent=telemetry.window_delay_callback(window_entered))
 
 
 def get_live_fixtures():
     try:
-        r = requests.get(f'{API_BASE}/fixtures?live=all', headers=HEADERS, timeout=10)
+        r = http_client.get(f'{API_BASE}/fixtures?live=all', headers=HEADERS, priority=PRIORITY_WINDOW)
         if r.status_code == 200:
-            return r.json().get('response', [])
+            # só os campos usados pelo scoring; o resto do JSON nem vira objeto
+            return api_decode.live_fixtures(r.content)
+    except BudgetExceeded as e:
+        logger.warning('Lista ao vivo adiada: %s', e)
     except Exception as e:
         logger.exception('Erro ao buscar fixtures: %s', e)
     return []
@@ -85,28 +120,37 @@ def get_live_fixtures():
 
 def get_fixture_statistics(fixture_id):
     try:
-        r = requests.get(f'{API_BASE}/fixtures/statistics?fixture={fixture_id}', headers=HEADERS, timeout=10)
+        r = http_client.get(f'{API_BASE}/fixtures/statistics?fixture={fixture_id}', headers=HEADERS)
         if r.status_code == 200:
-            return r.json().get('response', [])
+            return api_decode.statistics(r.content)
+    except BudgetExceeded as e:
+        logger.info('Statistics %s adiadas: %s', fixture_id, e)
     except Exception as e:
         logger.exception('Erro ao buscar statistics: %s', e)
     return []
 
 
-def get_standings(league_id, season, team_id):
+def fetch_standings(league_id, season):
     try:
-        r = requests.get(f'{API_BASE}/standings?league={league_id}&season={season}', headers=HEADERS, timeout=10)
+        r = http_client.get(f'{API_BASE}/standings?league={league_id}&season={season}', headers=HEADERS,
+                            priority=PRIORITY_LEAGUE)
         if r.status_code == 200:
-            resp = r.json().get('response', [])
-            for entry in resp:
-                for team in entry.get('league', {}).get('standings', [[]])[0]:
-                    if team['team']['id'] == team_id:
-                        return team
+            return r.json().get('response', [])
+    except BudgetExceeded as e:
+        logger.debug('Standings adiadas: %s', e)
     except Exception as e:
         logger.debug('Erro ao buscar standings: %s', e)
     return None
 
 
+# Classificação em cache por (liga, temporada): uma requisição por liga, não por sinal
+standings_cache = StandingsCache(fetch_standings)
+
+
+def get_standings(league_id, season, team_id):
+    return standings_cache.get_team(league_id, season, team_id)
+
+
 def is_small_stadium(venue_name):
     if not venue_name:
         return False
@@ -118,12 +162,7 @@ def is_small_stadium(venue_name):
 
 
 def poisson_prob_ge(k, lam):
-    if lam < 0:
-        lam = 0
-    prob_lt_k = 0.0
-    for i in range(0, k):
-        prob_lt_k += math.exp(-lam) * (lam ** i) / math.factorial(i)
-    return max(0.0, 1.0 - prob_lt_k)
+    return max(0.0, poisson_engine.tail_ge(k, lam))
 
 
 def estimate_probability_of_corners(window_minutes_remaining, current_corners, minute, league_avg_corners_per_min=None):
@@ -139,15 +178,12 @@ def estimate_probability_of_corners(window_minutes_remaining, current_corners, m
     return lam, p_ge_1, p_ge_2
 
 
-def compute_match_score(fixture):
-    fixture_id = fixture['fixture']['id']
-    league = fixture['league']
-    teams = fixture['teams']
-    venue = fixture['fixture'].get('venue', {})
-    event_minute = fixture['fixture'].get('status', {}).get('elapsed') or 0
+def compute_match_score(fixture, stats=None):
+    fixture_id = fixture.id
+    event_minute = fixture.elapsed
 
-    scores = fixture['goals']
-    stats = get_fixture_statistics(fixture_id)
+    if stats is None:
+        stats = get_fixture_statistics(fixture_id)
     home_corners = 0
     away_corners = 0
     for team_stats in stats:
@@ -156,14 +192,13 @@ def compute_match_score(fixture):
             for s in team_stats['statistics']:
                 if s.get('type', '').lower() in ('corners', 'cantos', 'corner kicks'):
                     val = s.get('value', 0)
-                    if team.get('id') == teams['home']['id']:
+                    if team.get('id') == fixture.home_id:
                         home_corners = val
                     else:
                         away_corners = val
     total_corners = home_corners + away_corners
-    venue_name = venue.get('name') if venue else None
-    small = is_small_stadium(venue_name)
-    league_weight = priority_leagues.get(league.get('id'), 0.0)
+    small = is_small_stadium(fixture.venue_name)
+    league_weight = priority_leagues.get(fixture.league_id, 0.0)
 
     results = {}
     if HT_WINDOW_MIN_START <= event_minute <= HT_WINDOW_MIN_END:
@@ -206,16 +241,12 @@ def compute_match_score(fixture):
 
 
 def build_signal_text(fixture, window_key, metrics):
-    league = fixture['league']
-    teams = fixture['teams']
-    fixture_info = fixture['fixture']
     minute = metrics.get('minute', 0)
-    home = teams['home']['name']
-    away = teams['away']['name']
+    home = fixture.home_name
+    away = fixture.away_name
 
-    season = league.get('season')
-    home_pos = get_standings(league.get('id'), season, teams['home']['id'])
-    away_pos = get_standings(league.get('id'), season, teams['away']['id'])
+    home_pos = get_standings(fixture.league_id, fixture.season, fixture.home_id)
+    away_pos = get_standings(fixture.league_id, fixture.season, fixture.away_id)
 
     position_text = ''
     if home_pos:
@@ -228,8 +259,8 @@ def build_signal_text(fixture, window_key, metrics):
     else:
         position_text += f"{away}"
 
-    comp = league.get('name')
-    current_score = f"{fixture.get('goals', {}).get('home', '-') } x {fixture.get('goals', {}).get('away', '-') }"
+    comp = fixture.league_name
+    current_score = score_text(fixture.goals_home, fixture.goals_away)
 
     txt = []
     txt.append(f"🚨 <b>SINAL {window_key} - ESCANTEIOS</b> 🚨")
@@ -246,19 +277,53 @@ def build_signal_text(fixture, window_key, metrics):
     return '\n'.join(txt)
 
 
-def process_fixtures_and_send():
-    fixtures = get_live_fixtures()
-    if not fixtures:
-        logger.info('Sem partidas ao vivo.')
-        return
+# ---------------------- PIPELINE ----------------------
+# fetch -> extract -> score -> filter -> render -> dispatch, cada um com fila própria (pipeline.py)
+# o filtro recebe o dedup da rodada pelo context do run (sent_signals; nos workers, o do coordenador)
 
-    for fixture in fixtures:
-        fixture_id = fixture['fixture']['id']
 
-        # ✅ Corrige delay da API adicionando 1 minuto
-        event_minute = fixture['fixture'].get('status', {}).get('elapsed', 0) + 1
+def in_signal_window(minute):
+    return HT_WINDOW_MIN_START <= minute <= HT_WINDOW_MIN_END or FT_WINDOW_MIN_START <= minute <= FT_WINDOW_MIN_END
+
+
+def _stage_fetch(chunks):
+    out = []
+    for fixtures, priorities in chunks:
+        stats_by_fixture = fetch_statistics([f.id for f in fixtures], API_BASE, HEADERS, priorities=priorities)
+        # fixture fora do dict: negada pelo orçamento da API neste ciclo
+        out.extend((f, stats_by_fixture[f.id]) for f in fixtures if f.id in stats_by_fixture)
+    # Aquece a classificação das ligas com partida na janela: o render só lê o cache
+    leagues = {(f.league_id, f.season) for f, _ in out if in_signal_window(f.elapsed)}
+    for league_id, season in leagues:
+        if league_id is not None and season is not None:
+            standings_cache.get_table(league_id, season)
+    return out
+
 
-        metrics_per_window = compute_match_score(fixture)
+def _stage_extract(items):
+    out = []
+    for fixture, stats in items:
+        fp = fixture_fingerprint(fixture, stats)
+        out.append((fixture, stats, fp, score_cache.get(fixture.id, fp)))
+    return out
+
+
+def _stage_score(items):
+    out = []
+    for fixture, stats, fp, metrics_per_window in items:
+        if metrics_per_window is None:
+            metrics_per_window = compute_match_score(fixture, stats)
+            score_cache.put(fixture.id, fp, metrics_per_window)
+        if metrics_per_window:
+            out.append((fixture, metrics_per_window))
+    return out
+
+
+def _stage_filter(items, seen):
+    out = []
+    for fixture, metrics_per_window in items:
+        # ✅ Corrige delay da API adicionando 1 minuto
+        event_minute = fixture.elapsed + 1
         for window_key, metrics in metrics_per_window.items():
             # Ajusta minuto com correção
             metrics['minute'] = event_minute
@@ -267,36 +332,108 @@ def process_fixtures_and_send():
             send_for_2 = metrics['p_ge_2'] >= PROB_THRESHOLD_2C
             already_sent_key = f"{window_key}:{'2' if send_for_2 else '1'}"
 
-            if (send_for_2 or send_for_1) and already_sent_key not in sent_signals[fixture_id]:
-                text = build_signal_text(fixture, window_key, metrics)
-                send_telegram_message(text)
-                sent_signals[fixture_id].add(already_sent_key)
-                logger.info(
-                    'Sinal enviado para fixture %s window %s (p1=%.2f p2=%.2f)',
-                    fixture_id, window_key, metrics['p_ge_1'], metrics['p_ge_2']
-                )
+            if (send_for_2 or send_for_1) and not seen(fixture.id, already_sent_key):
+                out.append((fixture, window_key, metrics, already_sent_key))
+    return out
 
-# ✅ Reduz tempo entre checagens para 5 segundos
-def start_loop():
-    try:
-        while True:
-            try:
-                process_fixtures_and_send()
-            except Exception as e:
-                logger.exception('Erro no loop de processamento: %s', e)
-            time.sleep(5)  # polling mais rápido, reduz delay
-    except KeyboardInterrupt:
-        logger.info('Interrompido pelo usuário')
+
+def _stage_render(items):
+    # standings em cache por liga; numa falta, só este estágio espera a API
+    return [Signal(fixture.id, key, build_signal_text(fixture, window_key, metrics), window_key,
+                   'fixture %s window %s (p1=%.2f p2=%.2f)' % (
+                       fixture.id, window_key, metrics['p_ge_1'], metrics['p_ge_2']),
+                   fixture.league_id, metrics['p_ge_1'])
+            for fixture, window_key, metrics, key in items]
+
+
+def _stage_dispatch(signals):
+    deliver(signals)
+    return ()
+
+
+cycle_pipeline = Pipeline('rp', [
+    Stage('fetch', _stage_fetch, workers=STATS_CONCURRENCY),  # 1 lote de ids = 1 requisição
+    Stage('extract', _stage_extract, batch=64),
+    Stage('score', _stage_score, batch=64),
+    Stage('filter', _stage_filter, batch=64, context=True),
+    Stage('render', _stage_render, workers=2, batch=16),  # standings fora do cache vão à API
+    Stage('dispatch', _stage_dispatch, batch=64),
+])
+
+
+def _chunks(fixtures):
+    """Fixtures devidas em lotes de uma requisição, as mais prioritárias primeiro."""
+    by_id = {f.id: f for f in fixtures}
+    priorities = {
+        f.id: api_budget.fixture_priority(f.elapsed, f.league_id, scheduler.windows, priority_leagues)
+        for f in fixtures
+    }
+    return [([by_id[fid] for fid in ids], {fid: priorities[fid] for fid in ids})
+            for ids in fetch_chunks(by_id, priorities)]
+
+
+def _run_pipeline(fixtures, last=None, seen=None):
+    busy = cycle_pipeline.busy_seconds('extract', 'score')
+    out = cycle_pipeline.run(_chunks(fixtures), last=last, context=seen or sent_signals.contains)
+    score_cache.end_cycle()
+    telemetry.SCORING_SECONDS.observe(cycle_pipeline.busy_seconds('extract', 'score') - busy)
+    return out
+
+
+def score_fixtures(fixtures, seen=None):
+    """Statistics + scoring das fixtures devidas; devolve os sinais ainda não enviados, sem enviar.
+
+    seen(fixture_id, chave) diz o que já saiu (padrão: sent_signals); no modo
+    sharded roda nos workers, e quem envia é o coordenador (deliver).
+    """
+    return _run_pipeline(fixtures, last='render', seen=seen)
+
+
+def deliver(signals):
+    """Dedup final + envio: só o processo dono de sent_signals chama."""
+    for signal in signals:
+        if sent_signals.contains(signal.fixture_id, signal.key):
+            continue
+        # só os chats cujos filtros aceitam o sinal (índice liga/estratégia/janela)
+        chats = subscriptions.match(STRATEGY, signal.league_id, signal.window, signal.prob)
+        entered = scheduler.window_entered(signal.fixture_id)
+        for chat_id in chats:
+            send_telegram_message(chat_id, signal.text, window_entered=entered)
+        sent_signals.add(signal.fixture_id, signal.key)
+        logger.info('Sinal enviado para %s (%d chats)', signal.note, len(chats))
+
+
+@telemetry.CYCLE_SECONDS.time()
+def process_fixtures_and_send():
+    fixtures = get_live_fixtures()
+    if fixtures:  # lista vazia pode ser erro da API: não encerra ninguém por isso
+        lifecycle.update(fixtures)
+    scheduler.update(fixtures)
+    if not fixtures:
+        logger.info('Sem partidas ao vivo.')
+        return
+
+    # Só as partidas na janela (ou perto dela) entram neste ciclo
+    fixtures = scheduler.pop_due(fixtures)
+    if not fixtures:
+        return
+    if shards:
+        deliver(shards.score(fixtures))
+    else:
+        _run_pipeline(fixtures)
 
 
 def start_loop():
+    global shards
+    shards = sharding.start(sys.modules[__name__])  # SHARD_WORKERS > 1: statistics + scoring em workers
+    cycle_pipeline.start()
     try:
         while True:
             try:
                 process_fixtures_and_send()
             except Exception as e:
                 logger.exception('Erro no loop de processamento: %s', e)
-            time.sleep(10)  # polling leve para pegar partidas HT/FT
+            time.sleep(scheduler.sleep_hint())  # rápido perto das janelas HT/FT, lento fora delas
     except KeyboardInterrupt:
         logger.info('Interrompido pelo usuário')
 
@@ -308,9 +445,23 @@ app = Flask('bot_health')
 def health():
     return "ok", 200
 
+@app.route("/metrics")
+def prometheus_metrics():
+    return telemetry.render(), 200, {'Content-Type': telemetry.CONTENT_TYPE}
+
+@app.route("/state")
+def state():
+    return jsonify({'fixtures': lifecycle.stats(), 'scoring': score_cache.stats(),
+                    'shards': shards.stats() if shards else None, 'pipeline': cycle_pipeline.stats(),
+                    'subscriptions': subscriptions.stats()})
+
 @app.route(f"/{TOKEN}", methods=["POST"])
 def webhook():
-    return "ok", 200  # evita 404 do Telegram
+    # /assinar, /cancelar e /filtros mexem na assinatura do chat; o resto só evita 404 do Telegram
+    command = handle_update(subscriptions, request.get_json(silent=True))
+    if command:
+        telegram.submit(*command)
+    return "ok", 200
 
 if __name__ == '__main__':
     Thread(target=start_loop, daemon=True).start()
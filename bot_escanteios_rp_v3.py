@@ -11,17 +11,36 @@ Requisitos:
 Environment variables required:
 - API_FOOTBALL_KEY
 - TOKEN
-- TELEGRAM_CHAT_ID
+- TELEGRAM_CHAT_ID (recebe tudo; outros chats com filtros próprios: subscriptions.py)
 - WEBHOOK_URL (opcional, não obrigatório para envio de mensagens)
+- SIGNAL_EDIT_MODE (opcional; 1 = uma mensagem por partida/janela, editada a cada escanteio: live_messages.py)
+- API_FOOTBALL_BASE (opcional; padrão https://v3.football.api-sports.io, ex.: fake_api.py nos testes de carga)
 """
 
 import os
+import sys
 import time
-import math
 import logging
-from collections import defaultdict
+from signal_store import Signal, SignalStore
+from subscriptions import SubscriptionStore
 from typing import Dict, Any, List, Tuple
-import requests
+import http_client
+import api_decode
+from stats_fetch import STATS_CONCURRENCY, fetch_chunks, fetch_statistics
+from pipeline import Pipeline, Stage
+import poisson_engine
+from scheduler import WindowScheduler
+import api_budget
+import api_recorder
+from api_budget import BudgetExceeded, PRIORITY_WINDOW
+from telegram_dispatcher import TelegramDispatcher
+from live_messages import SIGNAL_EDIT_MODE, LiveMessages
+from fixture_lifecycle import FixtureLifecycle
+from change_detection import ChangeCache, fixture_fingerprint
+from stat_types import classify_stat, stat_value
+from fixture_snapshot import FixtureSnapshot, score_text
+import metrics as telemetry  # 'metrics' já é nome de variável no scoring
+import sharding
 from flask import Flask, jsonify
 
 # ---------- CONFIG ----------
@@ -34,8 +53,10 @@ TOKEN = os.getenv('TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 WEBHOOK_URL = os.getenv('WEBHOOK_URL')
 
-API_BASE = "https://v3.football.api-sports.io"
+API_BASE = os.getenv("API_FOOTBALL_BASE", "https://v3.football.api-sports.io")
 HEADERS = {"x-apisports-key": API_FOOTBALL_KEY} if API_FOOTBALL_KEY else {}
+api_budget.install(API_BASE)  # cota/rate-limit da API-Football com prioridade por janela
+api_recorder.install(API_BASE)  # grava as respostas para replay se API_RECORD_DIR estiver definido
 
 HT_WINDOW = (35, 40)
 FT_WINDOW = (80, 90)
@@ -52,61 +73,69 @@ DANGER_DIFF = 3
 PRIORITY_LEAGUES = {39:0.05, 78:0.05, 140:0.04, 61:0.04, 135:0.03}
 SMALL_STADIUMS = ['loftus road','vitality stadium','kenilworth road','turf moor','crowd','bramall lane','ewood park']
 
-sent_signals = defaultdict(set)  # fixture_id -> set of keys
+sent_signals = SignalStore()  # persistente (SQLite/WAL): sobrevive a restart/redeploy
+STRATEGY = 'vip'
+subscriptions = SubscriptionStore()  # chats e filtros de cada um; TELEGRAM_CHAT_ID entra sem filtros
+subscriptions.ensure(TELEGRAM_CHAT_ID)
 
 # ---------- FLASK HEALTH ----------
 app = Flask(__name__)
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'ok'})
+    return jsonify({'status': 'ok', 'fixtures': lifecycle.stats(), 'scoring': score_cache.stats(),
+                    'shards': shards.stats() if shards else None, 'pipeline': cycle_pipeline.stats(),
+                    'subscriptions': subscriptions.stats(),
+                    'live_messages': live_messages.stats() if live_messages is not None else None})
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return telemetry.render(), 200, {'Content-Type': telemetry.CONTENT_TYPE}
 
 # ---------- POISSON HELPERS ----------
+# Wrappers do motor vetorizado (poisson_engine)
 def poisson_pmf(k, lam):
-    try:
-        return (lam**k) * math.exp(-lam) / math.factorial(k) if k>=0 else 0.0
-    except:
-        return 0.0
+    return poisson_engine.pmf(k, lam)
 
 def poisson_cdf_le(k, lam):
-    s = 0.0
-    for i in range(0, int(k)+1):
-        s += poisson_pmf(i, lam)
-    return s
+    return poisson_engine.cdf_le(k, lam)
 
 def poisson_tail_ge(k, lam):
-    return 1.0 if k<=0 else 1.0 - poisson_cdf_le(k-1, lam)
+    return poisson_engine.tail_ge(k, lam)
 
 # ---------- API HELPERS ----------
-def get_live_fixtures() -> List[Dict[str, Any]]:
+def get_live_fixtures() -> List[FixtureSnapshot]:
     if not API_FOOTBALL_KEY:
         logger.error('API_FOOTBALL_KEY não definida.')
         return []
     try:
-        r = requests.get(f"{API_BASE}/fixtures?live=all", headers=HEADERS, timeout=10)
+        r = http_client.get(f"{API_BASE}/fixtures?live=all", headers=HEADERS, priority=PRIORITY_WINDOW)
         if r.status_code == 200:
-            fixtures = r.json().get('response', [])
+            fixtures = api_decode.live_fixtures(r.content)  # só os campos usados; o resto do JSON nem vira objeto
             logger.info('Fixtures ao vivo encontradas: %d', len(fixtures))
             return fixtures
         else:
             logger.warning('Status %s ao buscar fixtures: %.200s', r.status_code, r.text)
+    except BudgetExceeded as e:
+        logger.warning('Lista ao vivo adiada: %s', e)
     except Exception as e:
         logger.exception('Erro ao buscar fixtures: %s', e)
     return []
 
 def get_fixture_statistics(fixture_id):
     try:
-        r = requests.get(f"{API_BASE}/fixtures/statistics?fixture={fixture_id}", headers=HEADERS, timeout=10)
+        r = http_client.get(f"{API_BASE}/fixtures/statistics?fixture={fixture_id}", headers=HEADERS)
         if r.status_code == 200:
-            return r.json().get('response', [])
+            return api_decode.statistics(r.content)
+    except BudgetExceeded as e:
+        logger.info('Statistics %s adiadas: %s', fixture_id, e)
     except Exception as e:
         logger.exception('Erro ao buscar statistics: %s', e)
     return []
 
 # ---------- STAT EXTRACTION ----------
-def extract_basic_stats(fixture, stats_resp) -> Tuple[Dict[str,int], Dict[str,int]]:
-    teams = fixture['teams']
-    home_id = teams['home']['id']
-    away_id = teams['away']['id']
+def extract_basic_stats(fixture: FixtureSnapshot, stats_resp) -> Tuple[Dict[str,int], Dict[str,int]]:
+    home_id = fixture.home_id
+    away_id = fixture.away_id
 
     home = {'corners':0,'attacks':0,'danger':0}
     away = {'corners':0,'attacks':0,'danger':0}
@@ -116,13 +145,9 @@ def extract_basic_stats(fixture, stats_resp) -> Tuple[Dict[str,int], Dict[str,in
         stats_list = entry.get('statistics', []) or []
         target = home if team.get('id') == home_id else away
         for s in stats_list:
-            t = str(s.get('type','')).lower()
-            val = s.get('value') or 0
-            try: val = int(float(str(val).replace('%','')))
-            except: val = 0
-            if 'corner' in t: target['corners']=val
-            elif 'attack' in t and 'danger' not in t: target['attacks']=val
-            elif 'on goal' in t or 'danger' in t or 'shots on goal' in t: target['danger']=val
+            field = classify_stat(s.get('type',''))  # tipo -> campo, calculado uma vez por tipo
+            if field is not None:
+                target[field] = stat_value(s.get('value'))
     return home, away
 
 # ---------- PRESSURE METRIC ----------
@@ -139,36 +164,39 @@ def pressure_score(home, away):
     return score_home, score_away
 
 # ---------- PREDICTION ----------
+# Linhas avaliadas por fixture; aceita quartos (ex.: CANDIDATE_LINES=3.5,3.75,4.0,4.25,4.5)
+CANDIDATE_LINES = [float(x) for x in os.getenv('CANDIDATE_LINES', '3.5,4.0,4.5,5.0,5.5').split(',') if x.strip()]
+
 def predict_corners_and_line_metrics(current_total, lam_remaining, candidate_line):
-    is_fractional = isinstance(candidate_line,float) and (candidate_line%1)!=0
-    if is_fractional:
-        required = int(math.floor(candidate_line)+1)
-        p_win = poisson_tail_ge(required-current_total,lam_remaining)
-        p_push = 0.0
-        p_lose = 1.0-p_win
-    else:
-        L = int(candidate_line)
-        required = L+1
-        p_win = poisson_tail_ge(required-current_total,lam_remaining)
-        k_eq = L-current_total
-        p_push = poisson_pmf(k_eq,lam_remaining) if k_eq>=0 else 0.0
-        p_lose = 1.0-p_win-p_push
-    return {'line':candidate_line,'p_win':max(0.0,min(1.0,p_win)),'p_push':max(0.0,min(1.0,p_push)),'p_lose':max(0.0,min(1.0,p_lose))}
+    return poisson_engine.line_metrics(current_total, lam_remaining, candidate_line, clip=True)
 
 def evaluate_candidate_lines(current_total, lam, lines_to_check=None):
-    lines_to_check = lines_to_check or [3.5,4.0,4.5,5.0,5.5]
-    results = [predict_corners_and_line_metrics(current_total,lam,L) for L in lines_to_check]
+    lines_to_check = lines_to_check or CANDIDATE_LINES
+    results = poisson_engine.evaluate_lines_batch([current_total], [lam], lines_to_check, clip=True)[0]
     results.sort(key=lambda x:x['p_win'],reverse=True)
     return results
 
+def evaluate_candidate_lines_batch(current_totals, lams, lines_to_check=None):
+    """Mesmo resultado de evaluate_candidate_lines, para todas as fixtures numa passada NumPy."""
+    lines_to_check = lines_to_check or CANDIDATE_LINES
+    per_fixture = poisson_engine.evaluate_lines_batch(current_totals, lams, lines_to_check, clip=True)
+    for results in per_fixture:
+        results.sort(key=lambda x:x['p_win'],reverse=True)
+    return per_fixture
+
 # ---------- MESSAGE & TELEGRAM ----------
-def build_vip_message(fixture, window_key, metrics, best_lines):
-    teams = fixture['teams']
-    home = teams['home']['name']; away = teams['away']['name']
-    league = fixture['league'].get('name')
+def format_line(ln):
+    txt = f"Linha {ln['line']} → Win {ln['p_win']*100:.0f}% | Push {ln['p_push']*100:.0f}%"
+    if ln.get('p_half_win') or ln.get('p_half_loss'):  # linhas de quarto (x.25 / x.75)
+        txt += f" | ½Win {ln['p_half_win']*100:.0f}% | ½Loss {ln['p_half_loss']*100:.0f}%"
+    return txt
+
+def build_vip_message(fixture: FixtureSnapshot, window_key, metrics, best_lines):
+    home = fixture.home_name; away = fixture.away_name
+    league = fixture.league_name
     minute = metrics['minute']
-    score = f"{fixture.get('goals',{}).get('home','-')} x {fixture.get('goals',{}).get('away','-')}"
-    lines_txt = [f"Linha {ln['line']} → Win {ln['p_win']*100:.0f}% | Push {ln['p_push']*100:.0f}%" for ln in best_lines[:3]]
+    score = score_text(fixture.goals_home, fixture.goals_away)
+    lines_txt = [format_line(ln) for ln in best_lines[:3]]
     pressure_note = 'Pressão detectada' if metrics.get('pressure') else 'Pressão fraca'
     stadium_small = '✅' if metrics.get('small_stadium') else '❌'
     txt = [
@@ -186,52 +214,169 @@ def build_vip_message(fixture, window_key, metrics, best_lines):
     txt.append(f"🔗 Bet365: https://www.bet365.com/#/AX/K^{home.replace(' ','')}/")
     return "\n".join(txt)
 
-def send_telegram_message(text):
-    if not TOKEN or not TELEGRAM_CHAT_ID:
-        logger.warning('TOKEN ou TELEGRAM_CHAT_ID não definido.')
+telegram = TelegramDispatcher(TOKEN)  # fila de saída; o loop nunca espera o Telegram
+
+def send_telegram_message(chat_id, text, window_entered=None):
+    if not TOKEN:
+        logger.warning('TOKEN não definido.')
         return
-    url = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
-    payload = {"chat_id": TELEGRAM_CHAT_ID, "text": text, "parse_mode":"HTML"}
-    try:
-        r = requests.post(url,json=payload,timeout=10)
-        if r.status_code!=200: logger.warning('Erro ao enviar Telegram: %s %s', r.status_code,r.text)
-    except Exception as e:
-        logger.exception('Erro ao enviar Telegram: %s', e)
+    telegram.submit(chat_id, text, parse_mode="HTML", on_sent=telemetry.window_delay_callback(window_entered))
 
 # ---------- MAIN LOOP ----------
+POLL_INTERVAL = float(os.getenv('POLL_INTERVAL', '25'))  # releitura máxima da lista ao vivo
+scheduler = WindowScheduler([HT_WINDOW, FT_WINDOW])
+lifecycle = FixtureLifecycle()  # libera o estado por fixture quando a partida termina
+lifecycle.register('sent_signals', sent_signals.forget, lambda: len(sent_signals))
+lifecycle.register('scheduler', scheduler.forget, lambda: len(scheduler))
+score_cache = ChangeCache()  # fixture sem mudança desde o último poll reaproveita métricas + linhas
+lifecycle.register('score_cache', score_cache.forget, lambda: len(score_cache))
+live_messages = LiveMessages(telegram) if SIGNAL_EDIT_MODE else None  # 1 mensagem por partida/janela, editada
+if live_messages is not None:
+    lifecycle.register('live_messages', live_messages.forget, lambda: len(live_messages))
+shards = None  # workers do modo sharded (sharding.py); None = tudo neste processo
+
+# ---------- PIPELINE ----------
+# fetch -> extract -> score -> filter -> render -> dispatch, cada um com fila própria (pipeline.py)
+# o filtro recebe o dedup da rodada pelo context do run (sent_signals; nos workers, o do coordenador)
+
+def _stage_fetch(chunks):
+    out = []
+    for fixtures, priorities in chunks:
+        stats_by_fixture = fetch_statistics([fixture.id for fixture in fixtures], API_BASE, HEADERS, priorities=priorities)
+        # fixture fora do dict: negada pelo orçamento da API neste ciclo
+        out.extend((fixture, stats_by_fixture[fixture.id]) for fixture in fixtures if fixture.id in stats_by_fixture)
+    return out
+
+def _stage_extract(items):
+    out = []
+    for fixture, stats in items:
+        fp = fixture_fingerprint(fixture, stats)
+        cached = score_cache.get(fixture.id, fp)
+        if cached is not None:
+            out.append((fixture, cached[0], cached[1], fp))
+            continue
+        home,away = extract_basic_stats(fixture, stats)
+        score_home, score_away = pressure_score(home, away)
+        total_corners = home['corners'] + away['corners']
+        metrics = {
+            'minute': fixture.elapsed,
+            'home_corners': home['corners'],
+            'away_corners': away['corners'],
+            'home_attacks': home['attacks'],
+            'away_attacks': away['attacks'],
+            'home_danger': home['danger'],
+            'away_danger': away['danger'],
+            'pressure': score_home>MIN_PRESSURE_SCORE or score_away>MIN_PRESSURE_SCORE,
+            'small_stadium': fixture.venue_name.lower() in SMALL_STADIUMS,
+            'total_corners': total_corners
+        }
+        out.append((fixture, metrics, None, fp))
+    return out
+
+def _stage_score(items):
+    # avalia linhas das partidas que mudaram, o lote todo numa passada só
+    pending = [i for i, item in enumerate(items) if item[2] is None]
+    all_lines = evaluate_candidate_lines_batch([items[i][1]['total_corners'] for i in pending], [1.5]*len(pending))  # pode ajustar lam dinamicamente
+    for i, best_lines in zip(pending, all_lines):
+        fixture, metrics, _, fp = items[i]
+        score_cache.put(fixture.id, fp, (metrics, best_lines))
+        items[i] = (fixture, metrics, best_lines, fp)
+    return items
+
+def _stage_filter(items, seen):
+    out = []
+    for fixture, metrics, best_lines, _ in items:
+        window_key = 'HT' if HT_WINDOW[0]<=metrics['minute']<=HT_WINDOW[1] else 'FT' if FT_WINDOW[0]<=metrics['minute']<=FT_WINDOW[1] else 'LIVE'
+        signal_key = f"{window_key}_{metrics['total_corners']}"
+        if not seen(fixture.id, signal_key):
+            out.append((fixture, window_key, signal_key, metrics, best_lines))
+    return out
+
+def _stage_render(items):
+    return [Signal(fixture.id, signal_key, build_vip_message(fixture, window_key, metrics, best_lines), window_key, signal_key,
+                   fixture.league_id, best_lines[0]['p_win'] if best_lines else 0.0)
+            for fixture, window_key, signal_key, metrics, best_lines in items]
+
+def _stage_dispatch(signals):
+    deliver(signals)
+    return ()
+
+cycle_pipeline = Pipeline('vip', [
+    Stage('fetch', _stage_fetch, workers=STATS_CONCURRENCY),  # 1 lote de ids = 1 requisição
+    Stage('extract', _stage_extract, batch=64),
+    Stage('score', _stage_score, batch=64),  # NumPy por lote
+    Stage('filter', _stage_filter, batch=64, context=True),
+    Stage('render', _stage_render, batch=64),
+    Stage('dispatch', _stage_dispatch, batch=64),
+])
+
+def _chunks(fixtures):
+    """Fixtures devidas em lotes de uma requisição, as mais prioritárias primeiro."""
+    by_id = {fixture.id: fixture for fixture in fixtures}
+    priorities = {
+        fixture.id: api_budget.fixture_priority(fixture.elapsed, fixture.league_id, scheduler.windows, PRIORITY_LEAGUES)
+        for fixture in fixtures
+    }
+    return [([by_id[fid] for fid in ids], {fid: priorities[fid] for fid in ids})
+            for ids in fetch_chunks(by_id, priorities)]
+
+def _run_pipeline(fixtures, last=None, seen=None):
+    busy = cycle_pipeline.busy_seconds('extract', 'score')
+    out = cycle_pipeline.run(_chunks(fixtures), last=last, context=seen or sent_signals.contains)
+    score_cache.end_cycle()
+    telemetry.SCORING_SECONDS.observe(cycle_pipeline.busy_seconds('extract', 'score') - busy)
+    return out
+
+def score_fixtures(fixtures, seen=None):
+    """Statistics + scoring + mensagens das fixtures devidas; devolve os sinais sem enviar.
+
+    seen(fixture_id, chave) diz o que já saiu (padrão: sent_signals); no modo
+    sharded roda nos workers e quem envia é o coordenador (deliver).
+    """
+    return _run_pipeline(fixtures, last='render', seen=seen)
+
+def deliver(signals):
+    """Dedup final + envio: só o processo dono de sent_signals chama."""
+    for signal in signals:
+        if sent_signals.contains(signal.fixture_id, signal.key):
+            continue
+        # só os chats cujos filtros aceitam o sinal (índice liga/estratégia/janela)
+        chats = subscriptions.match(STRATEGY, signal.league_id, signal.window, signal.prob)
+        entered = scheduler.window_entered(signal.fixture_id) if signal.window != 'LIVE' else None
+        for chat_id in chats:
+            if live_messages is not None:  # SIGNAL_EDIT_MODE: escanteio novo edita a mensagem da janela
+                live_messages.publish(signal.fixture_id, signal.window, chat_id, signal.text,
+                                      on_sent=telemetry.window_delay_callback(entered))
+            else:
+                send_telegram_message(chat_id, signal.text, window_entered=entered)
+        sent_signals.add(signal.fixture_id, signal.key)
+        logger.info('Sinal enviado: %s (%d chats)', signal.note, len(chats))
+
+@telemetry.CYCLE_SECONDS.time()
+def run_cycle():
+    """Um ciclo de polling: lista ao vivo -> pipeline (statistics, scoring, sinais, envio)."""
+    fixtures = get_live_fixtures()
+    if fixtures:  # lista vazia pode ser erro da API: não encerra ninguém por isso
+        lifecycle.update(fixtures)
+    scheduler.update(fixtures)
+    if not fixtures:
+        logger.info('Nenhuma partida ao vivo detectada.')
+    fixtures = scheduler.pop_due(fixtures)  # janela HT/FT ou perto dela; o resto espera
+    if shards:
+        deliver(shards.score(fixtures))
+    else:
+        _run_pipeline(fixtures)
+
 def main_loop():
+    global shards
+    shards = sharding.start(sys.modules[__name__])  # SHARD_WORKERS > 1: statistics + scoring em workers
+    cycle_pipeline.start()
     while True:
-        fixtures = get_live_fixtures()
-        if not fixtures:
-            logger.info('Nenhuma partida ao vivo detectada.')
-        for fixture in fixtures:
-            fixture_id = fixture['fixture']['id'] if 'fixture' in fixture else fixture.get('id')
-            stats = get_fixture_statistics(fixture_id)
-            home,away = extract_basic_stats(fixture, stats)
-            score_home, score_away = pressure_score(home, away)
-            total_corners = home['corners'] + away['corners']
-            metrics = {
-                'minute': fixture.get('fixture',{}).get('status',{}).get('elapsed',0),
-                'home_corners': home['corners'],
-                'away_corners': away['corners'],
-                'home_attacks': home['attacks'],
-                'away_attacks': away['attacks'],
-                'home_danger': home['danger'],
-                'away_danger': away['danger'],
-                'pressure': score_home>MIN_PRESSURE_SCORE or score_away>MIN_PRESSURE_SCORE,
-                'small_stadium': fixture.get('fixture',{}).get('venue',{}).get('name','').lower() in SMALL_STADIUMS,
-                'total_corners': total_corners
-            }
-            # avalia linhas
-            best_lines = evaluate_candidate_lines(total_corners, lam=1.5)  # pode ajustar lam dinamicamente
-            window_key = 'HT' if HT_WINDOW[0]<=metrics['minute']<=HT_WINDOW[1] else 'FT' if FT_WINDOW[0]<=metrics['minute']<=FT_WINDOW[1] else 'LIVE'
-            signal_key = f"{window_key}_{total_corners}"
-            if signal_key not in sent_signals[fixture_id]:
-                msg = build_vip_message(fixture, window_key, metrics, best_lines)
-                send_telegram_message(msg)
-                sent_signals[fixture_id].add(signal_key)
-                logger.info('Sinal enviado: %s', signal_key)
-        time.sleep(25)  # intervalo entre verificações
+        try:
+            run_cycle()
+        except Exception as e:
+            logger.exception('Erro no ciclo: %s', e)  # a thread não pode morrer com o Flask respondendo /health
+        time.sleep(scheduler.sleep_hint(max_sleep=POLL_INTERVAL))  # intervalo entre verificações
 
 # ---------- START THREAD ----------
 if __name__=="__main__":
@@ -0,0 +1,94 @@
+"""
+change_detection.py
+Reaproveita o scoring de fixtures cujos dados não mudaram desde o último poll.
+
+Com polling de 5–10 s e a API atualizando ~1x por minuto, a maioria dos ciclos
+recebe exatamente o mesmo minuto/placar/statistics. Cada fixture ganha uma
+impressão digital (fingerprint) das entradas que o scoring usa; se ela bate com
+a anterior, o resultado anterior (métricas + linhas) é devolvido sem recalcular.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Tuple
+
+from fixture_snapshot import FixtureSnapshot
+
+logger = logging.getLogger(__name__)
+
+_MISS = object()
+
+
+def stats_fingerprint(stats_resp: List[Dict[str, Any]]) -> Tuple:
+    """Tupla hashável com (time, tipo, valor) de cada estatística da resposta."""
+    out = []
+    for entry in stats_resp or []:
+        team_id = (entry.get('team') or {}).get('id')
+        for s in entry.get('statistics') or []:
+            out.append((team_id, s.get('type'), s.get('value')))
+    return tuple(out)
+
+
+def fixture_fingerprint(fixture: FixtureSnapshot, stats_resp: List[Dict[str, Any]], *extra) -> int:
+    return hash((
+        fixture.elapsed, fixture.status,
+        fixture.goals_home, fixture.goals_away,
+        fixture.venue_name,
+        stats_fingerprint(stats_resp),
+    ) + extra)
+
+
+class ChangeCache:
+    def __init__(self):
+        self._entries: Dict[Any, Tuple[int, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.total_hits = 0
+        self.total_misses = 0
+        self.last_cycle = {'hits': 0, 'misses': 0, 'hit_ratio': 0.0}
+
+    def get(self, fixture_id, fingerprint: int, default=None):
+        entry = self._entries.get(fixture_id)
+        if entry is not None and entry[0] == fingerprint:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return default
+
+    def put(self, fixture_id, fingerprint: int, value):
+        self._entries[fixture_id] = (fingerprint, value)
+
+    def get_or_compute(self, fixture_id, fingerprint: int, compute: Callable[[], Any]):
+        value = self.get(fixture_id, fingerprint, _MISS)
+        if value is _MISS:
+            value = compute()
+            self.put(fixture_id, fingerprint, value)
+        return value
+
+    def end_cycle(self) -> Dict[str, Any]:
+        """Fecha o ciclo: guarda hits/misses do ciclo e zera os contadores."""
+        total = self.hits + self.misses
+        self.last_cycle = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 3) if total else 0.0,
+        }
+        self.total_hits += self.hits
+        self.total_misses += self.misses
+        self.hits = self.misses = 0
+        if total:
+            logger.debug('Scoring: %d reaproveitados, %d recalculados', self.last_cycle['hits'], self.last_cycle['misses'])
+        return self.last_cycle
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.total_hits + self.total_misses
+        return {
+            'entries': len(self._entries),
+            'last_cycle': dict(self.last_cycle),
+            'hit_ratio': round(self.total_hits / total, 3) if total else 0.0,
+        }
+
+    def forget(self, fixture_id):
+        self._entries.pop(fixture_id, None)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,385 @@
+"""
+fake_api.py
+Servidor local que imita a API-Football e o sendMessage/editMessageText do Telegram, para testes de carga.
+
+Endpoints:
+- GET  /fixtures?live=all            lista ao vivo (N partidas simuladas)
+- GET  /fixtures?ids=a-b-c           partidas com statistics (até 20 ids)
+- GET  /fixtures/statistics?fixture=X
+- GET  /standings?league=L&season=S
+- POST /bot<token>/sendMessage       guarda a mensagem com o horário de chegada
+- POST /bot<token>/editMessageText   guarda o texto novo em 'edited_text' da mensagem (conta em 'edits')
+- GET  /__stats, /__messages         contadores do servidor e mensagens recebidas
+
+Partidas: começam em minutos espalhados por 1..90 e avançam 1 minuto a cada
+--minute-seconds; ao terminar, outra começa no lugar, então há sempre N ao vivo.
+Escanteios/ataques são determinísticos por partida (seed), então duas execuções
+com a mesma configuração veem o mesmo jogo.
+
+Injeção de falhas (por requisição): --latency (distribuição), --error-rate (500)
+e --rate-limit-rate (429 com Retry-After / parameters.retry_after).
+
+Uso:
+  python fake_api.py --fixtures 500 --latency lognormal:80,0.5 --error-rate 0.01 --rate-limit-rate 0.002
+"""
+
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger('fake_api')
+
+LEAGUES = [(39, 'Premier League'), (78, 'Bundesliga'), (140, 'La Liga'), (61, 'Ligue 1'),
+           (135, 'Serie A'), (71, 'Brasileirão'), (128, 'Liga Profesional'), (2, 'Champions League')]
+VENUES = ['Turf Moor', 'Anfield', 'Bramall Lane', 'Loftus Road', 'Estadio Municipal', 'Allianz Arena']
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """'fixed:50', 'uniform:20,200', 'exp:60', 'lognormal:80,0.5' (mediana ms, sigma) -> segundos."""
+    kind, _, params = (spec or 'fixed:0').partition(':')
+    args = [float(x) for x in params.split(',') if x.strip()] or [0.0]
+    if kind == 'fixed':
+        return lambda rng: args[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000
+    if kind == 'exp':
+        return lambda rng: rng.expovariate(1.0 / args[0]) / 1000 if args[0] > 0 else 0.0
+    if kind == 'lognormal':
+        mu, sigma = math.log(max(args[0], 1e-3)), args[1] if len(args) > 1 else 0.5
+        return lambda rng: rng.lognormvariate(mu, sigma) / 1000
+    raise ValueError(f'Distribuição de latência desconhecida: {spec}')
+
+
+# ---------- PARTIDAS SIMULADAS ----------
+class SimMatch:
+    __slots__ = ('id', 'league', 'home', 'away', 'venue', 'start_minute', 'started_at',
+                 'corner_minutes', 'attack_rate', 'danger_rate', 'goal_minutes')
+
+    def __init__(self, match_id: int, start_minute: float, started_at: float):
+        rng = random.Random(match_id)
+        self.id = match_id
+        self.league = LEAGUES[rng.randrange(len(LEAGUES))]
+        self.home = {'id': 2 * match_id, 'name': f'Casa {match_id}'}
+        self.away = {'id': 2 * match_id + 1, 'name': f'Fora {match_id}'}
+        self.venue = VENUES[rng.randrange(len(VENUES))]
+        self.start_minute = start_minute
+        self.started_at = started_at
+        # ~10 escanteios por jogo, minuto e lado sorteados
+        self.corner_minutes = sorted((rng.uniform(1, 95), rng.random() < 0.55) for _ in range(rng.randint(4, 16)))
+        self.goal_minutes = sorted((rng.uniform(1, 95), rng.random() < 0.55) for _ in range(rng.randint(0, 5)))
+        self.attack_rate = (rng.uniform(0.6, 1.4), rng.uniform(0.6, 1.4))
+        self.danger_rate = (rng.uniform(0.3, 0.8), rng.uniform(0.3, 0.8))
+
+    def minute(self, now: float, minute_seconds: float) -> float:
+        return self.start_minute + (now - self.started_at) / minute_seconds
+
+    @staticmethod
+    def _count(events, minute: float):
+        home = away = 0
+        for at, is_home in events:
+            if at > minute:
+                break
+            if is_home:
+                home += 1
+            else:
+                away += 1
+        return home, away
+
+    def fixture(self, minute: float) -> Dict[str, Any]:
+        elapsed = int(minute)
+        short = '1H' if elapsed <= 45 else '2H'
+        goals = self._count(self.goal_minutes, minute)
+        return {
+            'fixture': {'id': self.id, 'status': {'elapsed': elapsed, 'short': short, 'long': short},
+                        'venue': {'name': self.venue}},
+            'league': {'id': self.league[0], 'name': self.league[1], 'season': 2024},
+            'teams': {'home': self.home, 'away': self.away},
+            'goals': {'home': goals[0], 'away': goals[1]},
+        }
+
+    def statistics(self, minute: float) -> List[Dict[str, Any]]:
+        corners = self._count(self.corner_minutes, minute)
+        out = []
+        for side, team in enumerate((self.home, self.away)):
+            attacks = int(self.attack_rate[side] * minute)
+            danger = int(self.danger_rate[side] * minute)
+            out.append({'team': team, 'statistics': [
+                {'type': 'Shots on Goal', 'value': danger // 6},
+                {'type': 'Total Shots', 'value': danger // 3},
+                {'type': 'Corner Kicks', 'value': corners[side]},
+                {'type': 'Ball Possession', 'value': f'{50 + (5 if side == 0 else -5)}%'},
+                {'type': 'Attacks', 'value': attacks},
+                {'type': 'Dangerous Attacks', 'value': danger},
+                {'type': 'Yellow Cards', 'value': None},
+            ]})
+        return out
+
+
+class FakeWorld:
+    def __init__(self, fixtures: int = 100, minute_seconds: float = 60.0, seed: int = 1):
+        self.minute_seconds = minute_seconds
+        self._lock = threading.Lock()
+        self._next_id = 1_000_000
+        now = time.time()
+        rng = random.Random(seed)
+        self.matches: Dict[int, SimMatch] = {}
+        for _ in range(fixtures):
+            self._spawn(rng.uniform(1, 90), now)
+
+    def _spawn(self, start_minute: float, now: float):
+        self._next_id += 1
+        self.matches[self._next_id] = SimMatch(self._next_id, start_minute, now)
+
+    def _tick(self, now: float):
+        # partida que passou dos 95' sai da lista ao vivo e outra começa
+        for match_id, match in list(self.matches.items()):
+            if match.minute(now, self.minute_seconds) > 95:
+                del self.matches[match_id]
+                self._spawn(1.0, now)
+
+    def live(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._tick(now)
+            return [m.fixture(m.minute(now, self.minute_seconds)) for m in self.matches.values()]
+
+    def statistics(self, match_id) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            match = self.matches.get(match_id)
+        if match is None:
+            return None
+        return match.statistics(match.minute(time.time(), self.minute_seconds))
+
+    def table(self, league_id) -> List[Dict[str, Any]]:
+        with self._lock:
+            teams = [t for m in self.matches.values() if m.league[0] == league_id for t in (m.home, m.away)]
+        return [{'rank': i + 1, 'team': team, 'points': max(0, 90 - 2 * i)} for i, team in enumerate(teams)]
+
+    def fixture_with_stats(self, match_id) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            match = self.matches.get(match_id)
+        if match is None:
+            return None
+        minute = match.minute(time.time(), self.minute_seconds)
+        item = match.fixture(minute)
+        item['statistics'] = match.statistics(minute)
+        return item
+
+
+# ---------- SERVIDOR ----------
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, world: FakeWorld, latency: str = 'fixed:0', error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: int = 1, seed: int = 1):
+        super().__init__(address, FakeHandler)
+        self.world = world
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.messages: List[Dict[str, Any]] = []
+        self.edits = 0
+        self.daily_remaining = 10_000_000
+
+    def draw(self):
+        """Sorteia (latência, falha) de uma requisição; falha em None | 'error' | 'rate_limit'."""
+        with self.lock:
+            delay = self.latency(self.rng)
+            roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            return delay, 'rate_limit'
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, 'error'
+        return delay, None
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'requests': dict(self.counts), 'messages': len(self.messages), 'edits': self.edits,
+                    'live_fixtures': len(self.world.matches)}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, como a API real
+    server: FakeServer
+
+    def log_message(self, fmt, *args):
+        logger.debug(fmt, *args)
+
+    def _reply(self, status: int, body: Any, headers: Dict[str, str] = None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _count(self, key: str):
+        with self.server.lock:
+            self.server.counts[key] += 1
+
+    def _api_headers(self) -> Dict[str, str]:
+        with self.server.lock:
+            self.server.daily_remaining -= 1
+            remaining = self.server.daily_remaining
+        return {'x-ratelimit-requests-limit': '10000000', 'x-ratelimit-requests-remaining': str(remaining),
+                'X-RateLimit-Limit': '100000', 'X-RateLimit-Remaining': '99999'}
+
+    def _inject(self, endpoint: str, telegram: bool = False) -> bool:
+        """Aplica latência/falha sorteada; True se já respondeu com erro."""
+        delay, failure = self.server.draw()
+        if delay > 0:
+            time.sleep(delay)
+        if failure == 'rate_limit':
+            self._count(f'{endpoint}:429')
+            retry = self.server.retry_after
+            if telegram:
+                self._reply(429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                                  'parameters': {'retry_after': retry}})
+            else:
+                self._reply(429, {'errors': {'rateLimit': 'Too many requests'}, 'response': []},
+                            {'Retry-After': str(retry)})
+            return True
+        if failure == 'error':
+            self._count(f'{endpoint}:500')
+            self._reply(500, {'ok': False, 'errors': {'server': 'injected'}, 'response': []})
+            return True
+        return False
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        world = self.server.world
+        if parts.path == '/__stats':
+            return self._reply(200, self.server.stats())
+        if parts.path == '/__messages':
+            with self.server.lock:
+                return self._reply(200, list(self.server.messages))
+
+        if parts.path == '/fixtures' and 'live' in query:
+            endpoint = '/fixtures?live'
+        elif parts.path == '/fixtures' and 'ids' in query:
+            endpoint = '/fixtures?ids'
+        elif parts.path in ('/fixtures/statistics', '/standings'):
+            endpoint = parts.path
+        else:
+            self._count('404')
+            return self._reply(404, {'errors': {'endpoint': 'not found'}, 'response': []})
+        self._count(endpoint)
+        if self._inject(endpoint):
+            return
+
+        if endpoint == '/fixtures?live':
+            response = world.live()
+        elif endpoint == '/fixtures?ids':
+            ids = [int(x) for x in query['ids'][0].split('-') if x.isdigit()][:20]
+            response = [item for item in (world.fixture_with_stats(fid) for fid in ids) if item]
+        elif endpoint == '/fixtures/statistics':
+            fid = int(query.get('fixture', ['0'])[0] or 0)
+            response = world.statistics(fid) or []
+        else:
+            league = int(query.get('league', ['0'])[0] or 0)
+            season = int(query.get('season', ['0'])[0] or 0)
+            response = [{'league': {'id': league, 'season': season, 'standings': [world.table(league)]}}]
+        self._reply(200, {'errors': [], 'results': len(response), 'response': response}, self._api_headers())
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        parts = urlsplit(self.path)
+        method = parts.path.rsplit('/', 1)[-1]
+        if not (parts.path.startswith('/bot') and method in ('sendMessage', 'editMessageText')):
+            self._count('404')
+            return self._reply(404, {'ok': False, 'description': 'Not Found'})
+        self._count(method)
+        if self._inject(method, telegram=True):
+            return
+        try:
+            payload = json.loads(raw or b'{}')
+        except ValueError:
+            return self._reply(400, {'ok': False, 'description': 'Bad Request: invalid JSON'})
+        if method == 'editMessageText':
+            return self._edit(payload)
+        with self.server.lock:
+            self.server.messages.append({'ts': time.time(), 'chat_id': payload.get('chat_id'),
+                                         'text': payload.get('text', '')})
+            message_id = len(self.server.messages)
+        self._reply(200, {'ok': True, 'result': {'message_id': message_id, 'chat': {'id': payload.get('chat_id')}}})
+
+    def _edit(self, payload: Dict[str, Any]):
+        try:
+            index = int(payload.get('message_id')) - 1
+        except (TypeError, ValueError):
+            index = -1
+        with self.server.lock:
+            msg = self.server.messages[index] if 0 <= index < len(self.server.messages) else None
+            if msg is None or str(msg['chat_id']) != str(payload.get('chat_id')):
+                description, msg = 'Bad Request: message to edit not found', None
+            elif msg.get('edited_text', msg['text']) == payload.get('text', ''):
+                description, msg = 'Bad Request: message is not modified', None
+            else:
+                msg['edited_text'] = payload.get('text', '')
+                msg['edited_ts'] = time.time()
+                self.server.edits += 1
+        if msg is None:
+            return self._reply(400, {'ok': False, 'error_code': 400, 'description': description})
+        self._reply(200, {'ok': True, 'result': {'message_id': index + 1, 'chat': {'id': payload.get('chat_id')}}})
+
+
+def start_server(host: str = '127.0.0.1', port: int = 0, fixtures: int = 100, minute_seconds: float = 60.0,
+                 latency: str = 'fixed:0', error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: int = 1, seed: int = 1) -> FakeServer:
+    """Sobe o servidor numa thread daemon; port=0 escolhe uma porta livre (veja server.url)."""
+    world = FakeWorld(fixtures, minute_seconds, seed)
+    server = FakeServer((host, port), world, latency, error_rate, rate_limit_rate, retry_after, seed)
+    threading.Thread(target=server.serve_forever, name='fake-api', daemon=True).start()
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--fixtures', type=int, default=100, help='partidas ao vivo simultâneas')
+    parser.add_argument('--minute-seconds', type=float, default=60.0, help='segundos reais por minuto de jogo')
+    parser.add_argument('--latency', default='fixed:0', help='fixed:MS | uniform:A,B | exp:MEDIA | lognormal:MEDIANA,SIGMA')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração de respostas 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fração de respostas 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='segundos de Retry-After nos 429')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='API-Football + Telegram falsos para testes de carga')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(name)s: %(message)s')
+    server = start_server(args.host, args.port, args.fixtures, args.minute_seconds, args.latency,
+                          args.error_rate, args.rate_limit_rate, args.retry_after, args.seed)
+    logger.info('API falsa em %s (API_FOOTBALL_BASE e TELEGRAM_API)', server.url)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+fixture_lifecycle.py
+Ciclo de vida das partidas: live -> halftime -> finished -> liberada.
+
+Acompanha o status (fixture.status.short) da lista /fixtures?live=all. Partida que termina
+(FT/AET/PEN...) ou some da lista fica como 'finished' por um período de carência
+e depois todo o estado por fixture é liberado pelos callbacks registrados
+(sinais enviados, agendador, caches...). Assim a memória fica estável ao longo
+da temporada.
+
+Environment variables (opcionais):
+- FIXTURE_GRACE_SECONDS (padrão 900)
+"""
+
+import os
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from scheduler import FINISHED_STATUSES
+from fixture_snapshot import FixtureSnapshot
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_GRACE_SECONDS = float(os.getenv('FIXTURE_GRACE_SECONDS', '900'))
+
+HALFTIME_STATUSES = {'HT', 'BT'}
+
+STATE_LIVE = 'live'
+STATE_HALFTIME = 'halftime'
+STATE_FINISHED = 'finished'
+
+
+def _rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except Exception:
+            return 0
+
+
+class FixtureLifecycle:
+    def __init__(self, grace_seconds: float = FIXTURE_GRACE_SECONDS):
+        self.grace = grace_seconds
+        self._state: Dict[Any, str] = {}
+        self._finished_at: Dict[Any, float] = {}
+        self._owners: Dict[str, Dict[str, Optional[Callable]]] = {}
+        self.evicted = 0
+
+    def register(self, name: str, release: Callable[[Any], None], size: Callable[[], int] = None):
+        """release(fixture_id) libera o estado do dono; size() devolve quantas entradas ele guarda."""
+        self._owners[name] = {'release': release, 'size': size}
+
+    def state(self, fixture_id) -> Optional[str]:
+        return self._state.get(fixture_id)
+
+    def update(self, fixtures: List[FixtureSnapshot], now: float = None) -> List[Any]:
+        """Atualiza os estados com a lista ao vivo e libera o que passou da carência."""
+        now = time.monotonic() if now is None else now
+        seen = set()
+        for fixture in fixtures:
+            fixture_id = fixture.id
+            if fixture_id is None:
+                continue
+            seen.add(fixture_id)
+            short = fixture.status
+            if short in FINISHED_STATUSES:
+                self._finish(fixture_id, now)
+            else:
+                self._state[fixture_id] = STATE_HALFTIME if short in HALFTIME_STATUSES else STATE_LIVE
+                self._finished_at.pop(fixture_id, None)
+        # quem saiu da lista ao vivo terminou
+        for fixture_id in list(self._state):
+            if fixture_id not in seen:
+                self._finish(fixture_id, now)
+        return self._evict(now)
+
+    def _finish(self, fixture_id, now: float):
+        if self._state.get(fixture_id) != STATE_FINISHED:
+            self._state[fixture_id] = STATE_FINISHED
+            self._finished_at[fixture_id] = now
+
+    def release(self, fixture_id):
+        """Chama o release de todos os donos (também usado pelos workers do modo sharded)."""
+        for name, owner in self._owners.items():
+            try:
+                owner['release'](fixture_id)
+            except Exception as e:
+                logger.warning('Erro ao liberar %s da fixture %s: %s', name, fixture_id, e)
+
+    def _evict(self, now: float) -> List[Any]:
+        expired = [fid for fid, at in self._finished_at.items() if now - at >= self.grace]
+        for fixture_id in expired:
+            self.release(fixture_id)
+            del self._finished_at[fixture_id]
+            del self._state[fixture_id]
+        if expired:
+            self.evicted += len(expired)
+            logger.info('Estado liberado de %d partidas encerradas', len(expired))
+        return expired
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {STATE_LIVE: 0, STATE_HALFTIME: 0, STATE_FINISHED: 0}
+        for st in self._state.values():
+            counts[st] += 1
+        owners = {}
+        for name, owner in self._owners.items():
+            try:
+                owners[name] = owner['size']() if owner['size'] else None
+            except Exception:
+                owners[name] = None
+        return {
+            'tracked': len(self._state),
+            'states': counts,
+            'evicted_total': self.evicted,
+            'state_entries': owners,
+            'rss_bytes': _rss_bytes(),
+        }
@@ -0,0 +1,87 @@
+"""
+fixture_snapshot.py
+Registro compacto de uma partida ao vivo, no lugar do dict aninhado da API.
+
+Cada item de /fixtures?live=all traz fixture/league/teams/goals/score com
+dezenas de campos (periods, referee, timezone, logos, flags...) que nenhuma
+estratégia lê. parse_fixtures() copia só o que o pipeline usa para um objeto
+com __slots__ (sem __dict__ por instância) logo depois do decode; o JSON bruto
+sai de escopo ao fim de get_live_fixtures e o resto do ciclo (agendador,
+ciclo de vida, fingerprint, scoring e mensagens) lê atributos.
+
+Campos ausentes ou null na API viram None; elapsed vira 0 e venue_name ''.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class FixtureSnapshot:
+    __slots__ = (
+        'id', 'status', 'elapsed', 'venue_name',
+        'league_id', 'league_name', 'season',
+        'home_id', 'home_name', 'away_id', 'away_name',
+        'goals_home', 'goals_away',
+        'ht_home', 'ht_away', 'ft_home', 'ft_away',
+    )
+
+    def __init__(self, id, status: str = '', elapsed: int = 0, venue_name: str = '',
+                 league_id=None, league_name: Optional[str] = None, season=None,
+                 home_id=None, home_name: Optional[str] = None, away_id=None, away_name: Optional[str] = None,
+                 goals_home=None, goals_away=None, ht_home=None, ht_away=None, ft_home=None, ft_away=None):
+        self.id = id
+        self.status = status
+        self.elapsed = elapsed
+        self.venue_name = venue_name
+        self.league_id = league_id
+        self.league_name = league_name
+        self.season = season
+        self.home_id = home_id
+        self.home_name = home_name
+        self.away_id = away_id
+        self.away_name = away_name
+        self.goals_home = goals_home
+        self.goals_away = goals_away
+        self.ht_home = ht_home
+        self.ht_away = ht_away
+        self.ft_home = ft_home
+        self.ft_away = ft_away
+
+    @classmethod
+    def from_api(cls, item: Dict[str, Any]) -> 'FixtureSnapshot':
+        info = item.get('fixture') or {}
+        status = info.get('status') or {}
+        league = item.get('league') or {}
+        teams = item.get('teams') or {}
+        home = teams.get('home') or {}
+        away = teams.get('away') or {}
+        goals = item.get('goals') or {}
+        score = item.get('score') or {}
+        halftime = score.get('halftime') or {}
+        fulltime = score.get('fulltime') or {}
+        return cls(
+            info.get('id'), status.get('short') or '', status.get('elapsed') or 0,
+            (info.get('venue') or {}).get('name') or '',
+            league.get('id'), league.get('name'), league.get('season'),
+            home.get('id'), home.get('name'), away.get('id'), away.get('name'),
+            goals.get('home'), goals.get('away'),
+            halftime.get('home'), halftime.get('away'), fulltime.get('home'), fulltime.get('away'),
+        )
+
+    def __repr__(self):
+        return (f'FixtureSnapshot(id={self.id!r}, {self.home_name!r} x {self.away_name!r}, '
+                f'{self.status} {self.elapsed}\', {self.goals_home}-{self.goals_away})')
+
+
+def parse_fixtures(items: Iterable[Dict[str, Any]]) -> List[FixtureSnapshot]:
+    """Converte a lista 'response' de /fixtures; itens sem fixture.id são descartados."""
+    out = []
+    for item in items or ():
+        snap = FixtureSnapshot.from_api(item)
+        if snap.id is not None:
+            out.append(snap)
+    return out
+
+
+def score_text(home, away) -> str:
+    """Placar 'H x A' com '-' no lugar de gol ainda sem valor (null na API)."""
+    return f"{'-' if home is None else home} x {'-' if away is None else away}"
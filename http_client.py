@@ -0,0 +1,309 @@
+"""
+http_client.py
+Cliente HTTP compartilhado (API-Football + Telegram) com pool por host e keep-alive.
+
+- Síncrono: uma requests.Session por host, com pool urllib3 dimensionável;
+  a conexão TCP+TLS é reaproveitada entre chamadas em vez de refeita a cada get/post.
+- Assíncrono: um httpx.AsyncClient único, vivendo num event loop dedicado
+  (thread própria), para que o keep-alive sobreviva entre ciclos de polling.
+  Bot já todo em asyncio chama attach_loop() e usa request_async() no próprio
+  loop, sem thread extra.
+- Orçamento opcional por host (api_budget.ApiBudget): cada requisição pede um
+  token com prioridade e cada resposta atualiza o orçamento pelos headers.
+- Contadores por host: requisições feitas e conexões abertas (handshakes),
+  daí a taxa de reaproveitamento = 1 - handshakes / requisições.
+- Latência e erros por endpoint vão para metrics (api_request_seconds / api_errors_total).
+- Gravação opcional por host (api_recorder.ApiRecorder) e troca do transporte
+  do host (mount) para o replay offline das capturas (replay.py).
+
+Environment variables (opcionais):
+- HTTP_POOL_CONNECTIONS (pools por sessão, padrão 4)
+- HTTP_POOL_MAXSIZE (conexões por host, padrão 20)
+- HTTP_TIMEOUT (segundos de leitura, padrão 10)
+- HTTP_CONNECT_TIMEOUT (segundos, padrão 5)
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Any, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+import metrics
+from api_budget import BudgetExceeded
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '4'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+
+DEFAULT_HEADERS = {'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'}
+
+# host -> {'requests': n, 'handshakes': n}
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {'requests': 0, 'handshakes': 0})
+_stats_lock = threading.Lock()
+
+
+def _count(host: str, field: str):
+    with _stats_lock:
+        _stats[host][field] += 1
+
+
+# ---------- SYNC (requests) ----------
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count(self.host, 'handshakes')
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count(self.host, 'handshakes')
+        return super()._new_conn()
+
+
+class PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def session_for(url: str) -> requests.Session:
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            adapter = PooledAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            mounted = _mounts.get(host)
+            if mounted is not None:
+                session.mount('http://', mounted[0])
+                session.mount('https://', mounted[0])
+            _sessions[host] = session
+        return session
+
+
+# ---------- ORÇAMENTO / GRAVAÇÃO / REPLAY ----------
+_budgets: Dict[str, Any] = {}  # host -> ApiBudget
+_recorders: Dict[str, Any] = {}  # host -> ApiRecorder
+_mounts: Dict[str, Tuple[Any, Any]] = {}  # netloc -> (adapter requests, transporte httpx)
+
+
+def set_budget(url: str, budget):
+    _budgets[urlsplit(url).hostname or url] = budget
+
+
+def budget_for(url: str):
+    return _budgets.get(urlsplit(url).hostname or url)
+
+
+def set_recorder(url: str, recorder):
+    _recorders[urlsplit(url).hostname or url] = recorder
+
+
+def mount(url: str, adapter, transport):
+    """Troca o transporte do host (sessão requests e AsyncClient); usado pelo replay offline."""
+    global _async_client
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        _mounts[host] = (adapter, transport)
+        _sessions.pop(host, None)
+    old, _async_client = _async_client, None  # recriado com o novo transporte no próximo async_client()
+    if old is not None:
+        _close_client(old)
+
+
+def request(method: str, url: str, priority: int = None, **kwargs) -> requests.Response:
+    """Requisição pelo pool do host; levanta BudgetExceeded se o orçamento do host negar."""
+    kwargs.setdefault('timeout', (HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT))
+    host = urlsplit(url).hostname or ''
+    budget = _budgets.get(host)
+    if budget is not None and not budget.acquire(priority):
+        raise BudgetExceeded(f'orçamento esgotado para {host} (prioridade {priority})')
+    _count(host, 'requests')
+    parts = urlsplit(url)
+    started = time.perf_counter()
+    try:
+        resp = session_for(url).request(method, url, **kwargs)
+    except Exception as e:
+        metrics.observe_request(parts.path, parts.query, time.perf_counter() - started, type(e).__name__)
+        raise
+    metrics.observe_request(parts.path, parts.query, time.perf_counter() - started, resp.status_code)
+    if budget is not None:
+        budget.update(resp.headers, resp.status_code)
+    recorder = _recorders.get(host)
+    if recorder is not None:
+        recorder.record(method, resp.url, resp.status_code, resp.content)
+    return resp
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request('POST', url, **kwargs)
+
+
+# ---------- ASYNC (httpx) ----------
+_loop = None
+_loop_lock = threading.Lock()
+_async_client = None
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='http-client-loop', daemon=True).start()
+        return _loop
+
+
+async def _on_request(req: httpx.Request):
+    host = req.url.host
+    _count(host, 'requests')
+
+    async def trace(event_name, info):
+        # httpcore só abre TCP quando não há conexão ociosa no pool
+        if event_name == 'connection.connect_tcp.complete':
+            _count(host, 'handshakes')
+
+    req.extensions['trace'] = trace
+
+
+async def _on_response(resp: httpx.Response):
+    budget = _budgets.get(resp.request.url.host)
+    if budget is not None:
+        budget.update(resp.headers, resp.status_code)
+    recorder = _recorders.get(resp.request.url.host)
+    if recorder is not None:
+        await resp.aread()  # o hook roda antes do corpo ser lido
+        recorder.record(resp.request.method, str(resp.request.url), resp.status_code, resp.content)
+
+
+class _MeteredTransport(httpx.AsyncBaseTransport):
+    """Mede latência/erros de cada requisição assíncrona, inclusive timeouts e falhas de rede."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport):
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            resp = await self._inner.handle_async_request(request)
+        except Exception as e:
+            metrics.observe_request(request.url.path, request.url.query.decode(), time.perf_counter() - started,
+                                    type(e).__name__)
+            raise
+        metrics.observe_request(request.url.path, request.url.query.decode(), time.perf_counter() - started,
+                                resp.status_code)
+        return resp
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+def attach_loop(loop: asyncio.AbstractEventLoop = None):
+    """Usa o loop do chamador (já rodando) no lugar da thread dedicada; antes do primeiro async_client()."""
+    global _loop
+    loop = loop or asyncio.get_running_loop()
+    with _loop_lock:
+        if _loop is not None and _loop is not loop:
+            raise RuntimeError('http_client já está ligado a outro event loop')
+        _loop = loop
+
+
+def async_client() -> httpx.AsyncClient:
+    """AsyncClient compartilhado; use somente no loop do cliente (run_async() ou attach_loop())."""
+    global _async_client
+    if _async_client is None:
+        limits = httpx.Limits(max_connections=HTTP_POOL_MAXSIZE * HTTP_POOL_CONNECTIONS,
+                              max_keepalive_connections=HTTP_POOL_MAXSIZE)
+        _async_client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            transport=_MeteredTransport(httpx.AsyncHTTPTransport(limits=limits)),
+            event_hooks={'request': [_on_request], 'response': [_on_response]},
+            mounts={f'all://{host}': _MeteredTransport(transport) for host, (_, transport) in _mounts.items()},
+        )
+    return _async_client
+
+
+def run_async(coro, timeout: float = None):
+    """Executa a corrotina no loop do cliente e espera o resultado (chamado de threads)."""
+    loop = _event_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError('run_async() chamado de dentro do loop do cliente; use await')
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+_closing = set()  # aclose() agendados no próprio loop (referência até terminar)
+
+
+def _close_client(client: httpx.AsyncClient):
+    """Fecha o AsyncClient (pool de conexões e transportes) no loop dele."""
+    loop = _event_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        task = loop.create_task(client.aclose())
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+        return
+    try:
+        run_async(client.aclose(), timeout=HTTP_TIMEOUT)
+    except Exception as e:
+        logger.warning('Erro ao fechar o AsyncClient anterior: %s', e)
+
+
+async def request_async(method: str, url: str, priority: int = None, **kwargs) -> httpx.Response:
+    """request() pelo AsyncClient, para quem já roda no loop do cliente; mesmo orçamento/BudgetExceeded."""
+    host = urlsplit(url).hostname or ''
+    budget = _budgets.get(host)
+    if budget is not None and not budget.acquire(priority):
+        raise BudgetExceeded(f'orçamento esgotado para {host} (prioridade {priority})')
+    return await async_client().request(method, url, **kwargs)  # contagem, métricas e orçamento pelos hooks
+
+
+# ---------- STATS ----------
+def connection_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        per_host = {h: dict(v) for h, v in _stats.items()}
+    total_req = sum(v['requests'] for v in per_host.values())
+    total_hs = sum(v['handshakes'] for v in per_host.values())
+    for v in per_host.values():
+        v['reuse_ratio'] = round(1.0 - min(v['handshakes'], v['requests']) / v['requests'], 4) if v['requests'] else 0.0
+    return {
+        'requests': total_req,
+        'handshakes': total_hs,
+        'reuse_ratio': round(1.0 - min(total_hs, total_req) / total_req, 4) if total_req else 0.0,
+        'per_host': per_host,
+    }
+
@@ -0,0 +1,98 @@
+"""
+live_messages.py
+Uma mensagem por partida e janela, atualizada no lugar (editMessageText).
+
+Nos scripts VIP PLUS a chave do sinal é janela + total de escanteios: cada
+escanteio novo manda uma mensagem nova no chat, e partidas fora das janelas
+também (chave 'LIVE'). Com SIGNAL_EDIT_MODE=1 a detecção continua igual, muda
+só a entrega:
+
+- o 1º sinal de (partida, janela) sai com sendMessage e o message_id que o
+  Telegram devolve fica guardado por chat;
+- os seguintes (escanteio novo, linhas diferentes) editam essa mensagem;
+- enquanto o sendMessage está na fila, o texto mais novo espera e é aplicado
+  quando o id chegar;
+- o TelegramDispatcher junta as edições da mesma mensagem que ainda não saíram
+  (vale a última) e espaça as edições (TELEGRAM_EDIT_INTERVAL).
+
+Os ids ficam só em memória: depois de um restart a próxima atualização abre
+mensagem nova. forget(fixture_id) libera a partida (FixtureLifecycle).
+
+Environment variables (opcionais):
+- SIGNAL_EDIT_MODE (1 liga; padrão 0 = uma mensagem por sinal)
+"""
+
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SIGNAL_EDIT_MODE = os.getenv('SIGNAL_EDIT_MODE', '0').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class LiveMessages:
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self._lock = threading.RLock()  # on_message pode vir na mesma thread (dispatcher síncrono)
+        # fixture_id -> (janela, chat_id) -> [message_id (None = sendMessage na fila), texto esperando o id]
+        self._messages: Dict[Any, Dict[Tuple[str, Any], List]] = {}
+        self.opened = 0
+        self.updates = 0
+        self.failed = 0
+
+    def publish(self, fixture_id, window: str, chat_id, text: str,
+                on_sent: Optional[Callable[[float], None]] = None) -> bool:
+        """Abre a mensagem de (partida, janela) no chat ou edita a que já existe; False se a fila recusou."""
+        key = (window, chat_id)
+        # enfileirar só faz put_nowait: sob o lock, as edições entram na fila na ordem dos textos
+        with self._lock:
+            by_key = self._messages.setdefault(fixture_id, {})
+            entry = by_key.get(key)
+            if entry is not None:
+                self.updates += 1
+                if entry[0] is None:
+                    entry[1] = text  # sai quando o sendMessage voltar com o id
+                    return True
+                return self.dispatcher.edit(chat_id, entry[0], text)
+            by_key[key] = [None, None]
+            self.opened += 1
+            ok = self.dispatcher.submit(chat_id, text, on_sent=on_sent,
+                                        on_message=lambda mid: self._opened(fixture_id, key, mid))
+            if not ok:
+                del by_key[key]
+            return ok
+
+    def _opened(self, fixture_id, key: Tuple[str, Any], message_id):
+        """on_message do dispatcher (thread do dispatcher)."""
+        with self._lock:
+            entry = self._messages.get(fixture_id, {}).get(key)
+            if entry is None:  # partida já liberada
+                return
+            if message_id is None:
+                self.failed += 1
+                del self._messages[fixture_id][key]  # o próximo sinal tenta abrir de novo
+                logger.warning('Mensagem da partida %s (%s) no chat %s não foi enviada', fixture_id, key[0], key[1])
+                return
+            entry[0] = message_id
+            if entry[1] is not None:
+                self.dispatcher.edit(key[1], message_id, entry[1])
+                entry[1] = None
+
+    def forget(self, fixture_id):
+        with self._lock:
+            self._messages.pop(fixture_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'fixtures': len(self._messages),
+                'messages': sum(len(by_key) for by_key in self._messages.values()),
+                'opened': self.opened,
+                'updates': self.updates,
+                'failed': self.failed,
+            }
+
+    def __len__(self):
+        return len(self._messages)
@@ -0,0 +1,212 @@
+"""
+loadtest.py
+Teste de carga ponta a ponta: o loop de polling real de um bot contra o fake_api.py.
+
+Sobe o servidor falso (ou usa --server), aponta API_FOOTBALL_BASE e TELEGRAM_API
+para ele, importa o bot e roda o próprio main_loop/start_loop por --duration
+segundos. O ciclo (run_cycle / process_fixtures_and_send) e o submit do Telegram
+são só embrulhados para medir; o resto do pipeline é o de produção.
+
+Relatório (JSON):
+- ciclos: duração (avg/p50/p95/max ms) e requisições à API por ciclo;
+- detecção -> envio: do submit do sinal até o sendMessage chegar no servidor;
+- servidor: requisições por endpoint, 500/429 injetados, mensagens recebidas;
+- dispatcher do Telegram e reaproveitamento de conexões do http_client.
+
+Exemplo (dimensionar para 500 partidas simultâneas):
+  python loadtest.py --bot bot_escanteios_rp_v3 --fixtures 500 --duration 120 \\
+      --latency lognormal:80,0.5 --error-rate 0.01 --rate-limit-rate 0.002
+
+O orçamento da API (api_budget) fica desligado, a menos que se passe --with-budget;
+o dedup de sinais e as assinaturas usam SQLite em memória. --subscribers N
+assina N chats extras com filtros sorteados (ligas, janela, mínimos de
+probabilidade) para medir o fan-out; aumente TELEGRAM_GLOBAL_RATE junto.
+Com SIGNAL_EDIT_MODE=1 (bots VIP) o servidor conta também editMessageText:
+compare requests.sendMessage com e sem o modo.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+
+import requests
+
+import fake_api
+
+logger = logging.getLogger('loadtest')
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {'count': 0, 'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        'count': len(ordered),
+        'avg': round(sum(ordered) / len(ordered), 3),
+        'p50': round(pick(0.50), 3),
+        'p95': round(pick(0.95), 3),
+        'max': round(ordered[-1], 3),
+    }
+
+
+def _telegram_url(server_url: str) -> str:
+    # Telegram pelo nome 'localhost': o http_client conta requisições por host,
+    # assim as da API (127.0.0.1) não se misturam com as do Telegram
+    parts = urlsplit(server_url)
+    if parts.hostname == '127.0.0.1':
+        return f'{parts.scheme}://localhost:{parts.port}'
+    return server_url
+
+
+def _subscribe(bot, count: int, seed: int):
+    """Chats extras com filtros sorteados, além do --chat-id (que recebe tudo)."""
+    from subscriptions import Subscription
+    rng = random.Random(seed)
+    leagues = [league_id for league_id, _ in fake_api.LEAGUES]
+    bot.subscriptions.subscribe_many(Subscription(
+        -2000000 - i,
+        leagues=frozenset(rng.sample(leagues, 2)) if rng.random() < 0.5 else frozenset(),
+        windows=frozenset([rng.choice(('HT', 'FT'))]) if rng.random() < 0.3 else frozenset(),
+        min_p_ge_1=round(rng.uniform(0.0, 0.8), 2),
+        min_p_win=round(rng.uniform(0.0, 0.8), 2),
+    ) for i in range(count))
+
+
+def run(args) -> Dict[str, Any]:
+    server = None
+    server_url = args.server
+    if not server_url:
+        server = fake_api.start_server(port=args.port, fixtures=args.fixtures, minute_seconds=args.minute_seconds,
+                                       latency=args.latency, error_rate=args.error_rate,
+                                       rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+                                       seed=args.seed)
+        server_url = server.url
+    os.environ['API_FOOTBALL_BASE'] = server_url
+    os.environ['TELEGRAM_API'] = _telegram_url(server_url)
+    os.environ.setdefault('TELEGRAM_CHAT_ID', args.chat_id)
+
+    import http_client
+    from replay import load_bot  # modo offline: dedup em memória, sem gravação
+    bot = load_bot(args.bot)
+    if not args.with_budget:
+        http_client.set_budget(bot.API_BASE, None)
+    if args.subscribers:
+        _subscribe(bot, args.subscribers, args.seed)
+    api_host = urlsplit(bot.API_BASE).hostname
+
+    cycle_name = 'run_cycle' if hasattr(bot, 'run_cycle') else 'process_fixtures_and_send'
+    loop_name = 'main_loop' if hasattr(bot, 'main_loop') else 'start_loop'
+    cycle = getattr(bot, cycle_name)
+    cycle_ms: List[float] = []
+    requests_per_cycle: List[float] = []
+    cycle_errors = [0]
+
+    def api_requests() -> int:
+        return http_client.connection_stats()['per_host'].get(api_host, {}).get('requests', 0)
+
+    def timed_cycle(*a, **kw):
+        before = api_requests()
+        started = time.perf_counter()
+        try:
+            return cycle(*a, **kw)
+        except Exception:
+            cycle_errors[0] += 1
+            raise
+        finally:
+            cycle_ms.append((time.perf_counter() - started) * 1000)
+            requests_per_cycle.append(api_requests() - before)
+
+    detected: Dict[Any, List[float]] = {}
+    detected_lock = threading.Lock()
+    submit = bot.telegram.submit
+
+    def timed_submit(chat_id, text, *a, **kw):
+        with detected_lock:
+            detected.setdefault((str(chat_id), text), []).append(time.time())
+        return submit(chat_id, text, *a, **kw)
+
+    setattr(bot, cycle_name, timed_cycle)
+    bot.telegram.submit = timed_submit
+
+    threading.Thread(target=getattr(bot, loop_name), name='loadtest-loop', daemon=True).start()
+    started = time.time()
+    time.sleep(args.duration)
+    # espera a fila do Telegram esvaziar (no máximo --drain s)
+    deadline = time.time() + args.drain
+    while bot.telegram.queue_depth() and time.time() < deadline:
+        time.sleep(0.2)
+    elapsed = time.time() - started
+
+    server_stats = requests.get(f'{server_url}/__stats', timeout=10).json()
+    received = requests.get(f'{server_url}/__messages', timeout=30).json()
+    latencies = []
+    with detected_lock:
+        pending = {key: list(times) for key, times in detected.items()}
+    for msg in received:
+        times = pending.get((str(msg['chat_id']), msg['text']))
+        if times:
+            latencies.append((msg['ts'] - times.pop(0)) * 1000)
+    if server is not None:
+        server.shutdown()
+
+    return {
+        'bot': args.bot,
+        'fixtures': args.fixtures if server is not None else server_stats.get('live_fixtures'),
+        'duration_seconds': round(elapsed, 1),
+        'server': {'url': server_url, 'latency': args.latency, 'error_rate': args.error_rate,
+                   'rate_limit_rate': args.rate_limit_rate, **server_stats},
+        'cycles': {
+            'count': len(cycle_ms),
+            'errors': cycle_errors[0],
+            'duration_ms': _percentiles(cycle_ms),
+            'api_requests': _percentiles(requests_per_cycle),
+        },
+        'signals': {
+            'detected': sum(len(v) for v in detected.values()),
+            'delivered': len(latencies),
+            'detection_to_send_ms': _percentiles(latencies),
+        },
+        'telegram': bot.telegram.stats(),
+        'subscriptions': bot.subscriptions.stats(),
+        'live_messages': bot.live_messages.stats() if getattr(bot, 'live_messages', None) is not None else None,
+        'connections': http_client.connection_stats(),
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Teste de carga do loop de polling contra o fake_api.py')
+    parser.add_argument('--bot', default='bot_escanteios_rp_v3', help='módulo do bot')
+    parser.add_argument('--duration', type=float, default=60.0, help='segundos de loop')
+    parser.add_argument('--drain', type=float, default=30.0, help='espera máxima pela fila do Telegram no fim')
+    parser.add_argument('--server', help='URL de um fake_api.py já rodando (senão sobe um no processo)')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--chat-id', default='-1001')
+    parser.add_argument('--with-budget', action='store_true', help='mantém o api_budget ligado')
+    parser.add_argument('--subscribers', type=int, default=0, help='chats extras assinados, com filtros sorteados')
+    parser.add_argument('--out', help='grava o relatório JSON neste arquivo')
+    parser.add_argument('--log-level', default='WARNING')
+    fake_api.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s %(levelname)s:%(name)s: %(message)s')
+    report = run(args)
+    text = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+    return 0 if report['cycles']['count'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
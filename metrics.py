@@ -0,0 +1,278 @@
+"""
+metrics.py
+Métricas em formato texto do Prometheus, sem dependência externa.
+
+Contadores, gauges e histogramas de buckets fixos: observar é um bisect + soma
+sob um lock (~1 µs), então tudo fica ligado em produção. render() monta o texto
+servido em /metrics pelos bots.
+
+Métricas:
+- bot_cycle_seconds                     duração de um ciclo de polling
+- api_request_seconds{endpoint}         latência por endpoint (API-Football e Telegram)
+- api_errors_total{endpoint,reason}     respostas >= 400 e exceções por endpoint
+- stats_fetch_requests / _fixtures      fan-out de cada busca de statistics
+- bot_scoring_seconds                   tempo de scoring por ciclo
+- telegram_send_seconds                 da fila até o Telegram aceitar a mensagem
+- telegram_messages_total{result}       sent / edited / coalesced / failed / dropped / retry
+- telegram_queue_depth                  mensagens esperando envio
+- signal_window_delay_seconds           da entrada da partida na janela HT/FT até o envio do sinal
+- pipeline_stage_seconds{stage}         tempo de cada lote num estágio do pipeline do ciclo
+- pipeline_items_total{stage}           itens processados por estágio
+- pipeline_queue_depth{stage}           itens esperando na fila de entrada do estágio
+"""
+
+import re
+import time
+import threading
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_registry: List['_Metric'] = []
+
+
+def _fmt(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels_text(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple, object] = {}
+        _registry.append(self)
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+# ---------- CONTADOR ----------
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, labelnames, key):
+        return [f'{name}{_labels_text(labelnames, key)} {_fmt(self.value)}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+# ---------- GAUGE ----------
+class _GaugeChild:
+    __slots__ = ('value', 'function')
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def render(self, name, labelnames, key):
+        value = self.value
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return []
+        return [f'{name}{_labels_text(labelnames, key)} {_fmt(value)}']
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        """Valor lido só na hora do scrape (ex.: profundidade da fila)."""
+        self._default().set_function(function)
+
+
+# ---------- HISTOGRAMA ----------
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # último = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> '_Timer':
+        return _Timer(self)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            cumulative += n
+            le = f'le="{_fmt(bound)}"'
+            lines.append(f'{name}_bucket{_labels_text(labelnames, key, le)} {cumulative}')
+        lines.append(f'{name}_sum{_labels_text(labelnames, key)} {_fmt(total)}')
+        lines.append(f'{name}_count{_labels_text(labelnames, key)} {count}')
+        return lines
+
+
+class _Timer(ContextDecorator):
+    """with HIST.time(): ...  ou  @HIST.time() — cada uso mede com o seu próprio início."""
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+        self._started = 0.0
+
+    def _recreate_cm(self):
+        return _Timer(self._child)
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._started)
+        return False
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self) -> _Timer:
+        return self._default().time()
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# ---------- MÉTRICAS DO BOT ----------
+CYCLE_SECONDS = Histogram('bot_cycle_seconds', 'Duração de um ciclo de polling',
+                          (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+API_REQUEST_SECONDS = Histogram('api_request_seconds', 'Latência das requisições HTTP por endpoint',
+                                (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10), ('endpoint',))
+API_ERRORS = Counter('api_errors_total', 'Respostas >= 400 e exceções por endpoint', ('endpoint', 'reason'))
+STATS_FETCH_REQUESTS = Histogram('stats_fetch_requests', 'Requisições disparadas por busca de statistics',
+                                 (1, 2, 5, 10, 20, 50, 100, 200, 500))
+STATS_FETCH_FIXTURES = Histogram('stats_fetch_fixtures', 'Fixtures pedidas por busca de statistics',
+                                 (1, 5, 10, 20, 50, 100, 200, 500, 1000, 2000))
+SCORING_SECONDS = Histogram('bot_scoring_seconds', 'Tempo de scoring por ciclo',
+                            (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+TELEGRAM_SEND_SECONDS = Histogram('telegram_send_seconds', 'Da fila até o Telegram aceitar a mensagem',
+                                  (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+TELEGRAM_MESSAGES = Counter('telegram_messages_total', 'Mensagens do Telegram por resultado', ('result',))
+TELEGRAM_QUEUE_DEPTH = Gauge('telegram_queue_depth', 'Mensagens esperando envio')
+SIGNAL_WINDOW_DELAY = Histogram('signal_window_delay_seconds',
+                                'Da entrada da partida na janela HT/FT até o envio do sinal',
+                                (1, 5, 10, 20, 30, 60, 120, 300, 600))
+PIPELINE_STAGE_SECONDS = Histogram('pipeline_stage_seconds', 'Tempo de cada lote num estágio do pipeline',
+                                   (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5), ('pipeline', 'stage'))
+PIPELINE_ITEMS = Counter('pipeline_items_total', 'Itens processados por estágio do pipeline', ('pipeline', 'stage'))
+PIPELINE_QUEUE_DEPTH = Gauge('pipeline_queue_depth', 'Itens esperando na fila de entrada do estágio', ('pipeline', 'stage'))
+
+_BOT_PATH = re.compile(r'^/bot[^/]*/')
+
+
+def endpoint_label(path: str, query: str = '') -> str:
+    """Caminho + nomes dos parâmetros (sem valores), ex. /fixtures?live, /fixtures?ids.
+
+    O token do Telegram (/bot<token>/...) nunca aparece no label.
+    """
+    label = _BOT_PATH.sub('/bot<token>/', path or '/')
+    names = sorted({part.split('=', 1)[0] for part in query.split('&') if part})
+    return label + '?' + '&'.join(names) if names else label
+
+
+def observe_request(path: str, query: str, seconds: float, outcome):
+    """outcome: status HTTP (int) ou nome da exceção."""
+    endpoint = endpoint_label(path, query)
+    API_REQUEST_SECONDS.labels(endpoint).observe(seconds)
+    if not isinstance(outcome, int) or outcome >= 400:
+        API_ERRORS.labels(endpoint, outcome).inc()
+
+
+def window_delay_callback(entered_at: Optional[float]) -> Optional[Callable[[float], None]]:
+    """on_sent do TelegramDispatcher que registra o atraso janela -> envio (None se fora de janela)."""
+    if entered_at is None:
+        return None
+    return lambda sent_at: SIGNAL_WINDOW_DELAY.observe(max(0.0, sent_at - entered_at))
@@ -0,0 +1,194 @@
+"""
+pipeline.py
+Ciclo de polling em estágios ligados por filas limitadas.
+
+O corpo do ciclo era um único for: buscar statistics, extrair, pontuar, filtrar,
+montar a mensagem e enviar, uma fixture atrás da outra dentro do mesmo laço.
+Aqui cada etapa é um Stage com as suas threads e uma fila de entrada limitada:
+
+- o que um estágio emite entra na fila do seguinte assim que fica pronto, sem
+  esperar o resto do ciclo (o 1º lote de statistics já é pontuado enquanto os
+  outros ainda estão na rede);
+- fila cheia bloqueia quem produz (backpressure): um estágio lento segura os
+  anteriores em vez de acumular memória;
+- workers por estágio: dá para escalar só o gargalo (ex.: fetch=8) sem mexer
+  no resto; estágios com estado de ciclo (dedup/envio) ficam com 1;
+- batch por estágio: o worker pega um item e junta o que já estiver na fila
+  até o tamanho do lote (ex.: o scoring avalia as linhas em NumPy por lote).
+
+Pipeline.run(itens) alimenta o 1º estágio e volta quando tudo terminou; o que o
+último estágio da rodada emitir volta como lista. run(..., context=x) entrega x
+aos estágios criados com context=True (func(lote, x)), ex.: o dedup da rodada.
+As threads sobem no start() (o loop principal chama; run() também, se ninguém
+chamou), então importar um bot não cria thread nenhuma. stats() mostra, por
+estágio, itens, lotes, erros, tempo ocupado, vazão (itens/s ocupado) e fila
+atual; também em metrics (pipeline_stage_seconds, pipeline_items_total,
+pipeline_queue_depth, com labels pipeline e stage).
+
+Environment variables (opcionais):
+- PIPELINE_WORKERS (ex.: 'fetch=8,extract=1'; o que faltar usa o padrão do bot)
+- PIPELINE_QUEUE_SIZE (itens por fila, padrão 256)
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '256'))
+
+
+def parse_workers(spec: str) -> Dict[str, int]:
+    """'fetch=8,score=2' -> {'fetch': 8, 'score': 2}; entradas inválidas são ignoradas."""
+    out = {}
+    for part in (spec or '').split(','):
+        name, _, value = part.partition('=')
+        try:
+            out[name.strip()] = max(1, int(value))
+        except ValueError:
+            continue
+    return out
+
+
+PIPELINE_WORKERS = parse_workers(os.getenv('PIPELINE_WORKERS', ''))
+
+
+class Stage:
+    """Etapa do pipeline: func(lote) -> itens para o próximo estágio (lista, talvez vazia).
+
+    context=True: func(lote, contexto) com o context passado ao Pipeline.run da rodada.
+    """
+
+    def __init__(self, name: str, func: Callable[..., Iterable[Any]], workers: int = 1,
+                 batch: int = 1, maxsize: int = PIPELINE_QUEUE_SIZE, context: bool = False):
+        self.name = name
+        self.func = func
+        self.context = context
+        self.workers = max(1, PIPELINE_WORKERS.get(name, workers))
+        self.batch = max(1, batch)
+        self.queue: 'queue.Queue[Any]' = queue.Queue(maxsize=max(1, maxsize))
+        self._lock = threading.Lock()
+        self.items_in = 0
+        self.items_out = 0
+        self.batches = 0
+        self.errors = 0
+        self.busy = 0.0
+        self._seconds = self._items = None  # labels do pipeline dono (_bind)
+
+    def _bind(self, pipeline: str):
+        self._seconds = metrics.PIPELINE_STAGE_SECONDS.labels(pipeline, self.name)
+        self._items = metrics.PIPELINE_ITEMS.labels(pipeline, self.name)
+        metrics.PIPELINE_QUEUE_DEPTH.labels(pipeline, self.name).set_function(self.queue.qsize)
+
+    def _take(self) -> List[Any]:
+        items = [self.queue.get()]
+        while len(items) < self.batch:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'batch': self.batch,
+                'queue': self.queue.qsize(),
+                'items_in': self.items_in,
+                'items_out': self.items_out,
+                'batches': self.batches,
+                'errors': self.errors,
+                'busy_s': round(self.busy, 3),
+                'rate': round(self.items_in / self.busy, 1) if self.busy else 0.0,
+            }
+
+
+class Pipeline:
+    def __init__(self, name: str, stages: Sequence[Stage]):
+        self.name = name
+        self.stages = list(stages)
+        self._index = {stage.name: i for i, stage in enumerate(self.stages)}
+        self._run_lock = threading.Lock()
+        self._last = len(self.stages) - 1
+        self._collected: List[Any] = []
+        self._collect_lock = threading.Lock()
+        self._context: Any = None
+        self._start_lock = threading.Lock()
+        self._started = False
+        for stage in self.stages:
+            stage._bind(name)
+
+    def start(self):
+        """Sobe as threads dos estágios (uma vez só)."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            for i, stage in enumerate(self.stages):
+                for n in range(stage.workers):
+                    threading.Thread(target=self._work, args=(i,), name=f'{self.name}-{stage.name}-{n}',
+                                     daemon=True).start()
+
+    def _work(self, index: int):
+        stage = self.stages[index]
+        while True:
+            items = stage._take()
+            started = time.perf_counter()
+            out: List[Any] = []
+            try:
+                result = stage.func(items, self._context) if stage.context else stage.func(items)
+                out = list(result or ())
+            except Exception:
+                logger.exception('Erro no estágio %s (%d itens descartados)', stage.name, len(items))
+                with stage._lock:
+                    stage.errors += 1
+            elapsed = time.perf_counter() - started
+            with stage._lock:
+                stage.items_in += len(items)
+                stage.items_out += len(out)
+                stage.batches += 1
+                stage.busy += elapsed
+            stage._seconds.observe(elapsed)
+            stage._items.inc(len(items))
+            try:
+                if index >= self._last:
+                    if out:
+                        with self._collect_lock:
+                            self._collected.extend(out)
+                else:
+                    nxt = self.stages[index + 1].queue
+                    for item in out:
+                        nxt.put(item)  # fila cheia: espera o próximo estágio (backpressure)
+            finally:
+                # só depois de repassar a saída: run() espera as filas em ordem
+                for _ in items:
+                    stage.queue.task_done()
+
+    def run(self, items: Iterable[Any], last: Optional[str] = None, context: Any = None) -> List[Any]:
+        """Passa os itens por todos os estágios (ou até 'last') e espera terminar; devolve o que o último emitiu."""
+        self.start()
+        with self._run_lock:
+            self._last = self._index[last] if last is not None else len(self.stages) - 1
+            self._context = context  # uma rodada por vez (_run_lock): os estágios leem o da rodada atual
+            self._collected = []
+            first = self.stages[0].queue
+            for item in items:
+                first.put(item)
+            for stage in self.stages[:self._last + 1]:
+                stage.queue.join()
+            collected, self._collected = self._collected, []
+            self._context = None
+            return collected
+
+    def busy_seconds(self, *names: str) -> float:
+        return sum(self.stages[self._index[n]].busy for n in names)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {stage.name: stage.stats() for stage in self.stages}
@@ -0,0 +1,135 @@
+"""
+poisson_engine.py
+Motor Poisson vetorizado (NumPy) para todas as partidas e todas as linhas de uma vez.
+
+Recebe arrays de (cantos atuais, lambda restante) de todas as fixtures ao vivo
+e devolve matrizes win/half_win/push/half_loss/lose com shape (n_fixtures, n_linhas).
+A distribuição de cantos restantes é montada uma única vez por fixture
+(pmf[k] = pmf[k-1] * lam / k) e qualquer escada de linhas asiáticas
+(inteiras, meias e quartos: 4.0, 4.5, 4.25, 4.75...) sai de cumsum + indexação.
+
+As funções escalares (pmf, cdf_le, tail_ge, line_metrics) existem para os
+helpers antigos dos scripts continuarem como wrappers finos.
+"""
+
+from typing import Dict, List, Sequence, Any
+import numpy as np
+
+
+# ---------- DISTRIBUIÇÃO ----------
+def pmf_table(lams, kmax: int) -> np.ndarray:
+    """P(K = k) para k = 0..kmax, uma linha por lambda."""
+    lams = np.clip(np.asarray(lams, dtype=float).reshape(-1), 0.0, None)
+    kmax = max(0, int(kmax))
+    table = np.empty((lams.size, kmax + 1))
+    table[:, 0] = np.exp(-lams)
+    if kmax:
+        ratios = lams[:, None] / np.arange(1, kmax + 1, dtype=float)[None, :]
+        table[:, 1:] = table[:, :1] * np.cumprod(ratios, axis=1)
+    return table
+
+
+def _kmax_for(current_totals: np.ndarray, lines: np.ndarray) -> int:
+    if not current_totals.size or not lines.size:
+        return 0
+    # + 0.25: a metade de cima de uma linha de quarto (4.75 -> 5.0)
+    return max(0, int(np.floor(lines.max() + 0.25)) + 1 - int(current_totals.min()))
+
+
+# ---------- LINHAS ----------
+OUTCOMES = ('win', 'half_win', 'push', 'half_loss', 'lose')
+
+
+def asian_ladder(start: float, stop: float, step: float = 0.25) -> List[float]:
+    """Escada de linhas de start a stop (inclusive), ex.: 3.5, 3.75, 4.0, ..."""
+    n = int(round((stop - start) / step))
+    return [round(start + i * step, 2) for i in range(n + 1)]
+
+
+def batch_line_matrices(current_totals, lams, lines: Sequence[float], clip: bool = False) -> Dict[str, np.ndarray]:
+    """Matrizes {'win','half_win','push','half_loss','lose'} (n_fixtures x n_linhas).
+
+    Linha meia (x.5): win se total final > linha, sem push.
+    Linha inteira: win se total > linha, push se total == linha.
+    Linha de quarto (x.25 / x.75): aposta dividida entre linha-0.25 e linha+0.25;
+    ex.: 4.25 -> total 4 = half_loss, 4.75 -> total 5 = half_win.
+    clip=True limita cada probabilidade a [0, 1] (ruído de ponto flutuante).
+    """
+    totals = np.asarray(current_totals, dtype=np.int64).reshape(-1)
+    lams = np.asarray(lams, dtype=float).reshape(-1)
+    lines_arr = np.asarray(lines, dtype=float).reshape(-1)
+    n, m = totals.size, lines_arr.size
+    if not n or not m:
+        return {name: np.zeros((n, m)) for name in OUTCOMES}
+
+    kmax = _kmax_for(totals, lines_arr)
+    pmf = pmf_table(lams, kmax)
+    cdf = np.cumsum(pmf, axis=1)
+    rows = np.arange(n)[:, None]
+
+    frac = lines_arr % 1
+    quarter = np.isin(frac, (0.25, 0.75))
+    lower = np.where(quarter, lines_arr - 0.25, lines_arr)  # metade de baixo
+    upper = np.where(quarter, lines_arr + 0.25, lines_arr)  # metade de cima
+
+    def eq_prob(x):
+        # P(total final == x), só existe para x inteiro
+        k = x.astype(np.int64)[None, :] - totals[:, None]
+        ok = ((x % 1) == 0)[None, :] & (k >= 0)
+        return np.where(ok, pmf[rows, np.clip(k, 0, kmax)], 0.0)
+
+    # win: total final > metade de cima -> cantos restantes >= floor(upper) + 1 - atual
+    need = np.floor(upper).astype(np.int64)[None, :] + 1 - totals[:, None]
+    win = np.where(need <= 0, 1.0, 1.0 - cdf[rows, np.clip(need - 1, 0, kmax)])
+
+    eq_lower, eq_upper = eq_prob(lower), eq_prob(upper)
+    q = quarter[None, :]
+    push = np.where(q, 0.0, eq_lower)
+    half_win = np.where(q, eq_upper, 0.0)
+    half_loss = np.where(q, eq_lower, 0.0)
+
+    lose = 1.0 - win - half_win - push - half_loss
+    out = {'win': win, 'half_win': half_win, 'push': push, 'half_loss': half_loss, 'lose': lose}
+    if clip:
+        out = {name: np.clip(a, 0.0, 1.0) for name, a in out.items()}
+    return out
+
+
+def evaluate_lines_batch(current_totals, lams, lines: Sequence[float], clip: bool = False) -> List[List[Dict[str, Any]]]:
+    """Uma lista de {'line','p_win','p_half_win','p_push','p_half_loss','p_lose'} por fixture, na ordem de `lines`."""
+    mats = batch_line_matrices(current_totals, lams, lines, clip=clip)
+    cols = [mats[name].tolist() for name in OUTCOMES]
+    return [
+        [{'line': ln, 'p_win': w, 'p_half_win': hw, 'p_push': p, 'p_half_loss': hl, 'p_lose': lo}
+         for ln, w, hw, p, hl, lo in zip(lines, *per_line)]
+        for per_line in zip(*cols)
+    ]
+
+
+def evaluate_asian_lines(current_total, lam, lines: Sequence[float], clip: bool = False) -> List[Dict[str, Any]]:
+    """Uma fixture, qualquer escada de linhas: a distribuição é calculada uma vez só."""
+    return evaluate_lines_batch([current_total], [lam], lines, clip=clip)[0]
+
+
+# ---------- ESCALARES (wrappers) ----------
+def pmf(k, lam) -> float:
+    k = int(k)
+    if k < 0:
+        return 0.0
+    return float(pmf_table([lam], k)[0, k])
+
+
+def cdf_le(k, lam) -> float:
+    k = int(k)
+    if k < 0:
+        return 0.0
+    return float(pmf_table([lam], k)[0].sum())
+
+
+def tail_ge(k, lam) -> float:
+    k = int(k)
+    return 1.0 if k <= 0 else 1.0 - cdf_le(k - 1, lam)
+
+
+def line_metrics(current_total, lam, line, clip: bool = False) -> Dict[str, Any]:
+    return evaluate_lines_batch([current_total], [lam], [line], clip=clip)[0][0]
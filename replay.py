@@ -0,0 +1,357 @@
+"""
+replay.py
+Replay offline das capturas do api_recorder pelo pipeline real dos bots.
+
+O bot é importado sem alterações e só o transporte HTTP do host da API é trocado
+(http_client.mount): get_live_fixtures, fetch_statistics (batch ou concorrente)
+e /standings recebem as respostas gravadas. Cada /fixtures?live=all gravado vira
+um ciclo (run_cycle ou process_fixtures_and_send), com as statistics gravadas
+até a lista ao vivo seguinte.
+
+- Relógio virtual: scheduler, ciclo de vida, caches e dedup de sinais veem o
+  horário da captura, então janelas, carências e TTLs se comportam como ao vivo.
+- Velocidade: --speed 1000 (padrão) espalha os ciclos em 1/1000 do tempo real;
+  --speed 0 roda o mais rápido possível.
+- Nada sai para a rede: sinais vão para um coletor em memória, o dedup usa
+  SQLite em memória e o orçamento da API fica desligado (a captura já reflete
+  o que foi buscado).
+
+Uso:
+  python replay.py capturas/api-20261017-*.jsonl.gz --bot bot_escanteios_rp_v3 [--speed 0] [--out resumo.json]
+
+Saída: JSON com ciclos, partidas, sinais (por dia e por partida) e custo por ciclo (ms);
+com SIGNAL_EDIT_MODE=1, 'signals' conta as mensagens abertas e 'edits' as atualizações.
+"""
+
+import os
+import sys
+import glob
+import gzip
+import json
+import time
+import heapq
+import logging
+import argparse
+import importlib
+import itertools
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+
+logger = logging.getLogger('replay')
+
+_EMPTY = {'errors': [], 'results': 0, 'response': []}
+
+
+# ---------- LEITURA DAS CAPTURAS ----------
+def read_capture(path: str) -> Iterator[Dict[str, Any]]:
+    """Registros de um arquivo .jsonl(.gz); para no trecho truncado de um processo que caiu."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        except (EOFError, OSError, ValueError) as e:
+            logger.warning('Captura %s truncada: %s', path, e)
+
+
+def merge_captures(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """Intercala vários arquivos pelo timestamp (cada arquivo já está em ordem)."""
+    return heapq.merge(*(read_capture(p) for p in paths), key=lambda rec: rec['ts'])
+
+
+def _is_live_list(rec: Dict[str, Any]) -> bool:
+    parts = urlsplit(rec['url'])
+    return parts.path == '/fixtures' and 'live' in parse_qs(parts.query)
+
+
+# ---------- ESTADO DA API NO INSTANTE DO REPLAY ----------
+class CaptureSource:
+    """Responde como a API respondia no instante do replay."""
+
+    def __init__(self):
+        self.live: Dict[str, Any] = dict(_EMPTY)
+        self.stats: Dict[Any, List[Dict[str, Any]]] = {}  # fixture_id -> statistics mais recentes
+        self.other: Dict[str, Tuple[int, Any]] = {}  # path?query -> (status, body), ex. /standings
+        self.served = 0
+        self.misses = 0
+
+    def apply(self, rec: Dict[str, Any]):
+        parts = urlsplit(rec['url'])
+        query = parse_qs(parts.query)
+        body = rec.get('body')
+        if rec.get('status') != 200 or not isinstance(body, dict):
+            return  # erro gravado: o replay mantém a última resposta boa
+        if parts.path == '/fixtures' and 'live' in query:
+            self.live = body
+        elif parts.path == '/fixtures/statistics' and 'fixture' in query:
+            self.stats[_fixture_id(query['fixture'][0])] = body.get('response') or []
+        elif parts.path == '/fixtures' and 'ids' in query:
+            for item in body.get('response') or []:
+                fid = (item.get('fixture') or {}).get('id')
+                if fid is not None:
+                    self.stats[fid] = item.get('statistics') or []
+        else:
+            self.other[rec['url']] = (rec['status'], body)
+
+    def respond(self, url: str) -> Tuple[int, Any]:
+        self.served += 1
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        if parts.path == '/fixtures' and 'live' in query:
+            return 200, self.live
+        if parts.path == '/fixtures/statistics' and 'fixture' in query:
+            fid = _fixture_id(query['fixture'][0])
+            if fid not in self.stats:
+                self.misses += 1
+            return 200, dict(_EMPTY, response=self.stats.get(fid, []))
+        if parts.path == '/fixtures' and 'ids' in query:
+            items = []
+            for raw in query['ids'][0].split('-'):
+                fid = _fixture_id(raw)
+                if fid in self.stats:
+                    items.append({'fixture': {'id': fid}, 'statistics': self.stats[fid]})
+                else:
+                    self.misses += 1
+            return 200, dict(_EMPTY, response=items, results=len(items))
+        key = parts.path + ('?' + parts.query if parts.query else '')
+        if key in self.other:
+            return self.other[key]
+        self.misses += 1
+        return 200, _EMPTY
+
+
+def _fixture_id(raw: str):
+    try:
+        return int(raw)
+    except ValueError:
+        return raw
+
+
+class ReplayAdapter(BaseAdapter):
+    """Adapter requests que responde da captura (get_live_fixtures, /standings)."""
+
+    def __init__(self, source: CaptureSource):
+        super().__init__()
+        self.source = source
+
+    def send(self, request, **kwargs):
+        status, body = self.source.respond(request.url)
+        resp = requests.Response()
+        resp.status_code = status
+        resp._content = json.dumps(body).encode('utf-8')
+        resp.headers['Content-Type'] = 'application/json'
+        resp.encoding = 'utf-8'
+        resp.url = request.url
+        resp.request = request
+        return resp
+
+    def close(self):
+        pass
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Transporte httpx que responde da captura (fetch_statistics)."""
+
+    def __init__(self, source: CaptureSource):
+        self.source = source
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        status, body = self.source.respond(str(request.url))
+        return httpx.Response(status, content=json.dumps(body).encode('utf-8'),
+                              headers={'Content-Type': 'application/json'}, request=request)
+
+
+# ---------- RELÓGIO VIRTUAL ----------
+class VirtualClock:
+    """Substitui o módulo time nos componentes com estado por tempo (time.monotonic/time.time)."""
+
+    def __init__(self, start_ts: float):
+        self.now = start_ts
+        self._origin = start_ts
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now - self._origin + 1000.0
+
+    def sleep(self, seconds: float):
+        self.now += max(0.0, seconds)
+
+    def __getattr__(self, name):
+        return getattr(time, name)  # perf_counter, strftime...
+
+
+CLOCKED_MODULES = ('scheduler', 'fixture_lifecycle', 'standings_cache', 'signal_store', 'api_budget')
+
+
+class SignalCollector:
+    """No lugar do TelegramDispatcher: guarda os sinais em vez de enviar."""
+
+    def __init__(self):
+        self.messages: List[Dict[str, Any]] = []
+        self.edits = 0
+
+    def submit(self, chat_id, text: str, parse_mode: str = 'HTML', on_message=None, **extra) -> bool:
+        self.messages.append({'chat_id': chat_id, 'text': text})
+        if on_message is not None:
+            on_message(len(self.messages))  # message_id para as edições (SIGNAL_EDIT_MODE)
+        return True
+
+    def edit(self, chat_id, message_id, text: str, parse_mode: str = 'HTML', **extra) -> bool:
+        self.edits += 1
+        return True
+
+    def queue_depth(self) -> int:
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {'queue_depth': 0, 'sent': len(self.messages), 'failed': 0, 'dropped': 0}
+
+
+# ---------- REPLAY ----------
+def load_bot(name: str):
+    """Importa o bot em modo offline (sem envio, sem disco, sem orçamento)."""
+    os.environ.setdefault('SIGNAL_DB_PATH', ':memory:')
+    os.environ.setdefault('SUBSCRIPTIONS_DB_PATH', ':memory:')
+    os.environ.setdefault('API_FOOTBALL_KEY', 'replay')
+    os.environ.setdefault('TOKEN', 'replay')
+    os.environ.setdefault('TELEGRAM_CHAT_ID', 'replay')
+    os.environ.pop('API_RECORD_DIR', None)  # não regrava o próprio replay
+    return importlib.import_module(name)
+
+
+def _cycle_fn(bot):
+    for name in ('run_cycle', 'process_fixtures_and_send'):
+        fn = getattr(bot, name, None)
+        if callable(fn):
+            return fn
+    raise SystemExit(f'{bot.__name__}: nenhum run_cycle/process_fixtures_and_send para reproduzir')
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def replay(paths: List[str], bot_name: str, speed: float = 1000.0) -> Dict[str, Any]:
+    import http_client
+
+    bot = load_bot(bot_name)
+    cycle = _cycle_fn(bot)
+    source = CaptureSource()
+    http_client.mount(bot.API_BASE, ReplayAdapter(source), ReplayTransport(source))
+    http_client.set_budget(bot.API_BASE, None)
+    collector = SignalCollector()
+    bot.telegram = collector
+    if getattr(bot, 'live_messages', None) is not None:
+        bot.live_messages.dispatcher = collector
+
+    records = merge_captures(paths)
+    first = next(records, None)
+    if first is None:
+        raise SystemExit('Nenhum registro nas capturas informadas')
+    clock = VirtualClock(first['ts'])
+    for mod_name in CLOCKED_MODULES:
+        mod = sys.modules.get(mod_name)
+        if mod is not None and getattr(mod, 'time', None) is time:
+            mod.time = clock
+
+    cycle_ms: List[float] = []
+    signals_per_day: Dict[str, int] = defaultdict(int)
+    fixtures_per_day: Dict[str, set] = defaultdict(set)
+    errors = 0
+    cycle_ts = None
+    wall_start = time.perf_counter()
+
+    def run(ts: float):
+        nonlocal errors
+        clock.now = ts
+        day = datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d')
+        for item in source.live.get('response') or []:
+            fixtures_per_day[day].add((item.get('fixture') or {}).get('id'))
+        before = len(collector.messages)
+        started = time.perf_counter()
+        try:
+            cycle()
+        except Exception as e:
+            errors += 1
+            logger.exception('Erro no ciclo de %s: %s', ts, e)
+        cycle_ms.append((time.perf_counter() - started) * 1000)
+        signals_per_day[day] += len(collector.messages) - before
+
+    def pace(prev_ts: float, next_ts: float, spent_ms: float):
+        if speed > 0:
+            time.sleep(max(0.0, (next_ts - prev_ts) / speed - spent_ms / 1000))
+
+    for rec in itertools.chain([first], records):
+        if _is_live_list(rec) and rec.get('status') == 200:
+            if cycle_ts is not None:
+                run(cycle_ts)
+                pace(cycle_ts, rec['ts'], cycle_ms[-1])
+            cycle_ts = rec['ts']
+        source.apply(rec)
+    if cycle_ts is not None:
+        run(cycle_ts)
+
+    wall = time.perf_counter() - wall_start
+    simulated = (cycle_ts - first['ts']) if cycle_ts is not None else 0.0
+    ordered = sorted(cycle_ms)
+    total_signals = len(collector.messages)
+    total_fixtures = len(set().union(*fixtures_per_day.values())) if fixtures_per_day else 0
+    return {
+        'bot': bot_name,
+        'files': paths,
+        'cycles': len(cycle_ms),
+        'cycle_errors': errors,
+        'fixtures': total_fixtures,
+        'signals': total_signals,
+        'edits': collector.edits,
+        'signals_per_match': round(total_signals / total_fixtures, 3) if total_fixtures else 0.0,
+        'match_days': {
+            day: {'fixtures': len(fixtures_per_day[day]), 'signals': signals_per_day[day]}
+            for day in sorted(fixtures_per_day)
+        },
+        'cycle_ms': {
+            'avg': round(sum(cycle_ms) / len(cycle_ms), 3) if cycle_ms else 0.0,
+            'p50': round(_percentile(ordered, 0.50), 3),
+            'p95': round(_percentile(ordered, 0.95), 3),
+            'max': round(ordered[-1], 3) if ordered else 0.0,
+        },
+        'api': {'served': source.served, 'not_captured': source.misses},
+        'simulated_seconds': round(simulated, 1),
+        'wall_seconds': round(wall, 3),
+        'speedup': round(simulated / wall, 1) if wall > 0 else 0.0,
+    }
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Replay offline de capturas da API-Football')
+    parser.add_argument('captures', nargs='+', help='arquivos .jsonl.gz (aceita glob)')
+    parser.add_argument('--bot', default='bot_escanteios_rp_v3', help='módulo do bot (ex.: bot_escanteios_rp_v2)')
+    parser.add_argument('--speed', type=float, default=1000.0, help='multiplicador de velocidade; 0 = sem pausa')
+    parser.add_argument('--out', help='grava o resumo JSON neste arquivo')
+    parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s %(levelname)s:%(name)s: %(message)s')
+    paths = sorted({p for pattern in args.captures for p in (glob.glob(pattern) or [pattern])})
+    summary = replay(paths, args.bot, speed=args.speed)
+    text = json.dumps(summary, indent=2, sort_keys=True, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+scheduler.py
+Agendador de polling por janela (HT/FT) para as statistics das partidas ao vivo.
+
+Fila de prioridade (heap) de fixtures ordenada pelo próximo horário de busca:
+- dentro da janela (ex.: 33–40', 83–90'): busca a cada POLL_FAST segundos;
+- a poucos minutos da janela: a cada POLL_NEAR segundos;
+- longe da janela (minuto 10, minuto 60...): acorda só perto da próxima
+  janela, no máximo a cada POLL_FAR segundos;
+- encerradas: saem da fila.
+
+Também guarda desde quando cada partida está na janela atual (window_entered),
+para medir o atraso entre a entrada na janela e o envio do sinal.
+
+A lista /fixtures?live=all continua sendo lida a cada ciclo (1 requisição);
+o que o agendador economiza são as buscas de statistics.
+
+Environment variables (opcionais):
+- POLL_INTERVAL (intervalo máximo entre ciclos, padrão 10)
+- POLL_FAST (padrão 10), POLL_NEAR (padrão 20), POLL_FAR (padrão 300)
+- POLL_NEAR_MINUTES (padrão 3)
+"""
+
+import os
+import time
+import heapq
+import logging
+from typing import Dict, Any, List, Sequence, Tuple
+
+from fixture_snapshot import FixtureSnapshot
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv('POLL_INTERVAL', '10'))
+POLL_FAST = float(os.getenv('POLL_FAST', '10'))
+POLL_NEAR = float(os.getenv('POLL_NEAR', '20'))
+POLL_FAR = float(os.getenv('POLL_FAR', '300'))
+POLL_NEAR_MINUTES = float(os.getenv('POLL_NEAR_MINUTES', '3'))
+MIN_SLEEP = 1.0
+
+FINISHED_STATUSES = {'FT', 'AET', 'PEN', 'PST', 'CANC', 'ABD', 'AWD', 'WO'}
+
+
+def fixture_minute_status(fixture: FixtureSnapshot) -> Tuple[int, str]:
+    return fixture.elapsed, fixture.status
+
+
+def minutes_to_window(minute: float, windows: Sequence[Tuple[int, int]]):
+    """0 dentro de uma janela, minutos até a próxima, ou None se já passou de todas."""
+    best = None
+    for start, end in windows:
+        if start <= minute <= end:
+            return 0
+        if minute < start and (best is None or start - minute < best):
+            best = start - minute
+    return best
+
+
+def window_index(minute: float, windows: Sequence[Tuple[int, int]]):
+    """Índice da janela que contém o minuto, ou None."""
+    for idx, (start, end) in enumerate(windows):
+        if start <= minute <= end:
+            return idx
+    return None
+
+
+class WindowScheduler:
+    def __init__(self, windows: Sequence[Tuple[int, int]], fast: float = POLL_FAST, near: float = POLL_NEAR,
+                 far: float = POLL_FAR, near_minutes: float = POLL_NEAR_MINUTES):
+        self.windows = sorted(windows)
+        self.fast = fast
+        self.near = near
+        self.far = far
+        self.near_minutes = near_minutes
+        self._heap: List[Tuple[float, Any]] = []
+        self._due: Dict[Any, float] = {}  # fixture_id -> horário agendado (entradas velhas do heap são ignoradas)
+        self._entered: Dict[Any, Tuple[int, float]] = {}  # fixture_id -> (janela, quando foi vista nela)
+
+    def interval_for(self, minute: float, status: str) -> float:
+        if status == 'HT':
+            # intervalo: nada acontece até o 2º tempo, mas não passamos da janela FT
+            return self.far
+        to_window = minutes_to_window(minute, self.windows)
+        if to_window == 0:
+            return self.fast
+        if to_window is None:
+            return self.far
+        if to_window <= self.near_minutes:
+            return self.near
+        return min(self.far, max(self.near, (to_window - self.near_minutes) * 60.0))
+
+    def _schedule(self, fixture_id, when: float):
+        self._due[fixture_id] = when
+        heapq.heappush(self._heap, (when, fixture_id))
+
+    def update(self, fixtures: List[FixtureSnapshot], now: float = None):
+        """Sincroniza com a lista ao vivo: entra quem é novo, sai quem terminou/sumiu."""
+        now = time.monotonic() if now is None else now
+        seen = set()
+        for fixture in fixtures:
+            fixture_id = fixture.id
+            minute, status = fixture_minute_status(fixture)
+            if status in FINISHED_STATUSES:
+                self._due.pop(fixture_id, None)
+                self._entered.pop(fixture_id, None)
+                continue
+            seen.add(fixture_id)
+            idx = window_index(minute, self.windows) if status != 'HT' else None
+            if idx is None:
+                self._entered.pop(fixture_id, None)
+            else:
+                entered = self._entered.get(fixture_id)
+                if entered is None or entered[0] != idx:
+                    self._entered[fixture_id] = (idx, now)
+            due = self._due.get(fixture_id)
+            if due is None:
+                self._schedule(fixture_id, now)  # nova partida: busca já
+            else:
+                # aproxima o agendamento se a partida entrou/chegou perto de uma janela
+                sooner = now + self.interval_for(minute, status)
+                if sooner < due:
+                    self._schedule(fixture_id, sooner)
+        for fixture_id in list(self._due):
+            if fixture_id not in seen:
+                del self._due[fixture_id]
+                self._entered.pop(fixture_id, None)
+
+    def pop_due(self, fixtures: List[FixtureSnapshot], now: float = None) -> List[FixtureSnapshot]:
+        """Fixtures cujas statistics devem ser buscadas neste ciclo (e reagenda cada uma)."""
+        now = time.monotonic() if now is None else now
+        by_id = {f.id: f for f in fixtures}
+        due_ids = []
+        while self._heap and self._heap[0][0] <= now:
+            when, fixture_id = heapq.heappop(self._heap)
+            if self._due.get(fixture_id) != when or fixture_id not in by_id:
+                continue  # entrada obsoleta
+            due_ids.append(fixture_id)
+        out = []
+        for fixture_id in due_ids:
+            fixture = by_id[fixture_id]
+            minute, status = fixture_minute_status(fixture)
+            self._schedule(fixture_id, now + self.interval_for(minute, status))
+            out.append(fixture)
+        return out
+
+    def sleep_hint(self, now: float = None, max_sleep: float = POLL_INTERVAL) -> float:
+        """Quanto dormir até o próximo ciclo útil (limitado a [MIN_SLEEP, max_sleep])."""
+        now = time.monotonic() if now is None else now
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return max_sleep
+        return max(MIN_SLEEP, min(max_sleep, self._heap[0][0] - now))
+
+    def window_entered(self, fixture_id):
+        """Horário (monotonic) em que a partida foi vista pela 1ª vez na janela atual; None se fora de janela."""
+        entered = self._entered.get(fixture_id)
+        return entered[1] if entered else None
+
+    def forget(self, fixture_id):
+        self._due.pop(fixture_id, None)
+        self._entered.pop(fixture_id, None)
+
+    def __len__(self):
+        return len(self._due)
@@ -0,0 +1,367 @@
+"""
+sharding.py
+Modo sharded: as partidas ao vivo divididas entre N workers (processos locais ou outras instâncias).
+
+Papéis:
+- coordenador (o processo do bot, com o Flask): lê /fixtures?live=all uma vez por
+  ciclo, roda ciclo de vida e agendador, e reparte as fixtures devidas entre os
+  shards por hash do fixture_id (ou da liga, SHARD_KEY=league);
+- workers: recebem a sua partição, buscam as statistics, fazem o scoring e
+  devolvem os sinais montados (bot.score_fixtures), cada um com a sua fração da
+  cota da API (ApiBudget(share=...));
+- envio: só o coordenador tem o SignalStore e o TelegramDispatcher, então o dedup
+  acontece num lugar só e não sai sinal duplicado, mesmo com worker caindo e voltando.
+
+A partição é estável (crc32 da chave % SHARD_WORKERS): a mesma partida cai sempre
+no mesmo shard e o cache de scoring (change_detection) continua valendo; com
+SHARD_KEY=league o cache de classificação também fica num worker só.
+Shard sem worker conectado (subindo, caiu, conexão perdida) é processado no
+próprio coordenador naquele ciclo. Worker que passa de SHARD_TIMEOUT ou devolve
+erro não perde a partição: ela é refeita no coordenador no mesmo ciclo (senão os
+sinais das janelas HT/FT daquele ciclo sumiriam); o que estourou o tempo é
+desligado (o local é morto e sobe outro) e o shard fica no coordenador até um
+worker reconectar.
+
+Transporte: multiprocessing.connection (TCP + authkey, pickle). Os workers locais
+são subprocessos deste arquivo. Em outra máquina/instância do Render:
+  SHARD_AUTHKEY=... python sharding.py worker --bot bot_escanteios_rp_v3 --connect coordenador:7100
+com o coordenador rodando com SHARD_WORKERS=N, SHARD_SPAWN=0 e SHARD_LISTEN=0.0.0.0:7100.
+
+Environment variables (opcionais):
+- SHARD_WORKERS (número de shards; 0 ou 1 = desligado, padrão 0)
+- SHARD_SPAWN (workers locais a subir, padrão = SHARD_WORKERS)
+- SHARD_KEY ('fixture' ou 'league', padrão 'fixture')
+- SHARD_LISTEN (host:porta do coordenador, padrão 127.0.0.1:0 = porta livre)
+- SHARD_AUTHKEY (segredo compartilhado; obrigatório com workers remotos)
+- SHARD_TIMEOUT (segundos esperando a resposta de um worker, padrão 60)
+"""
+
+import os
+import sys
+import time
+import zlib
+import atexit
+import socket
+import logging
+import secrets
+import argparse
+import importlib
+import threading
+import subprocess
+from multiprocessing.connection import Client, Connection, Listener, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+import http_client
+from api_budget import ApiBudget
+
+logger = logging.getLogger(__name__)
+
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '0'))
+SHARD_SPAWN = int(os.getenv('SHARD_SPAWN', str(SHARD_WORKERS)))
+SHARD_KEY = os.getenv('SHARD_KEY', 'fixture').lower()
+SHARD_LISTEN = os.getenv('SHARD_LISTEN', '127.0.0.1:0')
+SHARD_AUTHKEY = os.getenv('SHARD_AUTHKEY')
+SHARD_TIMEOUT = float(os.getenv('SHARD_TIMEOUT', '60'))
+
+RECONNECT_SECONDS = 2.0
+
+
+def parse_address(text: str) -> Tuple[str, int]:
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def shard_of(fixture, count: int, key: str = SHARD_KEY) -> int:
+    """Shard dono da fixture; crc32 em vez de hash() para valer igual em todos os processos."""
+    value = fixture.league_id if key == 'league' else fixture.id
+    return zlib.crc32(str(value).encode()) % count
+
+
+def bot_name(bot) -> str:
+    return os.path.splitext(os.path.basename(bot.__file__))[0]
+
+
+# ---------- COORDENADOR ----------
+class ShardPool:
+    def __init__(self, bot, count: int, key: str = SHARD_KEY, listen: str = SHARD_LISTEN,
+                 authkey: str = SHARD_AUTHKEY, spawn: int = None, timeout: float = SHARD_TIMEOUT):
+        self.bot = bot
+        self.name = bot_name(bot)
+        self.count = count
+        self.key = key
+        self.timeout = timeout
+        spawn = count if spawn is None else spawn
+        if not authkey and spawn < count:
+            logger.warning('SHARD_AUTHKEY não definido: só os workers locais conseguem conectar')
+        self._authkey = authkey or secrets.token_hex(16)
+        self._listener = Listener(parse_address(listen), authkey=self._authkey.encode())
+        self.address = '%s:%d' % self._listener.address
+        self._workers: Dict[int, Connection] = {}  # shard -> conexão do worker
+        self._pids: Dict[int, Tuple[Any, str]] = {}  # shard -> (pid, host) do worker, para reiniciar travado
+        self._lock = threading.Lock()
+        self._procs: List[subprocess.Popen] = []
+        self._closed = False
+        self.cycles = 0
+        self.remote_fixtures = 0
+        self.local_fixtures = 0
+        self.failures = 0
+        # coordenador + workers dividem a cota; sem orçamento instalado (ex.: loadtest) segue sem
+        self.share = None
+        if http_client.budget_for(bot.API_BASE) is not None:
+            self.share = 1.0 / (count + 1)
+            http_client.set_budget(bot.API_BASE, ApiBudget(share=self.share))
+        threading.Thread(target=self._accept_loop, name='shard-accept', daemon=True).start()
+        self._procs = [self._spawn() for _ in range(spawn)]
+        atexit.register(self.close)
+        logger.info('Modo sharded: %d shards por %s, coordenador em %s (%d workers locais)',
+                    count, key, self.address, spawn)
+
+    def _spawn(self) -> subprocess.Popen:
+        env = dict(os.environ, SHARD_AUTHKEY=self._authkey, SHARD_WORKERS='0')
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'worker', '--bot', self.name,
+             '--connect', self.address, '--parent', str(os.getpid())],
+            env=env, cwd=os.path.dirname(os.path.abspath(self.bot.__file__)))
+        return proc
+
+    def _respawn_dead(self):
+        for i, proc in enumerate(self._procs):
+            if proc.poll() is not None and not self._closed:
+                logger.warning('Worker local %s saiu (código %s); subindo outro', proc.pid, proc.returncode)
+                self._procs[i] = self._spawn()
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+                hello = conn.recv()
+            except Exception as e:
+                if self._closed:
+                    return
+                logger.warning('Conexão de worker recusada: %s', e)
+                continue
+            with self._lock:
+                free = [i for i in range(self.count) if i not in self._workers]
+                valid = isinstance(hello, tuple) and len(hello) == 4 and hello[0] == 'hello'
+                if not valid or hello[3] != self.name or not free:
+                    reason = 'bot diferente' if valid and hello[3] != self.name else 'todos os shards ocupados'
+                    self._send_quietly(conn, ('reject', reason if valid else 'mensagem inválida'))
+                    conn.close()
+                    continue
+                index = free[0]
+                try:
+                    conn.send(('welcome', index, self.count, self.share))
+                except OSError:
+                    conn.close()
+                    continue
+                self._workers[index] = conn
+                self._pids[index] = (hello[1], hello[2])
+            logger.info('Worker %s@%s no shard %d/%d', hello[1], hello[2], index, self.count)
+
+    @staticmethod
+    def _send_quietly(conn: Connection, msg):
+        try:
+            conn.send(msg)
+        except (OSError, ValueError):
+            pass
+
+    def _drop(self, index: int, conn: Connection, reason):
+        with self._lock:
+            if self._workers.get(index) is conn:
+                del self._workers[index]
+                self._pids.pop(index, None)
+        conn.close()
+        if self._closed:  # close() fechou a conexão no meio de um score()
+            return
+        self.failures += 1
+        logger.warning('Shard %d sem worker (%s); segue no coordenador', index, reason)
+
+    def _restart(self, worker: Optional[Tuple[Any, str]]):
+        """Mata um worker local travado e sobe outro; remoto só perde a conexão e reconecta sozinho."""
+        if worker is None or worker[1] != socket.gethostname():
+            return
+        for i, proc in enumerate(self._procs):
+            if proc.pid == worker[0] and proc.poll() is None:
+                logger.warning('Worker local %s travado; reiniciando', proc.pid)
+                proc.kill()
+                try:
+                    proc.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    pass
+                if not self._closed:
+                    self._procs[i] = self._spawn()
+                return
+
+    def score(self, fixtures) -> list:
+        """Sinais das fixtures devidas: cada shard no seu worker, o que sobrar aqui mesmo."""
+        self.cycles += 1
+        self._respawn_dead()
+        groups: Dict[int, list] = {}
+        for fixture in fixtures:
+            groups.setdefault(shard_of(fixture, self.count, self.key), []).append(fixture)
+        with self._lock:
+            workers = dict(self._workers)
+            pids = dict(self._pids)
+        sent_keys = self.bot.sent_signals.keys
+        local, pending = [], {}
+        for index, batch in groups.items():
+            conn = workers.get(index)
+            if conn is not None:
+                try:
+                    conn.send(('score', batch, {f.id: sent_keys(f.id) for f in batch}))
+                    pending[conn] = (index, batch)
+                    continue
+                except (OSError, ValueError) as e:
+                    self._drop(index, conn, e)
+            local.extend(batch)
+        self.remote_fixtures += len(fixtures) - len(local)
+
+        signals = self.bot.score_fixtures(local) if local else []  # enquanto os workers trabalham
+        failed = []
+        deadline = time.monotonic() + self.timeout
+        while pending:
+            ready = wait(list(pending), timeout=max(0.0, deadline - time.monotonic()))
+            if not ready:
+                for conn, (index, batch) in pending.items():
+                    self._drop(index, conn, f'sem resposta em {self.timeout:.0f}s')
+                    self._restart(pids.get(index))
+                    failed.extend(batch)  # refaz aqui: a janela HT/FT não espera o próximo ciclo
+                break
+            for conn in ready:
+                index, batch = pending.pop(conn)
+                try:
+                    kind, payload = conn.recv()
+                except (OSError, EOFError) as e:
+                    self._drop(index, conn, e)
+                    failed.extend(batch)  # conexão caiu no meio: refaz aqui
+                    continue
+                if kind == 'signals':
+                    signals.extend(payload)
+                else:
+                    logger.warning('Erro no worker do shard %d: %s; refazendo no coordenador', index, payload)
+                    failed.extend(batch)
+        if failed:
+            signals.extend(self.bot.score_fixtures(failed))
+        self.local_fixtures += len(local) + len(failed)
+        return signals
+
+    def forget(self, fixture_id):
+        """Release do ciclo de vida: repassa a fixture encerrada para todos os workers."""
+        with self._lock:
+            workers = dict(self._workers)
+        for index, conn in workers.items():
+            try:
+                conn.send(('forget', fixture_id))
+            except (OSError, ValueError) as e:
+                self._drop(index, conn, e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            connected = sorted(self._workers)
+        return {
+            'shards': self.count,
+            'key': self.key,
+            'address': self.address,
+            'connected': connected,
+            'local_workers': len(self._procs),
+            'cycles': self.cycles,
+            'remote_fixtures': self.remote_fixtures,
+            'local_fixtures': self.local_fixtures,
+            'failures': self.failures,
+            'budget_share': self.share,
+        }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+        for conn in workers:
+            self._send_quietly(conn, ('stop',))
+            conn.close()
+        for proc in self._procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.terminate()
+        self._listener.close()
+
+
+def start(bot) -> Optional[ShardPool]:
+    """ShardPool do bot se SHARD_WORKERS > 1 (chamado no início do loop principal)."""
+    if SHARD_WORKERS <= 1:
+        return None
+    pool = ShardPool(bot, SHARD_WORKERS, spawn=min(SHARD_SPAWN, SHARD_WORKERS))
+    bot.lifecycle.register('shards', pool.forget)
+    return pool
+
+
+# ---------- WORKER ----------
+def _serve(bot, conn: Connection) -> bool:
+    """Atende o coordenador até a conexão cair (False) ou chegar 'stop' (True)."""
+    while True:
+        msg = conn.recv()
+        kind = msg[0]
+        if kind == 'score':
+            _, fixtures, sent = msg
+            try:
+                signals = bot.score_fixtures(fixtures, seen=lambda fid, key: key in sent.get(fid, ()))
+                conn.send(('signals', signals))
+            except Exception as e:
+                logger.exception('Erro no scoring do shard: %s', e)
+                conn.send(('error', repr(e)))
+        elif kind == 'forget':
+            bot.lifecycle.release(msg[1])
+        elif kind == 'stop':
+            return True
+
+
+def run_worker(name: str, address: str, authkey: str, parent_pid: int = None) -> int:
+    os.environ['SIGNAL_DB_PATH'] = ':memory:'  # o dedup é do coordenador
+    os.environ['SUBSCRIPTIONS_DB_PATH'] = ':memory:'  # o fan-out também
+    bot = importlib.import_module(name)
+    while True:
+        if parent_pid and os.getppid() != parent_pid:
+            logger.info('Coordenador encerrado; worker saindo')
+            return 0
+        try:
+            conn = Client(parse_address(address), authkey=authkey.encode())
+        except Exception as e:
+            logger.debug('Coordenador %s indisponível: %s', address, e)
+            time.sleep(RECONNECT_SECONDS)
+            continue
+        try:
+            conn.send(('hello', os.getpid(), socket.gethostname(), name))
+            reply = conn.recv()
+            if reply[0] != 'welcome':
+                logger.error('Coordenador recusou o worker: %s', reply[1])
+                return 1
+            _, index, count, share = reply
+            if share is not None:
+                http_client.set_budget(bot.API_BASE, ApiBudget(share=share))
+            logger.info('Worker %d no shard %d/%d de %s', os.getpid(), index, count, address)
+            if _serve(bot, conn):
+                return 0
+        except (OSError, EOFError) as e:
+            logger.warning('Conexão com o coordenador perdida: %s', e)
+        finally:
+            conn.close()
+        time.sleep(RECONNECT_SECONDS)
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Worker do modo sharded')
+    parser.add_argument('role', choices=['worker'])
+    parser.add_argument('--bot', required=True, help='módulo do bot (ex.: bot_escanteios_rp_v3)')
+    parser.add_argument('--connect', default=os.getenv('SHARD_CONNECT'), help='host:porta do coordenador')
+    parser.add_argument('--parent', type=int, help='PID do coordenador (workers locais saem junto com ele)')
+    args = parser.parse_args(argv)
+    if not args.connect or not SHARD_AUTHKEY:
+        parser.error('--connect (ou SHARD_CONNECT) e SHARD_AUTHKEY são obrigatórios')
+    return run_worker(args.bot, args.connect, SHARD_AUTHKEY, args.parent)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+signal_store.py
+Controle de sinais já enviados que sobrevive a restart/redeploy (SQLite em modo WAL).
+
+- Escrita: INSERT OR IGNORE append-only por sinal (fixture_id, chave).
+- Leitura: tudo fica num dict fixture_id -> set em memória, carregado no startup
+  com um único SELECT; "já enviado?" é O(1) e não toca o disco.
+- forget() libera a memória de uma partida; se ela voltar (some da lista ao vivo
+  além da carência e reaparece), as chaves dela são relidas do disco com um
+  SELECT na primeira consulta, então nada é reenviado.
+- Compactação periódica: apaga sinais mais velhos que a retenção e trunca o WAL.
+
+Signal é o sinal já montado que ainda não passou pelo dedup: o scoring gera,
+quem é dono do SignalStore (o processo que envia) decide se sai.
+
+Environment variables (opcionais):
+- SIGNAL_DB_PATH (padrão sent_signals.db)
+- SIGNAL_RETENTION_DAYS (padrão 3)
+- SIGNAL_COMPACT_INTERVAL (segundos, padrão 3600)
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, NamedTuple, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+SIGNAL_DB_PATH = os.getenv('SIGNAL_DB_PATH', 'sent_signals.db')
+SIGNAL_RETENTION_DAYS = float(os.getenv('SIGNAL_RETENTION_DAYS', '3'))
+SIGNAL_COMPACT_INTERVAL = float(os.getenv('SIGNAL_COMPACT_INTERVAL', '3600'))
+
+
+class Signal(NamedTuple):
+    fixture_id: Any
+    key: str       # chave de dedup no SignalStore
+    text: str      # mensagem pronta para o Telegram
+    window: str    # 'HT', 'FT' ou 'LIVE'
+    note: str = ''  # detalhe para o log de envio
+    league_id: Any = None  # fan-out pelas assinaturas (subscriptions.py)
+    prob: Optional[float] = None  # probabilidade comparada ao mínimo de cada assinatura
+
+
+class SignalStore:
+    def __init__(self, path: str = SIGNAL_DB_PATH, retention_days: float = SIGNAL_RETENTION_DAYS,
+                 compact_interval: float = SIGNAL_COMPACT_INTERVAL):
+        self.path = path
+        self.retention = retention_days * 86400.0
+        self.compact_interval = compact_interval
+        self._lock = threading.Lock()
+        self._mem: Dict[Any, Set[str]] = defaultdict(set)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')  # WAL + NORMAL: durável a crash do processo
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS sent_signals ('
+            ' fixture_id, signal_key TEXT NOT NULL, sent_at REAL NOT NULL,'
+            ' PRIMARY KEY (fixture_id, signal_key)) WITHOUT ROWID'
+        )
+        self._last_compact = time.monotonic()
+        self._load()
+
+    def _load(self):
+        started = time.perf_counter()
+        cutoff = time.time() - self.retention
+        rows = self._conn.execute('SELECT fixture_id, signal_key FROM sent_signals WHERE sent_at >= ?', (cutoff,))
+        count = 0
+        for fixture_id, key in rows:
+            self._mem[fixture_id].add(key)
+            count += 1
+        logger.info('Sinais já enviados carregados: %d em %.1f ms (%s)',
+                    count, (time.perf_counter() - started) * 1000, self.path)
+
+    def _fixture_keys_locked(self, fixture_id) -> Set[str]:
+        items = self._mem.get(fixture_id)
+        if items is None:  # 1ª consulta da partida (ou depois de forget): relê do disco
+            cutoff = time.time() - self.retention
+            try:
+                rows = self._conn.execute('SELECT signal_key FROM sent_signals WHERE fixture_id = ? AND sent_at >= ?',
+                                          (fixture_id, cutoff)).fetchall()
+            except sqlite3.Error as e:
+                logger.warning('Erro ao ler sinais da partida %s: %s', fixture_id, e)
+                rows = []
+            items = self._mem[fixture_id] = {key for (key,) in rows}
+        return items
+
+    def _fixture_keys(self, fixture_id) -> Set[str]:
+        items = self._mem.get(fixture_id)
+        if items is None:
+            with self._lock:
+                items = self._fixture_keys_locked(fixture_id)
+        return items
+
+    # ----- API usada pelo loop -----
+    def contains(self, fixture_id, key: str) -> bool:
+        return key in self._fixture_keys(fixture_id)
+
+    def keys(self, fixture_id) -> FrozenSet[str]:
+        """Chaves já enviadas da fixture (cópia; vai junto com a fixture para os workers)."""
+        return frozenset(self._fixture_keys(fixture_id))
+
+    def add(self, fixture_id, key: str):
+        with self._lock:
+            items = self._fixture_keys_locked(fixture_id)
+            if key in items:
+                return
+            items.add(key)
+            try:
+                self._conn.execute('INSERT OR IGNORE INTO sent_signals VALUES (?, ?, ?)', (fixture_id, key, time.time()))
+            except sqlite3.Error as e:
+                logger.warning('Erro ao gravar sinal %s/%s: %s', fixture_id, key, e)
+            if time.monotonic() - self._last_compact >= self.compact_interval:
+                self._compact_locked()
+
+    def forget(self, fixture_id):
+        """Libera só a memória da fixture (o registro em disco expira pela retenção)."""
+        with self._lock:
+            self._mem.pop(fixture_id, None)
+
+    # ----- manutenção -----
+    def _compact_locked(self):
+        self._last_compact = time.monotonic()
+        cutoff = time.time() - self.retention
+        try:
+            cur = self._conn.execute('DELETE FROM sent_signals WHERE sent_at < ?', (cutoff,))
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            if cur.rowcount:
+                logger.info('Compactação: %d sinais antigos removidos', cur.rowcount)
+        except sqlite3.Error as e:
+            logger.warning('Erro na compactação de %s: %s', self.path, e)
+
+    def compact(self):
+        with self._lock:
+            self._compact_locked()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        return len(self._mem)
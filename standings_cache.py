@@ -0,0 +1,81 @@
+"""
+standings_cache.py
+Cache TTL + LRU das classificações (/standings) por (league, season).
+
+A tabela não muda durante a partida: baixamos uma vez por liga/temporada,
+indexamos team_id -> linha e todas as consultas seguintes são um dict lookup.
+
+Environment variables (opcionais):
+- STANDINGS_TTL (segundos, padrão 21600 = 6h)
+- STANDINGS_MAXSIZE (ligas em cache, padrão 256)
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STANDINGS_TTL = float(os.getenv('STANDINGS_TTL', '21600'))
+STANDINGS_MAXSIZE = int(os.getenv('STANDINGS_MAXSIZE', '256'))
+NEGATIVE_TTL = 300.0  # falha/sem tabela: tenta de novo em 5 min
+
+
+def index_standings(resp: List[Dict[str, Any]]) -> Dict[Any, Dict[str, Any]]:
+    """Monta team_id -> linha da tabela (todos os grupos da liga)."""
+    index = {}
+    for entry in resp or []:
+        for group in entry.get('league', {}).get('standings', []) or []:
+            for row in group or []:
+                team_id = row.get('team', {}).get('id')
+                if team_id is not None and team_id not in index:
+                    index[team_id] = row
+    return index
+
+
+class StandingsCache:
+    def __init__(self, loader: Callable[[Any, Any], Optional[List[Dict[str, Any]]]],
+                 ttl: float = STANDINGS_TTL, maxsize: int = STANDINGS_MAXSIZE):
+        # loader(league_id, season) -> response da API, ou None em caso de erro
+        self.loader = loader
+        self.ttl = ttl
+        self.maxsize = max(1, maxsize)
+        self._data: 'OrderedDict[Tuple[Any, Any], Tuple[float, Dict[Any, Dict[str, Any]]]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_table(self, league_id, season) -> Dict[Any, Dict[str, Any]]:
+        key = (league_id, season)
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item and item[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+        resp = self.loader(league_id, season)
+        index = index_standings(resp) if resp else {}
+        expires = now + (self.ttl if index else NEGATIVE_TTL)
+        with self._lock:
+            self._data[key] = (expires, index)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return index
+
+    def get_team(self, league_id, season, team_id) -> Optional[Dict[str, Any]]:
+        if league_id is None or season is None:
+            return None
+        return self.get_table(league_id, season).get(team_id)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
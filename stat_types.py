@@ -0,0 +1,75 @@
+"""
+stat_types.py
+Classificação dos tipos de estatística da API-Football e normalização dos valores.
+
+extract_basic_stats fazia, para cada estatística de cada ciclo, lower() + uma
+série de testes de substring no 'type' e int(float(str(v).replace('%',''))) num
+try/except. A API usa ~20 tipos fixos ('Corner Kicks', 'Dangerous Attacks'...)
+e poucos valores distintos, então:
+
+- classify_stat(type) aplica as regras uma vez por tipo e guarda o campo
+  ('corners', 'attacks', 'danger' ou None) num dict;
+- stat_value(value) devolve int direto para int, e guarda a conversão de
+  strings ('55%', '1.23') num dict.
+
+Os caches têm teto: tipos/valores fora do padrão não fazem a memória crescer.
+"""
+
+from typing import Any, Dict, Optional
+
+CORNERS = 'corners'
+ATTACKS = 'attacks'
+DANGER = 'danger'
+
+_CACHE_MAX = 4096
+
+_fields: Dict[Any, Optional[str]] = {}
+_values: Dict[str, int] = {}
+
+
+def _classify(type_name) -> Optional[str]:
+    t = str(type_name).lower()
+    if 'corner' in t:
+        return CORNERS
+    if 'attack' in t and 'danger' not in t:
+        return ATTACKS
+    if 'on goal' in t or 'danger' in t:
+        return DANGER
+    return None
+
+
+def classify_stat(type_name) -> Optional[str]:
+    """Campo de extract_basic_stats para este tipo de estatística (None = ignorado)."""
+    try:
+        return _fields[type_name]
+    except KeyError:
+        pass
+    except TypeError:  # tipo não hashável: classifica sem cache
+        return _classify(type_name)
+    field = _classify(type_name)
+    if len(_fields) < _CACHE_MAX:
+        _fields[type_name] = field
+    return field
+
+
+def _to_int(value) -> int:
+    try:
+        return int(float(str(value).replace('%', '')))
+    except Exception:
+        return 0
+
+
+def stat_value(value) -> int:
+    """Valor como int: null -> 0, '55%' -> 55, '1.23' -> 1, inválido -> 0."""
+    if type(value) is int:
+        return value
+    if not value:
+        return 0
+    if type(value) is str:
+        cached = _values.get(value)
+        if cached is None:
+            cached = _to_int(value)
+            if len(_values) < _CACHE_MAX:
+                _values[value] = cached
+        return cached
+    return _to_int(value)
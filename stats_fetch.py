@@ -0,0 +1,163 @@
+"""
+stats_fetch.py
+Busca concorrente de estatísticas das partidas ao vivo (httpx assíncrono).
+
+Dois modos:
+- 'concurrent': uma chamada /fixtures/statistics por partida, todas de uma vez,
+  limitadas por um semáforo (o ciclo leva o tempo da requisição mais lenta).
+- 'batch': agrupa os ids em blocos e usa /fixtures?ids=a-b-c, que já devolve
+  as statistics de cada partida; ~20x menos requisições por ciclo.
+
+Environment variables (opcionais):
+- STATS_FETCH_MODE ('batch' ou 'concurrent', padrão 'batch')
+- STATS_BATCH_SIZE (máximo aceito pela API: 20)
+- STATS_CONCURRENCY (padrão 10)
+- STATS_TIMEOUT (segundos, padrão 10)
+
+As requisições usam o AsyncClient compartilhado de http_client (keep-alive entre ciclos).
+Se houver orçamento (api_budget) registrado para a API, cada requisição pede um
+token com a prioridade da fixture; fixtures negadas ficam fora do resultado.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+import http_client
+import api_decode
+import metrics
+from api_budget import PRIORITY_OTHER
+
+logger = logging.getLogger(__name__)
+
+STATS_FETCH_MODE = os.getenv('STATS_FETCH_MODE', 'batch').lower()
+STATS_BATCH_SIZE = min(20, max(1, int(os.getenv('STATS_BATCH_SIZE', '20'))))
+STATS_CONCURRENCY = int(os.getenv('STATS_CONCURRENCY', '10'))
+STATS_TIMEOUT = float(os.getenv('STATS_TIMEOUT', '10'))
+
+
+# ---------- ASYNC ----------
+def _allowed(budget, priority) -> bool:
+    return budget is None or budget.acquire(priority)
+
+
+async def _fetch_one(client, sem, api_base, headers, timeout, budget, priority,
+                     fixture_id) -> Tuple[Any, Optional[List[Dict[str, Any]]]]:
+    if not _allowed(budget, priority):
+        return fixture_id, None
+    async with sem:
+        try:
+            r = await client.get(f'{api_base}/fixtures/statistics', params={'fixture': fixture_id},
+                                 headers=headers, timeout=timeout)
+            if r.status_code == 200:
+                return fixture_id, api_decode.statistics(r.content)
+            logger.warning('Status %s ao buscar statistics %s: %.200s', r.status_code, fixture_id, r.text)
+        except Exception as e:
+            logger.warning('Erro ao buscar statistics %s: %s', fixture_id, e)
+    return fixture_id, []
+
+
+async def _fetch_batch(client, sem, api_base, headers, timeout, budget, priority,
+                       fixture_ids) -> Dict[Any, List[Dict[str, Any]]]:
+    if not _allowed(budget, priority):
+        return {}
+    ids_param = '-'.join(str(fid) for fid in fixture_ids)
+    out = {fid: [] for fid in fixture_ids}
+    async with sem:
+        try:
+            r = await client.get(f'{api_base}/fixtures', params={'ids': ids_param},
+                                 headers=headers, timeout=timeout)
+            if r.status_code == 200:
+                for fid, stats in api_decode.fixture_statistics(r.content).items():
+                    if fid in out:
+                        out[fid] = stats
+            else:
+                logger.warning('Status %s ao buscar fixtures ids=%s: %.200s', r.status_code, ids_param, r.text)
+        except Exception as e:
+            logger.warning('Erro ao buscar fixtures ids=%s: %s', ids_param, e)
+    return out
+
+
+def chunked(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _ordered_ids(fixture_ids: Iterable, priorities: Optional[Dict[Any, int]]) -> List[Any]:
+    # sem duplicatas; as mais prioritárias primeiro (pegam o orçamento antes)
+    ids = list(dict.fromkeys(fixture_ids))
+    if priorities:
+        ids.sort(key=lambda fid: priorities.get(fid, PRIORITY_OTHER))
+    return ids
+
+
+def fetch_chunks(fixture_ids: Iterable, priorities: Dict[Any, int] = None, batch_size: int = None) -> List[List[Any]]:
+    """Ids em lotes de uma requisição /fixtures?ids=..., os mais prioritários primeiro (pipeline do ciclo)."""
+    return chunked(_ordered_ids(fixture_ids, priorities), min(20, max(1, batch_size or STATS_BATCH_SIZE)))
+
+
+async def fetch_statistics_batched_async(fixture_ids: Iterable, api_base: str, headers: Dict[str, str],
+                                         batch_size: int = None, concurrency: int = None, timeout: float = None,
+                                         priorities: Dict[Any, int] = None) -> Dict[Any, List[Dict[str, Any]]]:
+    batch_size = min(20, max(1, batch_size or STATS_BATCH_SIZE))
+    concurrency = max(1, concurrency or STATS_CONCURRENCY)
+    timeout = timeout or STATS_TIMEOUT
+    priorities = priorities or {}
+    ids = _ordered_ids(fixture_ids, priorities)
+    if not ids:
+        return {}
+    sem = asyncio.Semaphore(concurrency)
+    client = http_client.async_client()
+    budget = http_client.budget_for(api_base)
+    chunks = chunked(ids, batch_size)
+    metrics.STATS_FETCH_FIXTURES.observe(len(ids))
+    metrics.STATS_FETCH_REQUESTS.observe(len(chunks))
+    parts = await asyncio.gather(*(
+        _fetch_batch(client, sem, api_base, headers, timeout, budget,
+                     min(priorities.get(fid, PRIORITY_OTHER) for fid in chunk), chunk)
+        for chunk in chunks
+    ))
+    out = {}
+    for part in parts:
+        out.update(part)
+    return out
+
+
+async def fetch_statistics_async(fixture_ids: Iterable, api_base: str, headers: Dict[str, str],
+                                 concurrency: int = None, timeout: float = None,
+                                 priorities: Dict[Any, int] = None) -> Dict[Any, List[Dict[str, Any]]]:
+    concurrency = max(1, concurrency or STATS_CONCURRENCY)
+    timeout = timeout or STATS_TIMEOUT
+    priorities = priorities or {}
+    ids = _ordered_ids(fixture_ids, priorities)
+    if not ids:
+        return {}
+    sem = asyncio.Semaphore(concurrency)
+    client = http_client.async_client()
+    budget = http_client.budget_for(api_base)
+    metrics.STATS_FETCH_FIXTURES.observe(len(ids))
+    metrics.STATS_FETCH_REQUESTS.observe(len(ids))
+    results = await asyncio.gather(*(
+        _fetch_one(client, sem, api_base, headers, timeout, budget, priorities.get(fid, PRIORITY_OTHER), fid)
+        for fid in ids
+    ))
+    return {fid: stats for fid, stats in results if stats is not None}
+
+
+# ---------- SYNC ENTRY ----------
+def fetch_statistics(fixture_ids: Iterable, api_base: str, headers: Dict[str, str],
+                     concurrency: int = None, timeout: float = None, mode: str = None,
+                     priorities: Dict[Any, int] = None) -> Dict[Any, List[Dict[str, Any]]]:
+    """Busca as statistics de todas as fixtures; retorna {fixture_id: response}.
+
+    Chamado da thread de polling; roda no event loop do http_client.
+    Fixtures com erro voltam com lista vazia, como em get_fixture_statistics;
+    o formato é o mesmo nos dois modos (lista de {'team', 'statistics'}).
+    Fixtures negadas pelo orçamento da API não aparecem no dict.
+    """
+    mode = (mode or STATS_FETCH_MODE).lower()
+    if mode == 'batch':
+        return http_client.run_async(fetch_statistics_batched_async(fixture_ids, api_base, headers,
+                                                                    concurrency=concurrency, timeout=timeout,
+                                                                    priorities=priorities))
+    return http_client.run_async(fetch_statistics_async(fixture_ids, api_base, headers, concurrency, timeout,
+                                                        priorities=priorities))
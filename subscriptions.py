@@ -0,0 +1,346 @@
+"""
+subscriptions.py
+Assinaturas por chat do Telegram, cada uma com os seus filtros, e o índice de fan-out.
+
+Um sinal sai para todo chat cujos filtros aceitam:
+- ligas (vazio = todas)
+- janelas 'HT' / 'FT' / 'LIVE' (vazio = todas)
+- estratégias (STRATEGIES; vazio = todas)
+- probabilidade mínima: min_p_ge_1 (estratégia 'rp') e min_p_win ('vip')
+
+Índice: (estratégia, janela, liga ou '*') -> mínimos de probabilidade em ordem
+crescente + chats na mesma ordem. Na inserção a assinatura é expandida para as
+estratégias/janelas que aceita; o fan-out de um sinal lê 2 baldes (a liga dele
+e '*') e corta cada um com bisect na probabilidade do sinal, então só toca os
+chats que de fato recebem, com milhares de assinantes ou não. Escrita troca o
+balde inteiro (cópia), leitura não pega lock.
+
+Persistência: SQLite (WAL) como o SignalStore, tudo carregado no startup.
+TELEGRAM_CHAT_ID, quando definido, vira uma assinatura sem filtros (ensure), então
+o deploy antigo continua recebendo tudo; no bot PTB (bot_escanteios_rp.py), que
+usava /id para escolher o chat, /id de um chat em ADMIN_CHAT_IDS faz o mesmo.
+
+Comandos do Telegram (handle_command): /assinar [ligas=39,140] [janelas=HT,FT]
+[estrategias=vip] [min=0.6] [min_win=0.6], /cancelar, /filtros. Só chats em
+ADMIN_CHAT_IDS podem usá-los (o webhook é público: qualquer um que ache o bot
+mandaria /assinar); vazio = comandos desligados, assinaturas só pela CLI.
+
+CLI:
+  python subscriptions.py add CHAT_ID [ligas=39,140] [janelas=HT] [min=0.6] ...
+  python subscriptions.py remove CHAT_ID
+  python subscriptions.py list
+
+Environment variables (opcionais):
+- SUBSCRIPTIONS_DB_PATH (padrão subscriptions.db)
+- ADMIN_CHAT_IDS (chat ids separados por vírgula que podem usar os comandos; padrão vazio)
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import logging
+import threading
+from bisect import bisect_right
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTIONS_DB_PATH = os.getenv('SUBSCRIPTIONS_DB_PATH', 'subscriptions.db')
+# comparados como texto: o update traz int, a env traz str
+ADMIN_CHAT_IDS = frozenset(x.strip() for x in os.getenv('ADMIN_CHAT_IDS', '').split(',') if x.strip())
+
+# estratégia -> métrica de probabilidade filtrada pelo mínimo da assinatura (None = sem filtro)
+STRATEGIES = {
+    'rp': 'p_ge_1',        # bot_escanteios_rp_v2: 1-2 escanteios na janela
+    'vip': 'p_win',        # VIP PLUS: melhor linha asiática
+    'perdendo': None,      # bot_escanteios_rp: casa/favorito perdendo
+}
+WINDOWS = ('HT', 'FT', 'LIVE')
+ANY = '*'
+
+
+class Subscription(NamedTuple):
+    chat_id: Any
+    leagues: FrozenSet[Any] = frozenset()
+    windows: FrozenSet[str] = frozenset()
+    strategies: FrozenSet[str] = frozenset()
+    min_p_ge_1: float = 0.0
+    min_p_win: float = 0.0
+
+    def threshold(self, strategy: str) -> float:
+        metric = STRATEGIES.get(strategy)
+        if metric == 'p_ge_1':
+            return self.min_p_ge_1
+        if metric == 'p_win':
+            return self.min_p_win
+        return 0.0
+
+    def describe(self) -> str:
+        def names(values):
+            return ','.join(str(v) for v in sorted(values, key=str)) if values else 'todas'
+        return (f'ligas: {names(self.leagues)} | janelas: {names(self.windows)} | '
+                f'estratégias: {names(self.strategies)} | min p≥1: {self.min_p_ge_1:.2f} | '
+                f'min win: {self.min_p_win:.2f}')
+
+
+def _split(text: Optional[str]) -> List[str]:
+    return [part.strip() for part in (text or '').split(',') if part.strip()]
+
+
+def _int_or_str(value):
+    text = str(value).strip()
+    return int(text) if text.lstrip('-').isdigit() else text
+
+
+def normalize_chat(chat_id):
+    """-100123 e '-100123' (env TELEGRAM_CHAT_ID) são o mesmo chat."""
+    return _int_or_str(chat_id)
+
+
+def parse_filters(chat_id, args: Iterable[str]) -> Subscription:
+    """Argumentos 'chave=valor' de /assinar (ou da CLI) -> Subscription; ValueError se inválido."""
+    fields: Dict[str, Any] = {}
+    for arg in args:
+        key, sep, value = arg.partition('=')
+        key = key.strip().lower()
+        if not sep:
+            raise ValueError(f'argumento sem "=": {arg}')
+        if key in ('ligas', 'leagues'):
+            fields['leagues'] = frozenset(_int_or_str(v) for v in _split(value))
+        elif key in ('janelas', 'janela', 'windows'):
+            windows = frozenset(v.upper() for v in _split(value))
+            if windows - set(WINDOWS):
+                raise ValueError(f'janela inválida: {",".join(sorted(windows - set(WINDOWS)))}')
+            fields['windows'] = windows
+        elif key in ('estrategias', 'estrategia', 'strategies'):
+            strategies = frozenset(v.lower() for v in _split(value))
+            if strategies - set(STRATEGIES):
+                raise ValueError(f'estratégia inválida: {",".join(sorted(strategies - set(STRATEGIES)))}')
+            fields['strategies'] = strategies
+        elif key in ('min', 'min_p_ge_1'):
+            fields['min_p_ge_1'] = float(value)
+        elif key in ('min_win', 'min_p_win'):
+            fields['min_p_win'] = float(value)
+        else:
+            raise ValueError(f'filtro desconhecido: {key}')
+    return Subscription(normalize_chat(chat_id), **fields)
+
+
+def _keys(sub: Subscription) -> List[Tuple[str, str, Any]]:
+    strategies = sub.strategies or STRATEGIES.keys()
+    windows = sub.windows or WINDOWS
+    leagues = sub.leagues or (ANY,)
+    return [(s, w, lg) for s in strategies for w in windows for lg in leagues]
+
+
+class SubscriptionStore:
+    def __init__(self, path: str = SUBSCRIPTIONS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._subs: Dict[Any, Subscription] = {}
+        # (estratégia, janela, liga|'*') -> (mínimos em ordem, chats na mesma ordem)
+        self._index: Dict[Tuple[str, str, Any], Tuple[Tuple[float, ...], Tuple[Any, ...]]] = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS subscriptions ('
+            ' chat_id PRIMARY KEY, leagues TEXT, windows TEXT, strategies TEXT,'
+            ' min_p_ge_1 REAL, min_p_win REAL, updated_at REAL)'
+        )
+        self._load()
+
+    def _load(self):
+        started = time.perf_counter()
+        rows = self._conn.execute(
+            'SELECT chat_id, leagues, windows, strategies, min_p_ge_1, min_p_win FROM subscriptions')
+        with self._lock:
+            for chat_id, leagues, windows, strategies, min_p_ge_1, min_p_win in rows:
+                self._subs[chat_id] = Subscription(chat_id, frozenset(_int_or_str(v) for v in _split(leagues)),
+                                                   frozenset(_split(windows)), frozenset(_split(strategies)),
+                                                   min_p_ge_1 or 0.0, min_p_win or 0.0)
+            self._rebuild()
+        logger.info('Assinaturas carregadas: %d em %.1f ms (%s)',
+                    len(self._subs), (time.perf_counter() - started) * 1000, self.path)
+
+    # ----- índice (chamado com o lock) -----
+    def _rebuild(self):
+        buckets: Dict[Tuple[str, str, Any], List[Tuple[float, Any]]] = {}
+        for sub in self._subs.values():
+            for key in _keys(sub):
+                buckets.setdefault(key, []).append((sub.threshold(key[0]), sub.chat_id))
+        index = {}
+        for key, entries in buckets.items():
+            entries.sort(key=lambda entry: entry[0])
+            index[key] = (tuple(t for t, _ in entries), tuple(c for _, c in entries))
+        self._index = index
+
+    def _index_add(self, sub: Subscription):
+        for key in _keys(sub):
+            thresholds, chats = self._index.get(key, ((), ()))
+            thresholds, chats = list(thresholds), list(chats)
+            threshold = sub.threshold(key[0])
+            pos = bisect_right(thresholds, threshold)
+            thresholds.insert(pos, threshold)
+            chats.insert(pos, sub.chat_id)
+            self._index[key] = (tuple(thresholds), tuple(chats))
+
+    def _index_remove(self, sub: Subscription):
+        for key in _keys(sub):
+            thresholds, chats = self._index.get(key, ((), ()))
+            keep = [(t, c) for t, c in zip(thresholds, chats) if c != sub.chat_id]
+            if keep:
+                self._index[key] = (tuple(t for t, _ in keep), tuple(c for _, c in keep))
+            else:
+                self._index.pop(key, None)
+
+    # ----- escrita -----
+    @staticmethod
+    def _row(sub: Subscription) -> Tuple:
+        return (sub.chat_id, ','.join(str(v) for v in sub.leagues), ','.join(sub.windows),
+                ','.join(sub.strategies), sub.min_p_ge_1, sub.min_p_win, time.time())
+
+    def subscribe(self, sub: Subscription):
+        """Cria ou troca os filtros do chat."""
+        sub = sub._replace(chat_id=normalize_chat(sub.chat_id))
+        with self._lock:
+            old = self._subs.get(sub.chat_id)
+            if old is not None:
+                self._index_remove(old)
+            self._subs[sub.chat_id] = sub
+            self._index_add(sub)
+            try:
+                self._conn.execute('INSERT OR REPLACE INTO subscriptions VALUES (?, ?, ?, ?, ?, ?, ?)', self._row(sub))
+            except sqlite3.Error as e:
+                logger.warning('Erro ao gravar assinatura %s: %s', sub.chat_id, e)
+
+    def subscribe_many(self, subs: Iterable[Subscription]):
+        """subscribe() em lote: uma transação e uma reconstrução do índice (importação, testes de carga)."""
+        subs = [sub._replace(chat_id=normalize_chat(sub.chat_id)) for sub in subs]
+        with self._lock:
+            for sub in subs:
+                self._subs[sub.chat_id] = sub
+            self._rebuild()
+            try:
+                with self._conn:
+                    self._conn.execute('BEGIN')
+                    self._conn.executemany(
+                        'INSERT OR REPLACE INTO subscriptions VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        [self._row(sub) for sub in subs])
+            except sqlite3.Error as e:
+                logger.warning('Erro ao gravar %d assinaturas: %s', len(subs), e)
+
+    def ensure(self, chat_id):
+        """Assinatura sem filtros para o chat, se ele ainda não tiver uma (ex.: TELEGRAM_CHAT_ID)."""
+        if chat_id and normalize_chat(chat_id) not in self._subs:
+            self.subscribe(Subscription(normalize_chat(chat_id)))
+
+    def unsubscribe(self, chat_id) -> bool:
+        chat_id = normalize_chat(chat_id)
+        with self._lock:
+            old = self._subs.pop(chat_id, None)
+            if old is None:
+                return False
+            self._index_remove(old)
+            try:
+                self._conn.execute('DELETE FROM subscriptions WHERE chat_id = ?', (chat_id,))
+            except sqlite3.Error as e:
+                logger.warning('Erro ao remover assinatura %s: %s', chat_id, e)
+            return True
+
+    # ----- leitura -----
+    def get(self, chat_id) -> Optional[Subscription]:
+        return self._subs.get(normalize_chat(chat_id))
+
+    def all(self) -> List[Subscription]:
+        return list(self._subs.values())
+
+    def match(self, strategy: str, league_id, window: str, prob: float = None) -> List[Any]:
+        """Chats que recebem o sinal; prob None = o sinal não tem probabilidade (mínimos ignorados)."""
+        out: List[Any] = []
+        for league in (league_id, ANY):
+            bucket = self._index.get((strategy, window, league))
+            if bucket is None:
+                continue
+            thresholds, chats = bucket
+            out.extend(chats if prob is None else chats[:bisect_right(thresholds, prob)])
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {'chats': len(self._subs), 'index_buckets': len(self._index)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        return len(self._subs)
+
+
+# ---------- COMANDOS ----------
+HELP = ('Uso: /assinar [ligas=39,140] [janelas=HT,FT,LIVE] [estrategias=' + ','.join(STRATEGIES) + '] '
+        '[min=0.6] [min_win=0.6]\n/filtros mostra os filtros, /cancelar encerra a assinatura.')
+COMMANDS = ('/assinar', '/cancelar', '/filtros')
+
+
+def is_admin(chat_id) -> bool:
+    return str(chat_id) in ADMIN_CHAT_IDS
+
+
+def handle_command(store: SubscriptionStore, chat_id, text: str) -> Optional[str]:
+    """Resposta para /assinar, /cancelar e /filtros (só ADMIN_CHAT_IDS); None se o texto não for um desses comandos."""
+    parts = (text or '').split()
+    if not parts:
+        return None
+    command = parts[0].split('@', 1)[0].lower()
+    if command not in COMMANDS:
+        return None
+    if not is_admin(chat_id):
+        logger.warning('Comando %s recusado: chat %s fora de ADMIN_CHAT_IDS', command, chat_id)
+        return '⛔ Este chat não tem permissão para gerenciar assinaturas.'
+    if command == '/assinar':
+        try:
+            sub = parse_filters(chat_id, parts[1:])
+        except ValueError as e:
+            return f'⚠️ {e}\n{HELP}'
+        store.subscribe(sub)
+        return f'✅ Assinatura ativa\n{sub.describe()}'
+    if command == '/cancelar':
+        return '✅ Assinatura cancelada' if store.unsubscribe(chat_id) else 'Este chat não tem assinatura.'
+    if command == '/filtros':
+        sub = store.get(chat_id)
+        return f'{sub.describe()}\n{HELP}' if sub else f'Este chat não tem assinatura.\n{HELP}'
+    return None
+
+
+def handle_update(store: SubscriptionStore, update: Dict[str, Any]) -> Optional[Tuple[Any, str]]:
+    """Update cru do webhook do Telegram -> (chat_id, resposta) se for comando de assinatura."""
+    message = (update or {}).get('message') or {}
+    chat_id = (message.get('chat') or {}).get('id')
+    if chat_id is None:
+        return None
+    reply = handle_command(store, chat_id, message.get('text') or '')
+    return (chat_id, reply) if reply is not None else None
+
+
+def main(argv: List[str] = None):
+    args = sys.argv[1:] if argv is None else argv
+    logging.basicConfig(level=logging.WARNING)
+    store = SubscriptionStore()
+    if args[:1] == ['list']:
+        for sub in store.all():
+            print(sub.chat_id, '|', sub.describe())
+    elif len(args) >= 2 and args[0] == 'add':
+        store.subscribe(parse_filters(args[1], args[2:]))
+        print(store.get(args[1]).describe())
+    elif len(args) == 2 and args[0] == 'remove':
+        print('removida' if store.unsubscribe(args[1]) else 'não encontrada')
+    else:
+        print(__doc__.split('CLI:', 1)[1].split('Environment', 1)[0].rstrip())
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
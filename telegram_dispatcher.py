@@ -0,0 +1,383 @@
+"""
+telegram_dispatcher.py
+Fila de saída do Telegram: a detecção de sinais só enfileira, quem envia é uma thread própria.
+
+- Fila limitada (TELEGRAM_QUEUE_SIZE): conta tudo que foi aceito e ainda não
+  terminou (na fila de entrada, esperando a vez do chat ou em envio); se encher,
+  a mensagem é descartada com aviso, nunca bloqueia o loop de fixtures.
+- Respeita os limites do Telegram: ~1 msg/s por chat e ~30 msg/s no total.
+  Mensagens de chats diferentes não esperam umas pelas outras: a thread do
+  dispatcher só agenda, os POSTs saem em TELEGRAM_SEND_WORKERS threads (um por
+  chat de cada vez, então a ordem do chat se mantém) e um chat lento não segura
+  os outros.
+- 429: reenvia depois de parameters.retry_after; erro de rede/5xx: backoff exponencial.
+- edit(): editMessageText de uma mensagem já enviada (o message_id vem pelo
+  on_message do submit). Edições da mesma mensagem que ainda esperam na fila
+  viram uma só, com o texto mais novo, e cada mensagem é editada no máximo a
+  cada TELEGRAM_EDIT_INTERVAL; mensagem nova passa na frente de edição.
+- stats(): profundidade da fila, enviadas/editadas/juntadas/falhas/descartadas e latência de envio
+  (também exportadas em metrics: telegram_send_seconds, telegram_messages_total, telegram_queue_depth).
+
+Environment variables (opcionais):
+- TELEGRAM_QUEUE_SIZE (padrão 1000)
+- TELEGRAM_PER_CHAT_INTERVAL (segundos entre mensagens no mesmo chat, padrão 1.0)
+- TELEGRAM_GLOBAL_RATE (mensagens/s no total, padrão 30)
+- TELEGRAM_MAX_RETRIES (padrão 5)
+- TELEGRAM_EDIT_INTERVAL (segundos entre edições da mesma mensagem, padrão 5)
+- TELEGRAM_SEND_WORKERS (POSTs simultâneos, padrão 8)
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, Tuple
+
+import http_client
+import metrics
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API = os.getenv('TELEGRAM_API', 'https://api.telegram.org')
+TELEGRAM_QUEUE_SIZE = int(os.getenv('TELEGRAM_QUEUE_SIZE', '1000'))
+TELEGRAM_PER_CHAT_INTERVAL = float(os.getenv('TELEGRAM_PER_CHAT_INTERVAL', '1.0'))
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '5'))
+TELEGRAM_EDIT_INTERVAL = float(os.getenv('TELEGRAM_EDIT_INTERVAL', '5'))
+TELEGRAM_SEND_WORKERS = max(1, int(os.getenv('TELEGRAM_SEND_WORKERS', '8')))
+
+SEND = 'sendMessage'
+EDIT = 'editMessageText'
+DONE = 'done'  # resultado de um POST, devolvido pela thread de envio ao dispatcher
+_EDIT_READY_MAX = 10000
+
+
+class TelegramDispatcher:
+    def __init__(self, token: str, maxsize: int = TELEGRAM_QUEUE_SIZE,
+                 per_chat_interval: float = TELEGRAM_PER_CHAT_INTERVAL,
+                 global_rate: float = TELEGRAM_GLOBAL_RATE, max_retries: int = TELEGRAM_MAX_RETRIES,
+                 edit_interval: float = TELEGRAM_EDIT_INTERVAL, workers: int = TELEGRAM_SEND_WORKERS):
+        self.token = token
+        self.maxsize = max(1, maxsize)
+        self.workers = max(1, workers)
+        self.per_chat_interval = per_chat_interval
+        self.global_interval = 1.0 / max(0.1, global_rate)
+        self.max_retries = max_retries
+        self.edit_interval = edit_interval
+        # sem limite próprio: o limite é _pending_count, contado no _put
+        self._inbox: 'queue.Queue[Dict[str, Any]]' = queue.Queue()
+        self._pending: Dict[Any, deque] = {}    # chat_id -> mensagens na ordem de chegada
+        self._chat_ready: Dict[Any, float] = {}  # chat_id -> quando pode enviar de novo
+        self._edits: Dict[Tuple, Dict[str, Any]] = {}  # (chat_id, message_id) -> edição pendente (a mais nova)
+        self._edit_ready: Dict[Tuple, float] = {}  # (chat_id, message_id) -> quando pode editar de novo
+        self._busy = set()  # chats com POST em andamento
+        self._in_flight = 0
+        self._pending_count = 0  # aceitas e ainda não terminadas (enviada, falha, descartada ou juntada)
+        self._count_lock = threading.Lock()
+        self._next_global = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.edited = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.last_latency = 0.0
+        metrics.TELEGRAM_QUEUE_DEPTH.set_function(self.queue_depth)
+
+    # ----- produtor -----
+    def start(self):
+        with self._start_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='telegram-send')
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='telegram-dispatcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, chat_id, text: str, parse_mode: str = 'HTML',
+               on_sent: Callable[[float], None] = None, on_message: Callable[[Any], None] = None,
+               **extra) -> bool:
+        """Enfileira sendMessage e retorna na hora; False se a fila estiver cheia.
+
+        on_sent(horário monotonic do envio) é chamado numa thread de envio quando o Telegram aceita.
+        on_message(message_id) também, para editar a mensagem depois; recebe None se ela for descartada.
+        """
+        if not self.token or not chat_id:
+            logger.warning('TOKEN ou chat_id não definido. Mensagem não enviada.')
+            return False
+        payload = {'chat_id': chat_id, 'text': text, 'parse_mode': parse_mode}
+        payload.update(extra)
+        return self._put({'method': SEND, 'chat_id': chat_id, 'payload': payload, 'enqueued': time.monotonic(),
+                          'attempts': 0, 'on_sent': on_sent, 'on_message': on_message})
+
+    def edit(self, chat_id, message_id, text: str, parse_mode: str = 'HTML', **extra) -> bool:
+        """Enfileira editMessageText; se já houver edição dessa mensagem na fila, só o texto mais novo sai."""
+        if not self.token or not chat_id or message_id is None:
+            return False
+        payload = {'chat_id': chat_id, 'message_id': message_id, 'text': text, 'parse_mode': parse_mode}
+        payload.update(extra)
+        return self._put({'method': EDIT, 'chat_id': chat_id, 'payload': payload, 'enqueued': time.monotonic(),
+                          'attempts': 0, 'on_sent': None, 'on_message': None})
+
+    def _put(self, item: Dict[str, Any]) -> bool:
+        self.start()
+        with self._count_lock:
+            full = self._pending_count >= self.maxsize
+            if not full:
+                self._pending_count += 1
+        if full:
+            with self._stats_lock:
+                self.dropped += 1
+            metrics.TELEGRAM_MESSAGES.labels('dropped').inc()
+            logger.warning('Fila do Telegram cheia (%d); mensagem descartada', self.maxsize)
+            return False
+        self._inbox.put_nowait(item)
+        return True
+
+    def _done(self):
+        with self._count_lock:
+            self._pending_count -= 1
+
+    # ----- consumidor -----
+    def _drain_inbox(self, timeout: float):
+        try:
+            item = self._inbox.get(timeout=max(0.0, timeout)) if timeout > 0 else self._inbox.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            if item['method'] == DONE:
+                self._finish(item)
+            elif item['method'] == EDIT:
+                self._add_edit(item)
+            else:
+                self._pending.setdefault(item['chat_id'], deque()).append(item)
+            try:
+                item = self._inbox.get_nowait()
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def _edit_key(item: Dict[str, Any]) -> Tuple:
+        return item['chat_id'], item['payload']['message_id']
+
+    def _add_edit(self, item: Dict[str, Any]):
+        key = self._edit_key(item)
+        current = self._edits.get(key)
+        if current is not None:
+            current['payload'] = item['payload']  # a edição que espera passa a levar o texto novo
+            self._done()
+            with self._stats_lock:
+                self.coalesced += 1
+            metrics.TELEGRAM_MESSAGES.labels('coalesced').inc()
+            return
+        self._edits[key] = item
+
+    def _mark_edited(self, key: Tuple, at: float):
+        if len(self._edit_ready) >= _EDIT_READY_MAX:
+            now = time.monotonic()
+            self._edit_ready = {k: t for k, t in self._edit_ready.items() if t > now}
+        self._edit_ready[key] = at + self.edit_interval
+
+    def _next_chat(self):
+        best, best_at = None, None
+        for chat_id, items in self._pending.items():
+            if not items or chat_id in self._busy:
+                continue
+            at = max(self._chat_ready.get(chat_id, 0.0), items[0].get('not_before', 0.0))
+            if best_at is None or at < best_at:
+                best, best_at = chat_id, at
+        return best, best_at
+
+    def _next_edit(self):
+        best, best_at = None, None
+        for key, item in self._edits.items():
+            if item['chat_id'] in self._busy:
+                continue
+            # _edit_ready lido aqui: a edição anterior pode ter terminado depois desta chegar
+            at = max(self._chat_ready.get(item['chat_id'], 0.0), item.get('not_before', 0.0),
+                     self._edit_ready.get(key, 0.0))
+            if best_at is None or at < best_at:
+                best, best_at = key, at
+        return best, best_at
+
+    def _pop(self, chat_id, edit_key) -> Dict[str, Any]:
+        if edit_key is not None:
+            return self._edits.pop(edit_key)
+        item = self._pending[chat_id].popleft()
+        if not self._pending[chat_id]:
+            del self._pending[chat_id]
+        return item
+
+    def _run(self):
+        while True:
+            try:
+                if self._in_flight >= self.workers:
+                    self._drain_inbox(timeout=1.0)  # o resultado de um POST volta pelo inbox
+                    continue
+                chat_id, ready_at = self._next_chat()
+                edit_key, edit_at = self._next_edit()
+                if edit_key is not None and (chat_id is None or edit_at < ready_at):
+                    chat_id, ready_at = edit_key[0], edit_at
+                else:
+                    edit_key = None  # no empate, mensagem nova primeiro
+                now = time.monotonic()
+                if chat_id is None:
+                    self._drain_inbox(timeout=1.0)
+                    continue
+                wait = max(ready_at, self._next_global) - now
+                if wait > 0:
+                    self._drain_inbox(timeout=wait)  # acorda cedo se chegar mensagem de outro chat
+                    continue
+                self._drain_inbox(timeout=0)
+                self._dispatch(self._pop(chat_id, edit_key))
+            except Exception as e:
+                logger.exception('Erro no dispatcher do Telegram: %s', e)
+                time.sleep(1)
+
+    def _dispatch(self, item: Dict[str, Any]):
+        now = time.monotonic()
+        self._next_global = now + self.global_interval
+        self._busy.add(item['chat_id'])
+        self._in_flight += 1
+        item['attempts'] += 1
+        item['started'] = now
+        self._pool.submit(self._send, item)
+
+    def _finish(self, done: Dict[str, Any]):
+        """Resultado de um POST, na thread do dispatcher (único dono da fila e dos horários)."""
+        item = done['item']
+        chat_id = item['chat_id']
+        self._busy.discard(chat_id)
+        self._in_flight -= 1
+        self._chat_ready[chat_id] = item['started'] + self.per_chat_interval
+        if done['retry_after'] is not None:
+            self._chat_ready[chat_id] = done['finished'] + done['retry_after']
+        if done['edited'] is not None:
+            self._mark_edited(*done['edited'])
+        if not done['retry']:
+            self._done()
+            return
+        if item['method'] == EDIT:
+            key = self._edit_key(item)
+            if key in self._edits:
+                self._done()  # já chegou edição mais nova dessa mensagem; esta perdeu o sentido
+                return
+            self._edits[key] = item
+        else:
+            self._pending.setdefault(chat_id, deque()).appendleft(item)  # mantém a ordem do chat
+
+    # ----- threads de envio -----
+    def _send(self, item: Dict[str, Any]):
+        done = {'method': DONE, 'item': item, 'retry': False, 'retry_after': None, 'edited': None}
+        try:
+            self._post(item, done)
+        except Exception as e:
+            logger.exception('Erro no envio do Telegram: %s', e)
+        finally:
+            done['finished'] = time.monotonic()
+            self._inbox.put_nowait(done)
+
+    def _post(self, item: Dict[str, Any], done: Dict[str, Any]):
+        chat_id = item['chat_id']
+        is_edit = item['method'] == EDIT
+        retry_after = None
+        try:
+            r = http_client.post(f'{TELEGRAM_API}/bot{self.token}/{item["method"]}', json=item['payload'])
+            if r.status_code == 200 or (is_edit and r.status_code == 400 and 'not modified' in r.text):
+                sent_at = time.monotonic()
+                if is_edit:
+                    done['edited'] = (self._edit_key(item), sent_at)
+                    with self._stats_lock:
+                        self.edited += 1
+                    metrics.TELEGRAM_MESSAGES.labels('edited').inc()
+                    return
+                latency = sent_at - item['enqueued']
+                with self._stats_lock:
+                    self.sent += 1
+                    self.latency_sum += latency
+                    self.latency_max = max(self.latency_max, latency)
+                    self.last_latency = latency
+                metrics.TELEGRAM_SEND_SECONDS.observe(latency)
+                metrics.TELEGRAM_MESSAGES.labels('sent').inc()
+                if item['on_sent'] is not None:
+                    try:
+                        item['on_sent'](sent_at)
+                    except Exception as e:
+                        logger.warning('Erro no callback on_sent: %s', e)
+                if item['on_message'] is not None:
+                    try:
+                        message_id = r.json()['result']['message_id']
+                    except Exception:
+                        message_id = None
+                    if message_id is not None:
+                        done['edited'] = ((chat_id, message_id), sent_at)  # 1ª edição espera o intervalo também
+                    self._notify(item, message_id)
+                return
+            if r.status_code == 429:
+                try:
+                    retry_after = float(r.json().get('parameters', {}).get('retry_after', 1))
+                except Exception:
+                    retry_after = 1.0
+                done['retry_after'] = retry_after
+                logger.warning('Telegram 429 no chat %s: retry_after=%ss', chat_id, retry_after)
+            elif r.status_code < 500:
+                # 400/403: erro do pedido (chat inválido, HTML quebrado, mensagem apagada...), não adianta reenviar
+                logger.warning('Erro ao enviar Telegram (%s): %s %s', item['method'], r.status_code, r.text)
+                self._failed(item)
+                return
+            else:
+                logger.warning('Telegram %s; nova tentativa', r.status_code)
+        except Exception as e:
+            logger.warning('Falha ao enviar Telegram: %s', e)
+
+        if item['attempts'] >= self.max_retries:
+            logger.error('Mensagem para %s descartada após %d tentativas', chat_id, item['attempts'])
+            self._failed(item)
+            return
+        with self._stats_lock:
+            self.retries += 1
+        metrics.TELEGRAM_MESSAGES.labels('retry').inc()
+        backoff = retry_after if retry_after is not None else min(60.0, 2.0 ** item['attempts'])
+        item['not_before'] = time.monotonic() + backoff
+        done['retry'] = True
+
+    def _failed(self, item: Dict[str, Any]):
+        with self._stats_lock:
+            self.failed += 1
+        metrics.TELEGRAM_MESSAGES.labels('failed').inc()
+        if item['on_message'] is not None:
+            self._notify(item, None)
+
+    @staticmethod
+    def _notify(item: Dict[str, Any], message_id):
+        try:
+            item['on_message'](message_id)
+        except Exception as e:
+            logger.warning('Erro no callback on_message: %s', e)
+
+    # ----- métricas -----
+    def queue_depth(self) -> int:
+        return self._pending_count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'queue_depth': self.queue_depth(),
+                'sent': self.sent,
+                'edited': self.edited,
+                'coalesced': self.coalesced,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'retries': self.retries,
+                'latency_avg': round(self.latency_sum / self.sent, 3) if self.sent else 0.0,
+                'latency_max': round(self.latency_max, 3),
+                'latency_last': round(self.last_latency, 3),
+            }
@@ -0,0 +1,81 @@
+"""Fingerprint das entradas do scoring e o ChangeCache que reaproveita o resultado."""
+
+import unittest
+
+from change_detection import ChangeCache, fixture_fingerprint, stats_fingerprint
+from fixture_snapshot import FixtureSnapshot
+
+
+def stats(corners_home=3, corners_away=2):
+    return [
+        {'team': {'id': 1}, 'statistics': [{'type': 'Corner Kicks', 'value': corners_home},
+                                          {'type': 'Dangerous Attacks', 'value': 40}]},
+        {'team': {'id': 2}, 'statistics': [{'type': 'Corner Kicks', 'value': corners_away}]},
+    ]
+
+
+def snapshot(**kwargs):
+    fields = dict(id=7, status='2H', elapsed=70, venue_name='Arena', goals_home=1, goals_away=0)
+    fields.update(kwargs)
+    return FixtureSnapshot(**fields)
+
+
+class FingerprintTest(unittest.TestCase):
+    def test_same_inputs_same_fingerprint(self):
+        self.assertEqual(fixture_fingerprint(snapshot(), stats()), fixture_fingerprint(snapshot(), stats()))
+        # nome/liga não entram no scoring
+        self.assertEqual(fixture_fingerprint(snapshot(league_name='X'), stats()), fixture_fingerprint(snapshot(), stats()))
+
+    def test_scoring_inputs_change_fingerprint(self):
+        base = fixture_fingerprint(snapshot(), stats())
+        for changed in (
+            fixture_fingerprint(snapshot(elapsed=71), stats()),
+            fixture_fingerprint(snapshot(status='HT'), stats()),
+            fixture_fingerprint(snapshot(goals_away=1), stats()),
+            fixture_fingerprint(snapshot(), stats(corners_away=3)),
+            fixture_fingerprint(snapshot(), stats(), 'extra'),
+        ):
+            self.assertNotEqual(changed, base)
+
+    def test_stats_fingerprint(self):
+        self.assertEqual(stats_fingerprint(None), ())
+        self.assertEqual(stats_fingerprint(stats())[0], (1, 'Corner Kicks', 3))
+        self.assertNotEqual(stats_fingerprint(stats(3, 2)), stats_fingerprint(stats(2, 3)))
+
+
+class ChangeCacheTest(unittest.TestCase):
+    def test_get_or_compute_reuses_until_fingerprint_changes(self):
+        cache = ChangeCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(cache.get_or_compute(7, 100, compute), 1)
+        self.assertEqual(cache.get_or_compute(7, 100, compute), 1)
+        self.assertEqual(cache.get_or_compute(7, 101, compute), 2)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(cache.end_cycle(), {'hits': 1, 'misses': 2, 'hit_ratio': 0.333})
+
+    def test_cached_none_is_a_hit(self):
+        cache = ChangeCache()
+        cache.get_or_compute(7, 1, lambda: None)
+        self.assertIsNone(cache.get_or_compute(7, 1, lambda: self.fail('recalculou')))
+
+    def test_forget_and_stats(self):
+        cache = ChangeCache()
+        cache.put(7, 1, 'x')
+        cache.get(7, 1)
+        cache.end_cycle()
+        cache.get(7, 2)
+        cache.end_cycle()
+        self.assertEqual(cache.stats(), {'entries': 1, 'last_cycle': {'hits': 0, 'misses': 1, 'hit_ratio': 0.0},
+                                         'hit_ratio': 0.5})
+        cache.forget(7)
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get(7, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
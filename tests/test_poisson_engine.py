@@ -0,0 +1,96 @@
+"""Motor Poisson contra uma liquidação força-bruta, resultado a resultado."""
+
+import math
+import unittest
+
+import numpy as np
+
+import poisson_engine as pe
+
+KMAX = 80  # cantos restantes somados na força-bruta; a cauda acima some
+
+
+def settle_half(final, line):
+    """Liquidação de uma linha inteira ou meia: 1 win, 0 push, -1 lose."""
+    if final > line:
+        return 1
+    return 0 if final == line else -1
+
+
+def settle(final, line):
+    """Resultado de uma aposta over na linha (quarto = metade em cada lado)."""
+    if line % 1 in (0.25, 0.75):
+        a, b = settle_half(final, line - 0.25), settle_half(final, line + 0.25)
+        return {2: 'win', 1: 'half_win', 0: 'push', -1: 'half_loss', -2: 'lose'}[a + b]
+    return {1: 'win', 0: 'push', -1: 'lose'}[settle_half(final, line)]
+
+
+def brute_force(current, lam, line):
+    out = dict.fromkeys(pe.OUTCOMES, 0.0)
+    for k in range(KMAX + 1):
+        out[settle(current + k, line)] += math.exp(-lam + k * math.log(lam) - math.lgamma(k + 1)) if lam > 0 else float(k == 0)
+    return out
+
+
+class PmfTest(unittest.TestCase):
+    def test_pmf_table_matches_closed_form(self):
+        table = pe.pmf_table([0.0, 0.7, 3.2], 12)
+        for row, lam in zip(table, (0.0, 0.7, 3.2)):
+            for k, p in enumerate(row):
+                expected = math.exp(-lam) * lam ** k / math.factorial(k)
+                self.assertAlmostEqual(p, expected, places=14)
+
+    def test_negative_lambda_is_clipped(self):
+        np.testing.assert_allclose(pe.pmf_table([-1.0], 3)[0], [1.0, 0.0, 0.0, 0.0])
+
+    def test_scalar_wrappers(self):
+        self.assertEqual(pe.pmf(-1, 2.0), 0.0)
+        self.assertEqual(pe.tail_ge(0, 2.0), 1.0)
+        self.assertAlmostEqual(pe.cdf_le(2, 2.0) + pe.tail_ge(3, 2.0), 1.0, places=14)
+        self.assertAlmostEqual(pe.tail_ge(1, 1.5), 1.0 - math.exp(-1.5), places=14)
+
+
+class LadderTest(unittest.TestCase):
+    def test_asian_ladder(self):
+        self.assertEqual(pe.asian_ladder(3.5, 4.5), [3.5, 3.75, 4.0, 4.25, 4.5])
+
+    def test_batch_matches_brute_force_settlement(self):
+        lines = pe.asian_ladder(0.5, 14.0)
+        currents = [0, 3, 4, 7, 11, 15]
+        lams = [0.0, 0.3, 1.5, 2.75, 4.0, 6.5]
+        mats = pe.batch_line_matrices(currents, lams, lines)
+        for i, (current, lam) in enumerate(zip(currents, lams)):
+            for j, line in enumerate(lines):
+                expected = brute_force(current, lam, line)
+                for name in pe.OUTCOMES:
+                    self.assertAlmostEqual(mats[name][i, j], expected[name], places=12,
+                                           msg=f'{name} atual={current} lam={lam} linha={line}')
+
+    def test_outcomes_sum_to_one(self):
+        mats = pe.batch_line_matrices([2, 9], [1.1, 3.3], pe.asian_ladder(1.0, 12.0), clip=True)
+        total = sum(mats[name] for name in pe.OUTCOMES)
+        np.testing.assert_allclose(total, 1.0, atol=1e-12)
+        for name in pe.OUTCOMES:
+            self.assertTrue(((mats[name] >= 0) & (mats[name] <= 1)).all(), name)
+
+    def test_quarter_line_splits(self):
+        # 4.25 com 4 no placar e nada a vir: metade push, metade perdida
+        self.assertAlmostEqual(pe.line_metrics(4, 0.0, 4.25)['p_half_loss'], 1.0)
+        # 4.75 com 5 no placar: metade ganha, metade push
+        self.assertAlmostEqual(pe.line_metrics(5, 0.0, 4.75)['p_half_win'], 1.0)
+
+    def test_evaluate_lines_batch_shape_and_order(self):
+        lines = [4.5, 4.0, 4.25]
+        rows = pe.evaluate_lines_batch([3, 5], [1.0, 2.0], lines)
+        self.assertEqual(len(rows), 2)
+        self.assertEqual([r['line'] for r in rows[1]], lines)
+        self.assertEqual(rows[0], pe.evaluate_asian_lines(3, 1.0, lines))
+
+    def test_empty_inputs(self):
+        mats = pe.batch_line_matrices([], [], [4.5])
+        self.assertEqual(mats['win'].shape, (0, 1))
+        self.assertEqual(pe.evaluate_lines_batch([1], [1.0], []), [[]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""SignalStore: dedup que sobrevive a restart, forget e compactação."""
+
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+from signal_store import SignalStore
+
+
+class SignalStoreTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'sent.db')
+
+    def open(self, **kwargs):
+        store = SignalStore(self.path, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def test_add_and_contains(self):
+        store = self.open()
+        self.assertFalse(store.contains(10, 'HT:3'))
+        store.add(10, 'HT:3')
+        store.add(10, 'HT:3')
+        self.assertTrue(store.contains(10, 'HT:3'))
+        self.assertFalse(store.contains(10, 'FT:3'))
+        self.assertFalse(store.contains(11, 'HT:3'))
+        self.assertEqual(store.keys(10), frozenset({'HT:3'}))
+
+    def test_survives_restart(self):
+        store = self.open()
+        store.add(10, 'HT:3')
+        store.add('20', 'FT')
+        store.close()
+        reopened = self.open()
+        self.assertTrue(reopened.contains(10, 'HT:3'))
+        self.assertTrue(reopened.contains('20', 'FT'))
+        self.assertEqual(len(reopened), 2)
+
+    def test_forget_reloads_from_disk(self):
+        store = self.open()
+        store.add(10, 'HT:3')
+        store.forget(10)
+        self.assertEqual(len(store), 0)
+        self.assertTrue(store.contains(10, 'HT:3'))  # partida voltou: nada é reenviado
+        store.add(10, 'FT:5')
+        self.assertEqual(store.keys(10), frozenset({'HT:3', 'FT:5'}))
+
+    def test_retention_hides_and_compacts_old_signals(self):
+        store = self.open(retention_days=1)
+        store.add(10, 'novo')
+        with sqlite3.connect(self.path) as conn:
+            conn.execute('INSERT INTO sent_signals VALUES (?, ?, ?)', (10, 'velho', time.time() - 2 * 86400))
+        store.forget(10)
+        self.assertFalse(store.contains(10, 'velho'))
+        store.compact()
+        with sqlite3.connect(self.path) as conn:
+            keys = [k for (k,) in conn.execute('SELECT signal_key FROM sent_signals')]
+        self.assertEqual(keys, ['novo'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""SubscriptionStore: índice de fan-out contra uma varredura linear, persistência e comandos."""
+
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import subscriptions
+from subscriptions import (STRATEGIES, WINDOWS, Subscription, SubscriptionStore, handle_command, handle_update,
+                           parse_filters)
+
+
+def linear_match(subs, strategy, league_id, window, prob):
+    """O que match() deve devolver, sem índice."""
+    out = []
+    for sub in subs:
+        if sub.strategies and strategy not in sub.strategies:
+            continue
+        if sub.windows and window not in sub.windows:
+            continue
+        if sub.leagues and league_id not in sub.leagues:
+            continue
+        if prob is not None and sub.threshold(strategy) > prob:
+            continue
+        out.append(sub.chat_id)
+    return sorted(out)
+
+
+def random_subs(rng, n):
+    leagues = [39, 140, 71, 'copa']
+    subs = []
+    for chat_id in range(1, n + 1):
+        subs.append(Subscription(
+            chat_id,
+            frozenset(rng.sample(leagues, rng.randint(0, 2))),
+            frozenset(rng.sample(WINDOWS, rng.randint(0, 2))),
+            frozenset(rng.sample(list(STRATEGIES), rng.randint(0, 2))),
+            rng.choice([0.0, 0.5, 0.6, 0.75]),
+            rng.choice([0.0, 0.55, 0.7]),
+        ))
+    return subs
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'subs.db')
+
+    def open(self):
+        store = SubscriptionStore(self.path)
+        self.addCleanup(store.close)
+        return store
+
+    def assert_matches(self, store, subs):
+        for strategy in STRATEGIES:
+            for window in WINDOWS:
+                for league in (39, 140, 71, 'copa', 999):
+                    for prob in (None, 0.0, 0.5, 0.55, 0.6, 0.7, 0.75, 0.9):
+                        self.assertEqual(sorted(store.match(strategy, league, window, prob)),
+                                         linear_match(subs, strategy, league, window, prob),
+                                         (strategy, window, league, prob))
+
+    def test_index_matches_linear_scan(self):
+        subs = random_subs(random.Random(7), 60)
+        store = self.open()
+        for sub in subs:
+            store.subscribe(sub)
+        self.assert_matches(store, subs)
+
+    def test_threshold_is_inclusive(self):
+        store = self.open()
+        store.subscribe(Subscription(1, min_p_ge_1=0.6))
+        self.assertEqual(store.match('rp', 39, 'HT', 0.6), [1])
+        self.assertEqual(store.match('rp', 39, 'HT', 0.59), [])
+        self.assertEqual(store.match('perdendo', 39, 'HT', 0.0), [1])  # estratégia sem métrica
+
+    def test_resubscribe_and_unsubscribe_update_index(self):
+        subs = random_subs(random.Random(3), 30)
+        store = self.open()
+        store.subscribe_many(subs)
+        self.assert_matches(store, subs)
+        changed = [sub._replace(min_p_ge_1=0.9, leagues=frozenset({140})) if sub.chat_id % 3 == 0 else sub
+                   for sub in subs]
+        for sub in changed:
+            if sub.chat_id % 3 == 0:
+                store.subscribe(sub)
+        kept = [sub for sub in changed if sub.chat_id % 5]
+        for sub in changed:
+            if sub.chat_id % 5 == 0:
+                self.assertTrue(store.unsubscribe(sub.chat_id))
+        self.assertFalse(store.unsubscribe(5))
+        self.assert_matches(store, kept)
+
+    def test_persistence_and_ensure(self):
+        subs = random_subs(random.Random(11), 20)
+        store = self.open()
+        store.subscribe_many(subs)
+        store.ensure('-100123')
+        store.ensure(-100123)  # mesmo chat da env, sem duplicar
+        store.close()
+        reopened = self.open()
+        self.assertEqual(len(reopened), 21)
+        self.assertEqual(reopened.get(-100123), Subscription(-100123))
+        self.assert_matches(reopened, subs + [Subscription(-100123)])
+
+
+class CommandTest(unittest.TestCase):
+    def setUp(self):
+        self.store = SubscriptionStore(':memory:')
+        self.addCleanup(self.store.close)
+        patcher = mock.patch.object(subscriptions, 'ADMIN_CHAT_IDS', frozenset({'42'}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_filters(self):
+        sub = parse_filters('-100', ['ligas=39,copa', 'janelas=ht', 'estrategias=vip', 'min=0.6', 'min_win=0.7'])
+        self.assertEqual(sub, Subscription(-100, frozenset({39, 'copa'}), frozenset({'HT'}), frozenset({'vip'}), 0.6, 0.7))
+        for bad in (['ligas'], ['janelas=XX'], ['estrategias=nada'], ['cor=azul']):
+            with self.assertRaises(ValueError):
+                parse_filters(1, bad)
+
+    def test_admin_commands(self):
+        self.assertIn('Assinatura ativa', handle_command(self.store, 42, '/assinar@bot ligas=39 min=0.5'))
+        self.assertEqual(self.store.match('rp', 39, 'FT', 0.5), [42])
+        self.assertIn('ligas: 39', handle_command(self.store, 42, '/filtros'))
+        self.assertIn('⚠️', handle_command(self.store, 42, '/assinar janelas=XX'))
+        self.assertIn('cancelada', handle_command(self.store, 42, '/cancelar'))
+        self.assertIn('não tem assinatura', handle_command(self.store, 42, '/cancelar'))
+        self.assertIsNone(handle_command(self.store, 42, '/start'))
+        self.assertIsNone(handle_command(self.store, 42, ''))
+
+    def test_other_chats_are_refused(self):
+        for text in ('/assinar', '/cancelar', '/filtros'):
+            self.assertIn('⛔', handle_command(self.store, 7, text))
+        self.assertEqual(len(self.store), 0)
+        update = {'message': {'chat': {'id': 7}, 'text': '/assinar ligas=39'}}
+        chat_id, reply = handle_update(self.store, update)
+        self.assertEqual(chat_id, 7)
+        self.assertIn('⛔', reply)
+        self.assertIsNone(handle_update(self.store, {'message': {'chat': {'id': 7}, 'text': 'oi'}}))
+        self.assertIsNone(handle_update(self.store, {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
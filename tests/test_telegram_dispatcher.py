@@ -0,0 +1,152 @@
+"""TelegramDispatcher com o POST trocado por um Telegram em memória: limite da fila, junção de edições, chats independentes."""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+import telegram_dispatcher as td
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self._body = body or {}
+        self.text = str(self._body)
+
+    def json(self):
+        return self._body
+
+
+class FakeTelegram:
+    """Registra os POSTs; chats em 'hold' ficam presos até release()."""
+
+    def __init__(self):
+        self.calls = []
+        self.hold = {}
+        self.script = []  # respostas forçadas, consumidas em ordem
+        self._lock = threading.Lock()
+
+    def block(self, chat_id):
+        self.hold[chat_id] = threading.Event()
+
+    def release(self, chat_id):
+        self.hold.pop(chat_id).set()
+
+    def post(self, url, json=None, **kwargs):
+        event = self.hold.get(json['chat_id'])
+        if event is not None:
+            event.wait(5)
+        with self._lock:
+            self.calls.append((url.rsplit('/', 1)[1], json['chat_id'], json.get('message_id'), json['text']))
+            if self.script:
+                return self.script.pop(0)
+            return FakeResponse(200, {'ok': True, 'result': {'message_id': len(self.calls)}})
+
+    def texts(self, method=None, chat_id=None):
+        return [c[3] for c in self.calls if (method is None or c[0] == method) and (chat_id is None or c[1] == chat_id)]
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class DispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.telegram = FakeTelegram()
+        patcher = mock.patch.object(td.http_client, 'post', self.telegram.post)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def dispatcher(self, **kwargs):
+        options = dict(maxsize=100, per_chat_interval=0.0, global_rate=1000, max_retries=3,
+                       edit_interval=0.0, workers=4)
+        options.update(kwargs)
+        return td.TelegramDispatcher('TOKEN', **options)
+
+    def test_messages_keep_chat_order(self):
+        d = self.dispatcher()
+        for i in range(20):
+            self.assertTrue(d.submit(1, f'm{i}'))
+        self.assertTrue(wait_for(lambda: d.stats()['sent'] == 20))
+        self.assertEqual(self.telegram.texts(td.SEND, 1), [f'm{i}' for i in range(20)])
+        self.assertEqual(d.queue_depth(), 0)
+
+    def test_queue_limit_counts_messages_inside_the_dispatcher(self):
+        d = self.dispatcher(maxsize=3)
+        self.telegram.block(1)
+        results = [d.submit(1, f'm{i}') for i in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+        # nada saiu ainda: uma em envio e duas esperando a vez do chat continuam contando
+        self.assertTrue(wait_for(lambda: len(d._busy) == 1))
+        self.assertEqual(d.queue_depth(), 3)
+        self.assertFalse(d.submit(2, 'outro chat'))
+        self.assertEqual(d.stats()['dropped'], 3)
+        self.telegram.release(1)
+        self.assertTrue(wait_for(lambda: d.stats()['sent'] == 3))
+        self.assertTrue(wait_for(lambda: d.queue_depth() == 0))
+        self.assertTrue(d.submit(2, 'depois'))
+
+    def test_pending_edits_of_a_message_are_coalesced(self):
+        d = self.dispatcher()
+        ids = []
+        self.telegram.block(1)
+        d.submit(1, 'abre', on_message=ids.append)
+        self.assertTrue(wait_for(lambda: len(d._busy) == 1))
+        # o message_id só existe depois do envio; as edições esperam o chat liberar
+        d.submit(1, 'segunda')
+        self.telegram.release(1)
+        self.assertTrue(wait_for(lambda: ids))
+        self.telegram.block(1)
+        d.submit(1, 'terceira')
+        self.assertTrue(wait_for(lambda: len(d._busy) == 1))
+        for i in range(5):
+            self.assertTrue(d.edit(1, ids[0], f'v{i}'))
+        self.telegram.release(1)
+        self.assertTrue(wait_for(lambda: d.stats()['edited'] == 1))
+        self.assertEqual(self.telegram.texts(td.EDIT), ['v4'])
+        self.assertEqual(d.stats()['coalesced'], 4)
+        self.assertTrue(wait_for(lambda: d.queue_depth() == 0))
+
+    def test_slow_chat_does_not_hold_other_chats(self):
+        d = self.dispatcher()
+        self.telegram.block('lento')
+        d.submit('lento', 'preso')
+        for i in range(5):
+            d.submit('rapido', f'r{i}')
+        self.assertTrue(wait_for(lambda: d.stats()['sent'] == 5))
+        self.assertEqual(self.telegram.texts(chat_id='rapido'), [f'r{i}' for i in range(5)])
+        self.telegram.release('lento')
+        self.assertTrue(wait_for(lambda: d.stats()['sent'] == 6))
+
+    def test_retry_after_resends_and_client_errors_fail(self):
+        d = self.dispatcher()
+        self.telegram.script = [FakeResponse(429, {'parameters': {'retry_after': 0.05}})]
+        d.submit(1, 'm')
+        self.assertTrue(wait_for(lambda: d.stats()['sent'] == 1))
+        self.assertEqual(d.stats()['retries'], 1)
+        self.assertEqual(self.telegram.texts(td.SEND), ['m', 'm'])
+
+        notified = []
+        self.telegram.script = [FakeResponse(400, {'description': 'chat not found'})]
+        d.submit(2, 'x', on_message=notified.append)
+        self.assertTrue(wait_for(lambda: d.stats()['failed'] == 1))
+        self.assertEqual(notified, [None])
+        self.assertTrue(wait_for(lambda: d.queue_depth() == 0))
+
+    def test_gives_up_after_max_retries(self):
+        d = self.dispatcher(max_retries=2)
+        self.telegram.script = [FakeResponse(429, {'parameters': {'retry_after': 0.01}})] * 2
+        d.submit(1, 'm')
+        self.assertTrue(wait_for(lambda: d.stats()['failed'] == 1))
+        self.assertEqual(d.stats()['sent'], 0)
+        self.assertTrue(wait_for(lambda: d.queue_depth() == 0))
+
+
+if __name__ == '__main__':
+    unittest.main()